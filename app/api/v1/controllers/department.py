@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Tuple
 from app.schemas.base import PyObjectId
 from app.services.department import DepartmentService
 from app.schemas.department import DepartmentCreate, DepartmentInDB, DocumentTypeCreate, DocumentTypeInDB, DocumentTypeWithDepartment
@@ -15,6 +15,10 @@ class DepartmentController:
     @staticmethod
     async def get_active_departments() -> List[DepartmentInDB]:
         return await DepartmentService().get_active_departments()
+
+    @staticmethod
+    async def get_department_summaries(active_only: bool) -> Tuple[int, bytes]:
+        return await DepartmentService().get_department_summaries(active_only)
         
     @staticmethod
     async def create_department(department: DepartmentCreate) -> DepartmentInDB:
@@ -49,7 +53,7 @@ class DepartmentController:
         return await DepartmentService().get_document_types_by_department_name(department_name)
 
     @staticmethod
-    async def get_all_document_types_with_departments() -> List[DocumentTypeWithDepartment]:
+    async def get_all_document_types_with_departments() -> Tuple[Tuple[int, int], bytes]:
         return await DepartmentService().get_all_document_types_with_departments()
 
     @staticmethod
@@ -1,8 +1,14 @@
-from typing import Any
+from typing import Optional, Union
 
-from fastapi import HTTPException, UploadFile
+from fastapi import Depends, File, Form, HTTPException, Path, Query, Response, UploadFile, status
+from starlette.responses import FileResponse
 
+from app.core.dependencies.auth import get_current_user_from_header
+from app.schemas.admin import AuthInAdminDB
+from app.schemas.import_job import DepartmentDryRunResponse, DocumentDryRunResponse, ImportJobResponse
+from app.services.attachment_import import AttachmentImportService
 from app.services.csvservice import CSVImportService
+from app.services.import_job import ImportJobService
 
 from fastapi import APIRouter
 
@@ -18,12 +24,13 @@ router = APIRouter(
     }
 )
 
-@router.post("/import-csv-departments", response_model=dict)
+@router.post("/import-csv-departments", response_model=Union[DepartmentDryRunResponse, dict])
 async def import_csv_departments(
     department_file: UploadFile,
     document_type_file: UploadFile,
     generated_id_file: UploadFile,
-    admin_file: UploadFile 
+    admin_file: UploadFile,
+    dry_run: bool = Query(False, description="Validate the files and report rejected rows without writing anything")
 ):
     """
     Import CSV files to populate departments, document types, and admins in the database.
@@ -33,13 +40,17 @@ async def import_csv_departments(
         document_type_file: CSV file containing document type data (id, name, departmentid)
         generated_id_file: CSV file containing prefix data (documenttypeid, year, prefix, padding, number)
         admin_file: Optional CSV file containing admin data (id, username)
+        dry_run: Only validate; returns rejection counts per file and a report of rejected rows
 
     Returns:
-        A dictionary with processed departments and admins.
+        A dictionary with processed departments and admins, or the dry-run report.
     """
     try:
         service = CSVImportService()
 
+        if dry_run:
+            return await service.dry_run_department_csvs(department_file, document_type_file, generated_id_file, admin_file)
+
         # Process department-related CSVs
         departments = await service.import_csv(department_file, document_type_file, generated_id_file)
 
@@ -62,27 +73,83 @@ async def import_csv_departments(
         raise HTTPException(status_code=500, detail=f"Error processing CSV files: {str(e)}")
 
 
-@router.post("/import-csv-documents", response_model=list[Any] | dict[str, int | str])
+@router.post("/import-csv-documents", status_code=status.HTTP_202_ACCEPTED,
+             response_model=Union[ImportJobResponse, DocumentDryRunResponse])
 async def import_csv_documents(
-    approval_paper_file: UploadFile
+    response: Response,
+    approval_paper_file: UploadFile,
+    mode: str = Query("insert", pattern="^(insert|upsert)$", description="insert new documents, or upsert them by legacy id"),
+    dry_run: bool = Query(False, description="Validate and map the file and report rejected rows without writing anything")
 ):
     """
-    Import CSV file to populate documents in the database.
+    Start a background import of a CSV file of documents.
 
     Args:
         approval_paper_file: CSV file containing document data (id, RefNo, Title, etc.)
+        mode: "upsert" keys documents on their legacy id so re-importing a delta export is idempotent
+        dry_run: Only validate; returns counts per rejection reason and a report of rejected rows
 
     Returns:
-        A list of processed documents.
+        The queued import job; poll /import-jobs/{job_id} for progress. For a dry run, the validation report.
     """
     try:
-        service = CSVImportService()
-
-        documents = await service.import_documents_from_csv(approval_paper_file)
+        if dry_run:
+            response.status_code = status.HTTP_200_OK
+            return await CSVImportService().dry_run_documents_csv(approval_paper_file, mode)
 
-        return documents
+        return await ImportJobService().create_document_import_job(approval_paper_file, mode)
 
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing CSV files: {str(e)}")
+
+
+@router.get("/import-jobs/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(
+    job_id: str = Path(..., title="Import Job ID", description="The ObjectId of the import job")
+):
+    """Report the progress of an import job: rows read, inserted, skipped and failed, with throughput."""
+    return await ImportJobService().get_job(job_id)
+
+
+@router.post("/import-jobs/{job_id}/resume", response_model=ImportJobResponse)
+async def resume_import_job(
+    job_id: str = Path(..., title="Import Job ID", description="The ObjectId of the import job")
+):
+    """Resume a failed import job from its last committed chunk."""
+    return await ImportJobService().resume_job(job_id)
+
+
+@router.get("/import-reports/{report_id}")
+async def download_import_report(
+    report_id: str = Path(..., title="Import Report ID", description="The report_id returned by a dry run"),
+    current_user: AuthInAdminDB = Depends(get_current_user_from_header)
+):
+    """
+    Download the CSV of rows rejected by a dry run, with their rejection reasons. The "row"
+    column counts the data rows that were parsed, starting at 1, so it can drift from the
+    file's line numbers when malformed lines were skipped or fields span several lines.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can download import reports")
+    report_file = CSVImportService().get_rejection_report_path(report_id)
+    return FileResponse(report_file, media_type="text/csv", filename=f"rejected_rows_{report_id}.csv")
+
+
+@router.post("/import-attachments", response_model=dict)
+async def import_attachments(
+    archive: Optional[UploadFile] = File(None, description="ZIP archive of files named by ref_no"),
+    directory: Optional[str] = Form(None, description="Directory under ATTACHMENT_IMPORT_PATH holding files named by ref_no"),
+    overwrite: bool = Form(False, description="Replace files already attached to matched documents"),
+    current_user: AuthInAdminDB = Depends(get_current_user_from_header)
+):
+    """
+    Attach legacy scans to documents in bulk, matching each file to a document by ref_no.
+
+    Returns:
+        A report with the number of stored files and the unmatched, skipped and failed files.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can import attachments")
+    return await AttachmentImportService().import_attachments(archive, directory, overwrite)
@@ -1,6 +1,6 @@
 from bson import ObjectId
-from fastapi import APIRouter, Path, status, HTTPException
-from typing import List
+from fastapi import APIRouter, Path, Query, Request, Response, status, HTTPException
+from typing import List, Union
 from app.api.v1.controllers.department import DepartmentController
 from app.core.exceptions import handle_service_exception
 from app.schemas.base import PyObjectId
@@ -8,6 +8,7 @@ from app.schemas.department import (
     DepartmentCreate,
     DepartmentResponse,
     DepartmentStatusUpdate,
+    DepartmentSummary,
     DocumentTypeCreate,
     DocumentTypeInDB,
     DocumentTypeWithDepartment,
@@ -20,16 +21,40 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+VIEW_QUERY = Query("full", pattern="^(summary|full)$",
+                   description="summary: id, name, full_name and status only; full: with embedded document types")
+
+
+def _versioned_json_response(request: Request, etag: str, body: bytes) -> Response:
+    """Serves a cached JSON listing under an ETag that changes with every department write."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _summary_response(request: Request, active_only: bool) -> Response:
+    version, body = await DepartmentController.get_department_summaries(active_only)
+    return _versioned_json_response(request, f'"departments-{version}"', body)
+
+
 # ----------------------------------------
 # 🔹 Department CRUD
 # ----------------------------------------
 
-@router.get("/", response_model=List[DepartmentResponse])
-async def get_departments():
+@router.get("/", response_model=Union[List[DepartmentResponse], List[DepartmentSummary]])
+async def get_departments(request: Request, view: str = VIEW_QUERY):
+    if view == "summary":
+        return await _summary_response(request, active_only=False)
     return await DepartmentController.get_departments()
 
-@router.get("/active", response_model=List[DepartmentResponse])
-async def get_active_departments():
+@router.get("/active", response_model=Union[List[DepartmentResponse], List[DepartmentSummary]])
+async def get_active_departments(request: Request, view: str = VIEW_QUERY):
+    if view == "summary":
+        return await _summary_response(request, active_only=True)
     return await DepartmentController.get_active_departments() 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED, response_model=DepartmentResponse)
@@ -51,8 +76,9 @@ async def update_departments_status(
 # ----------------------------------------
 
 @router.get("/document-types", response_model=List[DocumentTypeWithDepartment])
-async def get_all_document_types():
-    return await DepartmentController.get_all_document_types_with_departments()
+async def get_all_document_types(request: Request):
+    (version, counters_version), body = await DepartmentController.get_all_document_types_with_departments()
+    return _versioned_json_response(request, f'"document-types-{version}-{counters_version}"', body)
 
 # ----------------------------------------
 # 🔹 Get Document Types by Department
@@ -1,10 +1,16 @@
 
-from datetime import datetime
-from fastapi import APIRouter, Path, Query, Form, File, UploadFile, Depends, HTTPException, status
-from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from urllib.parse import quote
+from fastapi import APIRouter, Path, Query, Form, File, UploadFile, Depends, HTTPException, Request, Response, status
+from typing import Dict, List, Optional, Tuple
 
 from motor.motor_asyncio import  AsyncIOMotorGridFSBucket
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, StreamingResponse
 
 from app.api.v1.controllers.document import DocumentController
 from app.core.database import MongoDB
@@ -14,6 +20,7 @@ from app.schemas.admin import AuthInAdminDB
 from app.schemas.document import (
     BulkDeleteRequest,
     BulkUpdateStatusRequest,
+    DocumentArchiveRequest,
     DocumentCreate,
     DocumentResponse,
     DocumentPaginationResponse,
@@ -21,11 +28,14 @@ from app.schemas.document import (
     DocumentUpdateAdmin,
 )
 from app.schemas.base import PyObjectId
+from app.schemas.integrity import IntegrityFailureListResponse
 
-from app.core.utils import  to_object_id
+from app.core.utils import  sign_file_url, to_object_id, verify_file_signature
 from app.core.config import settings
 from app.services.FileStorageService import FileStorageService
 from app.services.document import DocumentService
+from app.services.document_archive import DocumentArchiveService
+from app.services.integrity_scrubber import IntegrityScrubber
 
 router = APIRouter(
     prefix=f"{settings.API_V1_PREFIX}/document",
@@ -39,7 +49,7 @@ async def get_gridfs_bucket() -> AsyncIOMotorGridFSBucket:
     db = MongoDB.get_database()
     if db is None:
         raise HTTPException(status_code=500, detail="Database connection not established")
-    bucket = AsyncIOMotorGridFSBucket(db, bucket_name=settings.GRIDFS_BUCKET_NAME)
+    bucket = AsyncIOMotorGridFSBucket(db, bucket_name=settings.GRIDFS_BUCKET_NAME, chunk_size_bytes=settings.GRIDFS_CHUNK_SIZE_BYTES)
     return bucket
 
 
@@ -146,24 +156,261 @@ async def delete_document(
 async def bulk_delete_documents(bulk_delete: BulkDeleteRequest, current_user_data: AuthInAdminDB = Depends(get_current_user_from_header)):
     return await DocumentController.bulk_delete_documents(bulk_delete, current_user_data)
 
+@router.post("/files/archive")
+async def download_documents_archive(
+    archive_request: DocumentArchiveRequest,
+    current_user: AuthInAdminDB = Depends(get_current_user_from_header)
+):
+    """
+    Stream a ZIP of the attachments of the given documents, or of every document matching the filters.
+    Entries are named department/ref_no and a manifest.csv lists every selected document.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can download document archives")
+    archive_service = DocumentArchiveService()
+    documents = await archive_service.get_archive_documents(archive_request)
+    filename = f"documents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        archive_service.stream_archive(documents),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/files/integrity-failures", response_model=IntegrityFailureListResponse)
+async def get_integrity_failures(
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(50, ge=1, le=500, description="Failures per page"),
+    kind: Optional[str] = Query(None, description="missing, unreadable, checksum_mismatch or size_mismatch"),
+    current_user: AuthInAdminDB = Depends(get_current_user_from_header)
+):
+    """List attachments the integrity scrubber found missing or corrupted, with the scrubber's progress."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can view integrity failures")
+    return await IntegrityScrubber().get_failures(page, limit, kind)
+
 @router.post("/bulk-update-status", status_code=status.HTTP_200_OK)
 async def bulk_update_status(bulk_update: BulkUpdateStatusRequest, current_user_data: AuthInAdminDB = Depends(get_current_user_from_header)):
     return await DocumentController.bulk_update_status(bulk_update, current_user_data)
 
-@router.get("/{doc_id}/file")
-async def get_document_file(
-    doc_id: str,
-    document_service: DocumentService = Depends(get_document_service)
-):
-    print('DOCUMENT', doc_id)
-    document = await document_service.get_collection().find_one({"_id": to_object_id(doc_id)})
-    print('Document', document)
+def _is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluates If-None-Match, falling back to If-Modified-Since only when no ETag was sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single "bytes=" range into [start, end); None means the whole file is sent.
+    As RFC 9110 requires, a malformed range (e.g. "bytes=5-3") is ignored rather than
+    rejected; 416 is only for a valid range that starts past the end of the file.
+    Multi-range requests are answered with the whole file, which RFC 9110 allows.
+    """
+    if not range_header or not range_header.lower().startswith("bytes=") or "," in range_header:
+        return None
+    first, dash, last = range_header[len("bytes="):].strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if not dash or not (first or last) or any(part and not (part.isascii() and part.isdigit()) for part in (first, last)):
+        return None
+    if first and last and int(last) < int(first):
+        return None
+
+    if first:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+        satisfiable = start < size
+    else:
+        # A suffix range asks for the last N bytes, or the whole file when it is shorter
+        start, end = max(size - int(last), 0), size
+        satisfiable = int(last) > 0 and size > 0
+    if not satisfiable:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def _accepts_encoding(request: Request, encoding: str) -> bool:
+    """Whether Accept-Encoding lists the encoding (or *) without q=0."""
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() in (encoding, "*"):
+            quality = params.strip().lower()
+            if not quality.startswith("q="):
+                return True
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _file_etag(document: Dict, encoding: Optional[str], fallback: str) -> str:
+    """The stored SHA-256 is a strong validator; encoded bytes are a different representation and get their own tag."""
+    tag = document.get("file_checksum") or fallback
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+
+async def _document_file_response(request: Request, doc_id: str, document_service: DocumentService) -> Response:
+    """
+    Looks up a document's file and delivers it directly or through the reverse proxy per FILE_DELIVERY_MODE.
+    Compressed files go out as stored with Content-Encoding when the client accepts it, and are
+    streamed through decompression otherwise; they are never handed to the proxy.
+    """
+    document = await document_service.get_collection().find_one(
+        {"_id": to_object_id(doc_id)},
+        {"_id": 0, "file_path": 1, "file_size": 1, "file_checksum": 1, "file_encoding": 1}
+    )
     if not document or not document.get("file_path"):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
     file_storage = FileStorageService()
     file_path = file_storage.get_file_path(document["file_path"])
-    if not file_path.exists():
+    media_type = guess_type(document["file_path"])[0] or "application/octet-stream"
+    encoding = document.get("file_encoding")
+    if encoding and not _accepts_encoding(request, encoding):
+        return await _streamed_file_response(request, file_storage, document, media_type, decode=True)
+    if file_path is None:
+        return await _streamed_file_response(request, file_storage, document, media_type, decode=False)
+
+    # The proxy serves the bytes, including its own conditional and range handling. It only gets
+    # files stored as uploaded: it may drop or rewrite Content-Encoding and length headers
+    if not encoding and settings.FILE_DELIVERY_MODE == "x-accel-redirect":
+        relative_path = file_path.relative_to(file_storage.storage_path).as_posix()
+        internal_uri = settings.FILE_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relative_path)
+        return Response(headers={"X-Accel-Redirect": internal_uri}, media_type=media_type)
+    if not encoding and settings.FILE_DELIVERY_MODE == "x-sendfile":
+        return Response(headers={"X-Sendfile": str(file_path)}, media_type=media_type)
+    if encoding and settings.FILE_DELIVERY_MODE != "direct":
+        return await _streamed_file_response(request, file_storage, document, media_type, decode=False)
+
+    encoding_headers = {"Content-Encoding": encoding, "Vary": "Accept-Encoding"} if encoding else {}
+
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found on storage")
+
+    # Files saved before checksums existed fall back to mtime and size
+    etag = _file_etag(document, encoding, f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}")
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+        **encoding_headers,
+    }
+    if _is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Starlette answers a malformed Range with 400; RFC 9110 says to ignore it and send the whole file
+    range_header = request.headers.get("range")
+    if range_header is not None and request.headers.get("if-range") in (None, etag) \
+            and _parse_range(range_header, stat_result.st_size) is None:
+        request.scope["headers"] = [(name, value) for name, value in request.scope["headers"] if name != b"range"]
+
+    # FileResponse answers Range/If-Range requests with 206 (or 416) against these validators
+    return FileResponse(file_path, headers=headers, stat_result=stat_result, media_type=media_type)
+
+
+async def _streamed_file_response(request: Request, file_storage: FileStorageService, document: Dict,
+                                  media_type: str, decode: bool) -> Response:
+    """
+    Streams a file through the storage backend with the same validators and single-range support
+    as FileResponse: used for GridFS and S3, and for compressed files sent decompressed.
+    """
+    stat_result = await file_storage.stat_file(document["file_path"])
+    if stat_result is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found on storage")
 
-    return FileResponse(file_path)
\ No newline at end of file
+    encoding = document.get("file_encoding")
+    size = document["file_size"] if decode else stat_result["size"]
+    mtime = stat_result["last_modified"].timestamp()
+    etag = _file_etag(document, None if decode else encoding, f"{int(mtime * 1e9):x}-{size:x}")
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+        "Accept-Ranges": "bytes",
+    }
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+        if not decode:
+            headers["Content-Encoding"] = encoding
+    if _is_not_modified(request, etag, mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range == etag:
+        byte_range = _parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        start, end, status_code = 0, size, status.HTTP_200_OK
+    else:
+        (start, end), status_code = byte_range, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        file_storage.open_file(document["file_path"], start, end, encoding=encoding if decode else None),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
+
+
+@router.api_route("/{doc_id}/file", methods=["GET", "HEAD"])
+async def get_document_file(
+    doc_id: str,
+    request: Request,
+    document_service: DocumentService = Depends(get_document_service),
+    current_user: AuthInAdminDB = Depends(get_current_user_from_header)
+):
+    """Delivers a document's file to an authenticated user; clients without auth headers use /file/url."""
+    return await _document_file_response(request, doc_id, document_service)
+
+
+@router.get("/{doc_id}/file/url")
+async def get_document_file_url(
+    doc_id: str,
+    request: Request,
+    current_user: AuthInAdminDB = Depends(get_current_user_from_header)
+) -> dict:
+    """Issues a signed, expiring URL for clients that fetch the file without sending auth headers."""
+    if not settings.FILE_URL_SIGNING_KEY:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Signed file URLs are not configured")
+    to_object_id(doc_id)
+
+    expires = int(time.time()) + settings.FILE_URL_TTL_SECONDS
+    url = request.url_for("get_signed_document_file", doc_id=doc_id).include_query_params(
+        expires=expires, signature=sign_file_url(doc_id, expires)
+    )
+    return {"url": str(url), "expires_at": datetime.fromtimestamp(expires, tz=timezone.utc).isoformat()}
+
+
+@router.api_route("/{doc_id}/file/signed", methods=["GET", "HEAD"])
+async def get_signed_document_file(
+    doc_id: str,
+    request: Request,
+    expires: int = Query(..., description="Expiry as a Unix timestamp"),
+    signature: str = Query(..., description="HMAC signature issued by /file/url"),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    if not settings.FILE_URL_SIGNING_KEY or not verify_file_signature(doc_id, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid file signature")
+    if expires < time.time():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="File URL has expired")
+    return await _document_file_response(request, doc_id, document_service)
@@ -34,8 +34,64 @@ class Settings(BaseSettings):
     CORS_ORIGINS: List[str] = ["*"]
 
     # New storage-related settings
-    STORAGE_TYPE: str = "local"  # Options: "local" or others (e.g., "s3" for future expansion)
+    STORAGE_TYPE: str = "local"  # Options: "local", "gridfs" or "s3"
     STORAGE_PATH: str = "./storage"  # Default local storage path for dev
+    STORAGE_LAYOUT: str = "path"  # "path": department/year/ref_no.ext, "sharded": department/year/<aa>/<bb>/ref_no.ext, "content": deduplicated blobs/<sha256> with refcounts
+    STORAGE_QUARANTINE_PATH: str = "./storage_quarantine"  # Orphans moved aside by reconciliation; keep outside STORAGE_PATH
+    STORAGE_GC_SCAN_BATCH: int = 10000  # Directory entries read per scandir batch during reconciliation
+    STORAGE_GC_MIN_AGE_SECONDS: int = 3600  # Files younger than this are never treated as orphans
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes copied per read when saving an upload
+    MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # Uploads larger than this are rejected with 413
+    STORAGE_COMPRESSION: str = ""  # "" stores files as uploaded; "zstd" compresses STORAGE_COMPRESSION_TYPES at rest (requires zstandard)
+    STORAGE_COMPRESSION_LEVEL: int = 3  # zstd level; higher compresses more at a higher CPU cost
+    STORAGE_COMPRESSION_TYPES: List[str] = [  # .docx/.xlsx are zip containers already and gain little
+        "text/plain", "text/csv", "text/html", "text/xml", "application/xml", "application/json",
+        "application/msword", "application/rtf",
+    ]
+    GRIDFS_CHUNK_SIZE_BYTES: int = 255 * 1024  # GridFS chunk size for attachment storage and direct GridFS uploads
+
+    # S3-compatible object storage (STORAGE_TYPE="s3", requires boto3)
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = ""  # Set for MinIO or other S3-compatible services; empty uses AWS
+    S3_REGION: str = ""
+    S3_ACCESS_KEY_ID: str = ""  # Empty falls back to the default AWS credential chain
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # Uploads larger than this use multipart; S3 requires at least 5MB
+
+    # Attachment delivery
+    FILE_DELIVERY_MODE: str = "direct"  # "direct", "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd); proxy modes need local storage
+    FILE_ACCEL_REDIRECT_PREFIX: str = "/protected-files/"  # nginx internal location aliased to STORAGE_PATH
+    FILE_URL_SIGNING_KEY: str = ""  # HMAC key for signed download URLs; signed URLs are disabled while empty
+    FILE_URL_TTL_SECONDS: int = 300  # Lifetime of a signed download URL
+
+    # Attachment integrity scrubbing
+    SCRUB_ENABLED: bool = False  # Run the scrubber inside the API process; it can also run via app.services.integrity_scrubber
+    SCRUB_BATCH_SIZE: int = 200  # Documents checked between checkpoints
+    SCRUB_THREADS: int = 2  # Hashing threads
+    SCRUB_MAX_BYTES_PER_SECOND: int = 20 * 1024 * 1024  # Read budget shared by all hashing threads; 0 disables the limit
+    SCRUB_PASS_INTERVAL_SECONDS: int = 24 * 3600  # Pause between full passes
+    SCRUB_LEASE_SECONDS: int = 300  # Lease keeping other processes from scrubbing concurrently
+
+    # Attachment ZIP export
+    ARCHIVE_MAX_DOCUMENTS: int = 5000  # Largest number of documents one archive request may include
+    ARCHIVE_READ_CHUNK_SIZE: int = 256 * 1024  # Bytes read per file chunk
+    ARCHIVE_PREFETCH_FILES: int = 4  # Files read concurrently ahead of the one being zipped
+    ARCHIVE_PREFETCH_CHUNKS: int = 8  # Chunks buffered per prefetched file
+
+    # CSV document import pipeline
+    CSV_IMPORT_CHUNK_SIZE: int = 50000  # Rows parsed and transformed per chunk
+    CSV_IMPORT_INSERT_BATCH_SIZE: int = 5000  # Documents per insert_many call
+    CSV_IMPORT_MAX_CONCURRENT_INSERTS: int = 4  # insert_many calls in flight at once
+    CSV_IMPORT_QUEUE_SIZE: int = 2  # Transformed chunks buffered ahead of the writers
+    IMPORT_STAGING_PATH: str = "./import_staging"  # Uploaded CSVs kept here until their import job completes
+    IMPORT_STAGING_TTL_SECONDS: int = 7 * 24 * 3600  # Staged CSVs of failed jobs are removed after this; such jobs can no longer be resumed
+    IMPORT_REPORT_TTL_SECONDS: int = 24 * 3600  # Rejected-row reports written by dry runs are removed after this
+    IMPORT_JOB_LEASE_SECONDS: int = 120  # Lease on a running import job, renewed by its runner; expired leases are taken over by other processes
+
+    # Bulk attachment import
+    ATTACHMENT_IMPORT_PATH: str = "./attachment_imports"  # Server-side directories must live under this root
+    ATTACHMENT_IMPORT_BATCH_SIZE: int = 500  # Files resolved and committed per batch
+    ATTACHMENT_IMPORT_CONCURRENCY: int = 8  # Files written to storage at once
 
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
@@ -1,10 +1,13 @@
-from typing import Any, Coroutine
+import hashlib
+import hmac
+from typing import Any, Coroutine, Optional
 
 from bson import ObjectId
 from fastapi import HTTPException, status, UploadFile
 from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 import logging
 
+from app.core.config import settings
 from app.schemas.base import PyObjectId
 
 logger = logging.getLogger(__name__)
@@ -15,7 +18,46 @@ def to_object_id(value: str) -> ObjectId:
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
 
+def sign_file_url(doc_id: str, expires: int) -> str:
+    """HMAC-SHA256 signature binding a document's file download to an expiry timestamp."""
+    message = f"{doc_id}:{expires}".encode()
+    return hmac.new(settings.FILE_URL_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def verify_file_signature(doc_id: str, expires: int, signature: str) -> bool:
+    return hmac.compare_digest(sign_file_url(doc_id, expires), signature)
+
+# Leading bytes of the formats accepted for upload, checked instead of the client's Content-Type
+MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"PK\x03\x04", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+]
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Detects the content type from the first bytes of a file.
+    Plain text has no signature, so NUL-free UTF-8 is reported as text/plain.
+    """
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    if b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # The head may end in the middle of a multi-byte character
+        if e.start < len(head) - 3:
+            return None
+    return "text/plain"
+
 async def upload_file_to_gridfs(file: UploadFile, gridfs_bucket: AsyncIOMotorGridFSBucket,created_by: str) -> PyObjectId:
+    """
+    Streams an upload into GridFS in GRIDFS_CHUNK_SIZE_BYTES chunks. The type is sniffed from
+    the first chunk, and the upload is aborted as soon as it crosses the size limit.
+    """
     allowed_types = [
         "application/pdf",
         "application/msword",
@@ -23,36 +65,62 @@ async def upload_file_to_gridfs(file: UploadFile, gridfs_bucket: AsyncIOMotorGri
         "text/plain",
         "image/jpeg",
         "image/png",
-        "image/jpg",
     ]
     max_size = 10 * 1024 * 1024
+    chunk_size = settings.GRIDFS_CHUNK_SIZE_BYTES
 
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}")
-
-    content = await file.read()
-    if len(content) > max_size:
+    if file.size is not None and file.size > max_size:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File size exceeds 10MB limit")
 
+    chunk = await file.read(chunk_size)
+    content_type = sniff_content_type(chunk)
+    if content_type not in allowed_types:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}")
+
+    grid_in = gridfs_bucket.open_upload_stream(
+        file.filename,
+        chunk_size_bytes=chunk_size,
+        metadata={"content_type": content_type, "uploaded_by": created_by},
+    )
     try:
-        file_id = await gridfs_bucket.upload_from_stream(
-            filename=file.filename,
-            source=content,
-            metadata={"content_type": file.content_type , "uploaded_by": created_by},
-        )
-        return PyObjectId(file_id)
+        size = 0
+        while chunk:
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File size exceeds 10MB limit")
+            await grid_in.write(chunk)
+            chunk = await file.read(chunk_size)
+        await grid_in.close()
+        return PyObjectId(grid_in._id)
+    except HTTPException:
+        await grid_in.abort()
+        raise
     except Exception as e:
+        await grid_in.abort()
         logger.error(f"GridFS upload failed: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"GridFS upload failed: {str(e)}")
     
 
 class AsyncIteratorWrapper:
-    def __init__(self, stream):
+    """
+    Iterates a GridFS download stream, optionally only the byte range [start, end).
+    Reads default to the file's own chunk size so each read maps onto one stored chunk.
+    """
+    def __init__(self, stream, start: int = 0, end: Optional[int] = None, chunk_size: Optional[int] = None):
         self.stream = stream
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size or getattr(stream, "chunk_size", None) or 8192
 
     async def __aiter__(self):
-        while True:
-            chunk = await self.stream.read(8192)
+        if self.start:
+            self.stream.seek(self.start)
+        remaining = None if self.end is None else self.end - self.start
+        while remaining is None or remaining > 0:
+            size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+            chunk = await self.stream.read(size)
             if not chunk:
                 break
-            yield chunk
\ No newline at end of file
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
@@ -3,10 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware  # Import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 from app.core.database import MongoDB
+from app.models.blob import BlobModel
 from app.models.department import DepartmentModel
 from app.models.document import DocumentModel
+from app.models.import_job import ImportJobModel
+from app.models.integrity import IntegrityFailureModel
 from app.models.user import UserModel
 from app.api.v1.routers import admin, dataTransfer,  department, document
+from app.services.import_job import ImportJobService
+from app.services.integrity_scrubber import IntegrityScrubber
 from app.services.seed import seed_data
 from app.core.config import settings
 from app.core.logging import configure_logging
@@ -25,6 +30,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
         await DepartmentModel.ensure_indexes()
         await DocumentModel.ensure_indexes()
         await UserModel.ensure_indexes()
+        await ImportJobModel.ensure_indexes()
+        await BlobModel.ensure_indexes()
+        await IntegrityFailureModel.ensure_indexes()
         logger.info("Database indexes ensured")
 
         if settings.SEED_DATA_ON_STARTUP:
@@ -32,11 +40,21 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
             await seed_data()
             logger.info("Data seeding completed")
 
+        ImportJobService.start_background()
+        logger.info("Started import job sweeper")
+
+        if settings.SCRUB_ENABLED:
+            IntegrityScrubber.start_background()
+            logger.info("Started attachment integrity scrubber")
+
         yield
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
         raise
     finally:
+        await ImportJobService.stop_background()
+        await ImportJobService.cancel_running_jobs()
+        await IntegrityScrubber.stop_background()
         logger.info("Closing MongoDB connection...")
         await MongoDB.close_database_connection()
         logger.info("Application shutdown complete")
@@ -0,0 +1,11 @@
+from app.core.database import MongoDB
+
+
+class BlobModel:
+    COLLECTION_NAME = "blobs"
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        db = MongoDB.get_database()
+        await db[BlobModel.COLLECTION_NAME].create_index("checksum")
+        await db[BlobModel.COLLECTION_NAME].create_index("refcount")
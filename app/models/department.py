@@ -1,10 +1,43 @@
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
 from app.core.database import MongoDB
+
+logger = logging.getLogger(__name__)
+
+
 class DepartmentModel:
     COLLECTION_NAME = "departments"
+    # Single document counting department mutations, used to version cached listings
+    VERSION_COLLECTION_NAME = "department_versions"
+    # Case-insensitive name matching; name queries pass it to use the name_ci index
+    NAME_COLLATION = {"locale": "en", "strength": 2}
 
     @classmethod
     async def ensure_indexes(cls) -> None:
         db = MongoDB.get_database()
         await db[cls.COLLECTION_NAME].create_index("name", unique=True)
+        await cls._ensure_name_ci_index()
         await db[cls.COLLECTION_NAME].create_index("document_types.name", sparse=True)
-        await db[cls.COLLECTION_NAME].create_index("document_types.prefix", unique=True, sparse=True)
\ No newline at end of file
+        await db[cls.COLLECTION_NAME].create_index("document_types.prefix", unique=True, sparse=True)
+        # Legacy ids the CSV importer resolves departments and document types by
+        await db[cls.COLLECTION_NAME].create_index("inserted_id", unique=True, sparse=True)
+        await db[cls.COLLECTION_NAME].create_index("document_types.inserted_id", sparse=True)
+
+    @classmethod
+    async def _ensure_name_ci_index(cls) -> None:
+        """
+        Unique case-insensitive name index, so "Finance" and "FINANCE" cannot both exist.
+        Replaces the earlier non-unique name_ci index. When existing names already differ only
+        by case the index cannot be built; by-name lookups then stay correct but unindexed
+        until the duplicates are renamed.
+        """
+        collection = MongoDB.get_database()[cls.COLLECTION_NAME]
+        existing = (await collection.index_information()).get("name_ci")
+        if existing and not existing.get("unique"):
+            await collection.drop_index("name_ci")
+        try:
+            await collection.create_index("name", name="name_ci", unique=True, collation=cls.NAME_COLLATION)
+        except DuplicateKeyError as e:
+            logger.error(f"Department names differ only by case; rename them to enforce unique names: {str(e)}")
@@ -13,6 +13,10 @@ class DocumentModel:
         await db[DocumentModel.COLLECTION_NAME].create_index("document_type_id")
         await db[DocumentModel.COLLECTION_NAME].create_index("department_id")
         await db[DocumentModel.COLLECTION_NAME].create_index("ref_no")
+        # Legacy id from CSV imports; upsert re-imports are keyed on it
+        await db[DocumentModel.COLLECTION_NAME].create_index("inserted_id", unique=True, sparse=True)
+        # Storage reconciliation streams file_path values per directory with anchored prefix queries
+        await db[DocumentModel.COLLECTION_NAME].create_index("file_path", sparse=True)
         await db[DocumentModel.COLLECTION_NAME].create_index("status")
         await db[DocumentModel.COLLECTION_NAME].create_index("created_by")
         await db[DocumentModel.COLLECTION_NAME].create_index("filed_by")
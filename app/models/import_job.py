@@ -0,0 +1,11 @@
+from app.core.database import MongoDB
+
+
+class ImportJobModel:
+    COLLECTION_NAME = "import_jobs"
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        db = MongoDB.get_database()
+        await db[ImportJobModel.COLLECTION_NAME].create_index("status")
+        await db[ImportJobModel.COLLECTION_NAME].create_index("created_date")
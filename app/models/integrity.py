@@ -0,0 +1,13 @@
+from app.core.database import MongoDB
+
+
+class IntegrityFailureModel:
+    COLLECTION_NAME = "integrity_failures"
+    CHECKPOINT_COLLECTION_NAME = "integrity_checkpoints"
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        db = MongoDB.get_database()
+        # One open failure per document; a later clean check removes it
+        await db[IntegrityFailureModel.COLLECTION_NAME].create_index("document_id", unique=True)
+        await db[IntegrityFailureModel.COLLECTION_NAME].create_index([("kind", 1), ("last_checked", -1)])
@@ -112,6 +112,19 @@ class DepartmentResponse(DepartmentInDB):
     pass
 
 
+class DepartmentSummary(BaseModel):
+    id: PyObjectId = Field(..., alias="_id")
+    name: str = Field(..., description="Unique department name")
+    full_name: Optional[str] = Field(None, description="Full name of the department")
+    status: int = Field(..., description="Status of the department (0: inactive, 1: active)")
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str},
+        json_schema_extra={"example": {"_id": "66488b368a6801e71d70dfe9", "name": "TPG", "full_name": None, "status": 1}}
+    )
+
+
 class DepartmentStatusUpdate(BaseModel):
     departments: List[str]
     status: int
@@ -55,6 +55,10 @@ class DocumentInDB(Document):
     status: str = Field(default="Not Filed", description="Document status", pattern="^(Not Filed|Filed|Suspended)$")
 
     file_path: Optional[str] = Field(None, description="Relative path to the stored file")
+    file_size: Optional[int] = Field(None, description="Size of the stored file in bytes")
+    file_checksum: Optional[str] = Field(None, description="SHA-256 hex digest of the stored file")
+    file_encoding: Optional[str] = Field(None, description="Compression the file is stored with, e.g. zstd")
+    file_stored_size: Optional[int] = Field(None, description="Size of the file as stored, after compression")
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -196,4 +200,28 @@ class csvDocumentData(BaseModel):
     filed_date: Optional[datetime] = Field(None, description="Filing timestamp")
     status: Optional[str] = Field(None, description="Document status", pattern="^(Not Filed|Filed|Suspended)$")
     file_id: Optional[PyObjectId] = None
-    inserted_id: Optional[int] = Field(None, alias="inserted_id")
\ No newline at end of file
+    inserted_id: Optional[int] = Field(None, alias="inserted_id")
+
+
+class DocumentArchiveRequest(BaseModel):
+    document_ids: Optional[List[PyObjectId]] = Field(None, description="Documents to include; the filters are ignored when given")
+    search: Optional[str] = Field(None, description="Search query for title, ref_no, or created_by")
+    status: Optional[str] = Field(None, description="Document status", pattern="^(Not Filed|Filed|Suspended)$")
+    department_id: Optional[PyObjectId] = Field(None, description="Filter by department ID")
+    document_type_id: Optional[PyObjectId] = Field(None, description="Filter by document type ID")
+    filed_from: Optional[datetime] = Field(None, description="Only documents filed on or after this date")
+    filed_to: Optional[datetime] = Field(None, description="Only documents filed before this date")
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str, datetime: lambda dt: dt.isoformat()},
+        json_schema_extra={
+            "example": {
+                "status": "Filed",
+                "department_id": "682440853d6cd156e5585927",
+                "filed_from": "2025-05-01T00:00:00Z",
+                "filed_to": "2025-06-01T00:00:00Z"
+            }
+        }
+    )
@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from app.schemas.base import PyObjectId
+
+
+class ImportJobInDB(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    filename: str = Field(..., description="Name of the uploaded CSV file")
+    status: str = Field(..., description="Job status", pattern="^(queued|running|completed|failed)$")
+    mode: str = Field("insert", description="Write mode", pattern="^(insert|upsert)$")
+    chunk_size: int = Field(..., ge=1, description="Rows per chunk, fixed for the lifetime of the job")
+    committed_chunks: int = Field(0, ge=0, description="Number of leading chunks fully written; the resume offset")
+    rows_read: int = Field(0, description="Rows read from the CSV in committed chunks")
+    inserted_count: int = Field(0, description="Documents inserted")
+    updated_count: int = Field(0, description="Existing documents changed by an upsert")
+    unchanged_count: int = Field(0, description="Existing documents an upsert left as they were")
+    duplicate_count: int = Field(0, description="Rows an insert-mode import found already imported")
+    skipped_count: int = Field(0, description="Rows dropped by validation or mapping")
+    failed_count: int = Field(0, description="Rows rejected by the database")
+    error: Optional[str] = Field(None, description="Error message of the last failed run")
+    message: Optional[str] = Field(None, description="What to do about rows that were not written, if any")
+    created_date: datetime = Field(..., description="Creation timestamp")
+    started_date: Optional[datetime] = Field(None, description="Timestamp the job first started running")
+    updated_date: Optional[datetime] = Field(None, description="Timestamp of the last committed chunk")
+    finished_date: Optional[datetime] = Field(None, description="Completion or failure timestamp")
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str, datetime: lambda dt: dt.isoformat()}
+    )
+
+
+class ImportJobResponse(ImportJobInDB):
+    rows_per_second: float = Field(0.0, description="Average rows read per second since the job started")
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str, datetime: lambda dt: dt.isoformat()},
+        json_schema_extra={
+            "example": {
+                "_id": "66488b368a6801e71d70dfe9",
+                "filename": "approval_papers.csv",
+                "status": "running",
+                "mode": "upsert",
+                "chunk_size": 50000,
+                "committed_chunks": 4,
+                "rows_read": 200000,
+                "inserted_count": 1850,
+                "updated_count": 12000,
+                "unchanged_count": 186000,
+                "duplicate_count": 0,
+                "skipped_count": 150,
+                "failed_count": 0,
+                "created_date": "2025-05-15T13:00:00Z",
+                "started_date": "2025-05-15T13:00:01Z",
+                "updated_date": "2025-05-15T13:00:20Z",
+                "rows_per_second": 10526.3
+            }
+        }
+    )
+
+
+class DryRunSummary(BaseModel):
+    rows_read: int = Field(..., description="Rows read from the CSV")
+    valid_count: int = Field(..., description="Rows a real import would accept")
+    rejected_count: int = Field(..., description="Rows a real import would skip or fail on")
+    rejections: Dict[str, int] = Field(default_factory=dict, description="Rejected rows per rejection reason")
+
+
+class DryRunResponse(BaseModel):
+    dry_run: bool = Field(True, description="Always true; nothing was written")
+    rows_read: int = Field(..., description="Rows read from all files")
+    valid_count: int = Field(..., description="Rows a real import would accept")
+    rejected_count: int = Field(..., description="Rows a real import would skip or fail on")
+    report_id: Optional[str] = Field(None, description="Id of the rejected-rows CSV, when rows were rejected")
+    report_url: Optional[str] = Field(None, description="Download URL of the rejected-rows CSV")
+
+
+class DocumentDryRunResponse(DryRunResponse):
+    rejections: Dict[str, int] = Field(..., description="Rejected rows per rejection reason")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "dry_run": True,
+                "rows_read": 200000,
+                "valid_count": 199850,
+                "rejected_count": 150,
+                "rejections": {
+                    "missing_required_field": 20,
+                    "invalid_id": 0,
+                    "invalid_created_date": 5,
+                    "unknown_department": 0,
+                    "unknown_document_type": 100,
+                    "empty_title": 25
+                },
+                "report_id": "66488b368a6801e71d70dfea",
+                "report_url": "/api/v1/import-reports/66488b368a6801e71d70dfea"
+            }
+        }
+    )
+
+
+class DepartmentDryRunResponse(DryRunResponse):
+    files: Dict[str, DryRunSummary] = Field(..., description="Summary per uploaded file, keyed by form field")
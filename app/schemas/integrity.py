@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from app.schemas.base import PyObjectId
+
+
+class IntegrityFailureInDB(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    document_id: PyObjectId = Field(..., description="Document whose attachment failed the check")
+    file_path: str = Field(..., description="Relative path of the checked file")
+    kind: str = Field(..., description="Failure kind", pattern="^(missing|unreadable|checksum_mismatch|size_mismatch)$")
+    expected_checksum: Optional[str] = Field(None, description="SHA-256 recorded on the document")
+    actual_checksum: Optional[str] = Field(None, description="SHA-256 of the file as read")
+    expected_size: Optional[int] = Field(None, description="Size recorded on the document")
+    actual_size: Optional[int] = Field(None, description="Size of the file as read")
+    error: Optional[str] = Field(None, description="Read error for unreadable files")
+    first_detected: datetime = Field(..., description="When the failure was first found")
+    last_checked: datetime = Field(..., description="When the file last failed the check")
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str, datetime: lambda dt: dt.isoformat()}
+    )
+
+
+class IntegrityScrubPass(BaseModel):
+    started: datetime = Field(..., description="Start of the pass")
+    finished: datetime = Field(..., description="End of the pass")
+    checked: int = Field(..., description="Files checked")
+    failed: int = Field(..., description="Files that failed the check")
+    bytes_read: int = Field(..., description="Bytes read while checking")
+
+
+class IntegrityCheckpoint(BaseModel):
+    last_id: Optional[PyObjectId] = Field(None, description="Last document checked in the current pass")
+    pass_started: datetime = Field(..., description="Start of the current pass")
+    checked: int = Field(0, description="Files checked so far in the current pass")
+    failed: int = Field(0, description="Failures found so far in the current pass")
+    bytes_read: int = Field(0, description="Bytes read so far in the current pass")
+    lease_until: Optional[datetime] = Field(None, description="Until when the current scrubber holds the lease")
+    updated_date: Optional[datetime] = Field(None, description="Time of the last checkpoint")
+    next_pass: Optional[datetime] = Field(None, description="Earliest start of the next pass")
+    last_pass: Optional[IntegrityScrubPass] = Field(None, description="Summary of the last completed pass")
+
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str, datetime: lambda dt: dt.isoformat()}
+    )
+
+
+class IntegrityFailureListResponse(BaseModel):
+    total: int = Field(..., description="Total number of failures matching the query")
+    page: int = Field(..., description="Current page number")
+    limit: int = Field(..., description="Maximum number of failures per page")
+    pages: int = Field(..., description="Total number of pages")
+    failures: List[IntegrityFailureInDB] = Field(..., description="Failures in the current page, most recent first")
+    checkpoint: Optional[IntegrityCheckpoint] = Field(None, description="Progress of the scrubber")
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str, datetime: lambda dt: dt.isoformat()}
+    )
@@ -1,21 +1,57 @@
+import asyncio
+import hashlib
+import logging
 import os
-import aiofiles
+from datetime import datetime, timedelta, timezone
+
 from fastapi import UploadFile, HTTPException, status
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 import re
 
-from app.core.config import Settings
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.models.blob import BlobModel
+from app.services.storage_backends import READ_CHUNK_SIZE, get_storage_backend
+from app.services.storage_compression import CompressedStream, compression_for, decompress_chunks
+
+logger = logging.getLogger(__name__)
+
+# Top-level directory of content-addressed blobs; path-layout files never live under it
+BLOB_PREFIX = "blobs"
+# How often store_blob checks whether a blob being deleted is gone
+BLOB_DELETE_POLL_SECONDS = 0.05
+# A deletion marked longer ago than this is assumed abandoned and finished by the next store_blob
+BLOB_DELETE_STALE_SECONDS = 60
+
+
+class _UploadStream:
+    """Iterates an upload in UPLOAD_CHUNK_SIZE chunks, enforcing MAX_UPLOAD_SIZE and hashing as it goes."""
+    def __init__(self, file: UploadFile):
+        self.file = file
+        self.size = 0
+        self.checksum = hashlib.sha256()
+
+    async def __aiter__(self):
+        while chunk := await self.file.read(settings.UPLOAD_CHUNK_SIZE):
+            self.size += len(chunk)
+            if self.size > settings.MAX_UPLOAD_SIZE:
+                raise FileStorageService._too_large()
+            self.checksum.update(chunk)
+            yield chunk
 
-settings = Settings()
 
 class FileStorageService:
     def __init__(self):
         # Resolve and create base storage directory
         self.storage_path = Path(settings.STORAGE_PATH).resolve()
         self.storage_type = settings.STORAGE_TYPE
-        if self.storage_type == "local":
-            os.makedirs(self.storage_path, exist_ok=True)
+        self.layout = settings.STORAGE_LAYOUT
+        self.backend = get_storage_backend()
 
     def _sanitize_name(self, name: str) -> str:
         """Sanitize department name or ref_no for filesystem compatibility."""
@@ -27,15 +63,24 @@ class FileStorageService:
             raise HTTPException(status_code=400, detail="Invalid name for filesystem")
         return sanitized
 
-    async def save_file(self, file: UploadFile, department_name: str, ref_no: str, created_date: str) -> str:
-        """Save the uploaded file to department_name/year/ref_no.extension and return the relative path."""
-        if self.storage_type != "local":
-            raise HTTPException(status_code=400, detail="Only local storage is supported in this configuration")
-
+    async def save_file(self, file: UploadFile, department_name: str, ref_no: str, created_date: str) -> Dict[str, Any]:
+        """
+        Save the uploaded file to department_name/year/ref_no.extension, below two hash-prefix
+        directories when STORAGE_LAYOUT is "sharded", or to a deduplicated blob keyed by its
+        SHA-256 when STORAGE_LAYOUT is "content".
+        The upload is streamed to the storage backend in UPLOAD_CHUNK_SIZE pieces and a failed or
+        oversized upload never replaces an existing file. Returns the relative path together with
+        the byte size and SHA-256 checksum computed while streaming, and the encoding and size
+        the file was stored with.
+        """
         # Validate inputs
         if not department_name or not ref_no or not created_date:
             raise HTTPException(status_code=400, detail="Department name, reference number, and created date are required")
 
+        # Reject early when the multipart parser already knows the upload is too large
+        if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+            raise self._too_large()
+
         # Sanitize department name and ref_no
         sanitized_dept_name = self._sanitize_name(department_name)
         sanitized_ref_no = self._sanitize_name(ref_no)
@@ -53,40 +98,246 @@ class FileStorageService:
 
         filename = f"{sanitized_ref_no}{file_extension}"
 
-        # Build folder structure: STORAGE_PATH/department_name/year/
-        department_path = self.storage_path / sanitized_dept_name / year
-        os.makedirs(department_path, exist_ok=True)
-
-        # Full file path
-        file_path = department_path / filename
-
         try:
-            async with aiofiles.open(file_path, "wb") as out_file:
-                content = await file.read()
-                await out_file.write(content)
-            # Return relative path from storage_path
-            return str(file_path.relative_to(self.storage_path))
+            if self.layout == "content":
+                # Hash first so content that is already stored is never uploaded again
+                measured = _UploadStream(file)
+                async for _ in measured:
+                    pass
+                await file.seek(0)
+                stored_file, _ = await self.store_blob(
+                    _UploadStream(file), measured.checksum.hexdigest(), measured.size, file_extension, file.content_type
+                )
+                return stored_file
+
+            # Folder structure: department_name/year/ref_no.extension
+            relative_path = f"{sanitized_dept_name}/{year}/{filename}"
+            if self.layout == "sharded":
+                relative_path = self.sharded_path(relative_path)
+            encoding = compression_for(filename)
+            stream = _UploadStream(file)
+            chunks = stream if encoding is None else CompressedStream(stream)
+            await self.backend.put(relative_path, chunks, file.content_type)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to save file: {str(e)}"
             )
 
-    async def delete_file(self, relative_path: str) -> None:
-        """Delete a file from storage."""
-        if self.storage_type != "local":
-            raise HTTPException(status_code=400, detail="Only local storage is supported in this configuration")
+        return {
+            "file_path": relative_path,
+            "file_size": stream.size,
+            "file_checksum": stream.checksum.hexdigest(),
+            "file_encoding": encoding,
+            "file_stored_size": stream.size if encoding is None else chunks.size,
+        }
+
+    @staticmethod
+    def shard_dirs(filename: str) -> str:
+        """Two levels of hash-prefix directories, keeping each directory to a few thousand files."""
+        digest = hashlib.sha256(filename.encode()).hexdigest()
+        return f"{digest[:2]}/{digest[2:4]}"
+
+    @classmethod
+    def sharded_path(cls, relative_path: str) -> Optional[str]:
+        """Sharded location of a flat department/year/filename path, or None when the path is not flat."""
+        parts = PurePosixPath(relative_path).parts
+        if len(parts) != 3 or parts[0] == BLOB_PREFIX:
+            return None
+        department, year, filename = parts
+        return f"{department}/{year}/{cls.shard_dirs(filename)}/{filename}"
+
+    @classmethod
+    def alternate_path(cls, relative_path: str) -> Optional[str]:
+        """The same file's location in the other of the path and sharded layouts."""
+        parts = PurePosixPath(relative_path).parts
+        if len(parts) == 5 and parts[0] != BLOB_PREFIX and f"{parts[2]}/{parts[3]}" == cls.shard_dirs(parts[4]):
+            return f"{parts[0]}/{parts[1]}/{parts[4]}"
+        return cls.sharded_path(relative_path)
+
+    def get_blob_collection(self):
+        return MongoDB.get_database()[BlobModel.COLLECTION_NAME]
 
-        file_path = self.storage_path / relative_path
+    @staticmethod
+    def is_blob_path(relative_path: str) -> bool:
+        return PurePosixPath(relative_path).parts[:1] == (BLOB_PREFIX,)
+
+    @staticmethod
+    def blob_path(checksum: str, extension: str) -> str:
+        """Relative location of a blob, fanned out on the first two checksum bytes."""
+        return f"{BLOB_PREFIX}/{checksum[:2]}/{checksum[2:4]}/{checksum}{extension.lower()}"
+
+    async def store_blob(self, chunks: AsyncIterator[bytes], checksum: str, size: int, extension: str,
+                         content_type: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Takes one reference on the blob for checksum, uploading chunks only when the blob is not stored yet.
+        Returns the file fields for the referencing document and whether this call created the blob.
+        A blob keeps the encoding it was first stored with.
+        The reference is counted before the upload so a concurrent release can never see the
+        count hit zero while the new reference is being taken; re-uploading an existing blob
+        is harmless because the content is identical. A blob that a release is deleting cannot
+        take references: store_blob waits until its file and record are gone and stores it afresh.
+        """
+        relative_path = self.blob_path(checksum, extension)
+        blobs = self.get_blob_collection()
+        created = await self._reference_blob(relative_path, checksum, size)
+        try:
+            blob = await blobs.find_one({"_id": relative_path}, {"encoding": 1, "stored_size": 1})
+            encoding = blob.get("encoding")
+            stored_size = blob.get("stored_size", size)
+            if created or await self.backend.stat(relative_path) is None:
+                if encoding is not None:
+                    chunks = CompressedStream(chunks)
+                await self.backend.put(relative_path, chunks, content_type)
+                stored_size = size if encoding is None else chunks.size
+                await blobs.update_one({"_id": relative_path}, {"$set": {"stored_size": stored_size}})
+        except BaseException:
+            await blobs.update_one({"_id": relative_path}, {"$inc": {"refcount": -1}})
+            raise
+        return {
+            "file_path": relative_path,
+            "file_size": size,
+            "file_checksum": checksum,
+            "file_encoding": encoding,
+            "file_stored_size": stored_size,
+        }, created
+
+    async def _reference_blob(self, relative_path: str, checksum: str, size: int) -> bool:
+        """Adds one reference to a blob record, creating it if needed; returns whether it was created."""
+        blobs = self.get_blob_collection()
+        while True:
+            try:
+                # A record marked for deletion does not match, so the upsert collides with it
+                result = await blobs.update_one(
+                    {"_id": relative_path, "deleting": None},
+                    {
+                        "$inc": {"refcount": 1},
+                        "$setOnInsert": {
+                            "checksum": checksum,
+                            "size": size,
+                            "encoding": compression_for(relative_path),
+                            "created_date": datetime.now(),
+                        },
+                    },
+                    upsert=True
+                )
+                return result.upserted_id is not None
+            except DuplicateKeyError:
+                blob = await blobs.find_one({"_id": relative_path}, {"deleting": 1})
+                deleting = blob.get("deleting") if blob else None
+                stale_before = datetime.now(timezone.utc) - timedelta(seconds=BLOB_DELETE_STALE_SECONDS)
+                if deleting is not None and deleting.generation_time < stale_before:
+                    logger.warning(f"Finishing abandoned deletion of blob {relative_path}")
+                    await self._delete_blob(relative_path, deleting)
+                else:
+                    await asyncio.sleep(BLOB_DELETE_POLL_SECONDS)
+
+    async def _delete_blob(self, relative_path: str, deleting: ObjectId) -> None:
+        """Deletes a blob marked for deletion: the file first, then the record that blocks new references."""
+        await self.backend.delete(relative_path)
+        await self.get_blob_collection().delete_one({"_id": relative_path, "deleting": deleting})
+
+    async def _release_blob(self, relative_path: str) -> None:
+        """
+        Drops one reference to a blob and deletes it once nothing refers to it.
+        The record is marked for deletion before the file is deleted and only removed afterwards,
+        so a concurrent store_blob of the same content waits and uploads it again instead of
+        referencing a file that is about to disappear.
+        """
+        blobs = self.get_blob_collection()
+        blob = await blobs.find_one_and_update(
+            {"_id": relative_path},
+            {"$inc": {"refcount": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if blob is None:
+            logger.warning(f"Blob {relative_path} has no reference count; leaving it in place")
+            return
+        if blob["refcount"] > 0:
+            return
+
+        deleting = ObjectId()
+        marked = await blobs.update_one(
+            {"_id": relative_path, "refcount": {"$lte": 0}, "deleting": None},
+            {"$set": {"deleting": deleting}}
+        )
+        if marked.modified_count:
+            await self._delete_blob(relative_path, deleting)
+
+    @staticmethod
+    def _too_large() -> HTTPException:
+        limit_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds {limit_mb:g}MB limit"
+        )
+
+    async def delete_file(self, relative_path: str) -> None:
+        """Delete a file from storage; blobs only lose a reference and are deleted at zero."""
         try:
-            if file_path.exists():
-                os.remove(file_path)
+            if self.is_blob_path(relative_path):
+                await self._release_blob(relative_path)
+            else:
+                await self.backend.delete(relative_path)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to delete file: {str(e)}"
             )
 
-    def get_file_path(self, relative_path: str) -> Path:
-        """Get the absolute path for a stored file."""
-        return self.storage_path / relative_path
\ No newline at end of file
+    async def release_replaced_file(self, old_path: Optional[str], new_path: str) -> None:
+        """
+        Releases a document's previous file after a new one was saved for it.
+        A path-layout file saved to the same path was overwritten in place and must not be
+        deleted, while a blob always gave up the reference the document held.
+        """
+        if old_path and (old_path != new_path or self.is_blob_path(old_path)):
+            await self.delete_file(old_path)
+
+    # Reads fall back to alternate_path() so a file_path read just before or after the
+    # sharding migration moved the file keeps resolving.
+
+    async def open_file(self, relative_path: str, start: int = 0, end: Optional[int] = None,
+                        chunk_size: int = READ_CHUNK_SIZE, encoding: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Streams a stored file, or the [start, end) byte range of it, from the storage backend.
+        Pass the document's file_encoding to get the original bytes of a compressed file;
+        without it the bytes are returned as stored.
+        """
+        started = False
+        try:
+            async for chunk in self._read(relative_path, start, end, chunk_size, encoding):
+                started = True
+                yield chunk
+        except FileNotFoundError:
+            alternate = self.alternate_path(relative_path)
+            if started or alternate is None:
+                raise
+            async for chunk in self._read(alternate, start, end, chunk_size, encoding):
+                yield chunk
+
+    def _read(self, relative_path: str, start: int, end: Optional[int], chunk_size: int,
+              encoding: Optional[str]) -> AsyncIterator[bytes]:
+        if encoding is None:
+            return self.backend.get(relative_path, start, end, chunk_size)
+        return decompress_chunks(self.backend.get(relative_path, chunk_size=chunk_size), start, end)
+
+    async def stat_file(self, relative_path: str) -> Optional[Dict[str, Any]]:
+        """Size and last-modified time of a stored file, or None when it does not exist."""
+        stat_result = await self.backend.stat(relative_path)
+        alternate = self.alternate_path(relative_path)
+        if stat_result is None and alternate is not None:
+            stat_result = await self.backend.stat(alternate)
+        return stat_result
+
+    def get_file_path(self, relative_path: str) -> Optional[Path]:
+        """Get the absolute path for a stored file, or None when the backend is not a local disk."""
+        file_path = self.backend.local_path(relative_path)
+        alternate = self.alternate_path(relative_path)
+        if file_path is not None and alternate is not None and not file_path.exists():
+            alternate_file = self.backend.local_path(alternate)
+            if alternate_file.exists():
+                return alternate_file
+        return file_path
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile, status
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.core.exceptions import handle_service_exception
+from app.models.document import DocumentModel
+from app.services.FileStorageService import FileStorageService
+
+logger = logging.getLogger(__name__)
+
+
+class AttachmentImportService:
+    """
+    Attaches legacy scans to documents in bulk. Files are named by ref_no, either as a
+    path ("TPG-TC/01/25.pdf") or a flat name using "_" for "/" ("TPG-TC_01_25.pdf"),
+    and come from a ZIP archive or a directory under ATTACHMENT_IMPORT_PATH.
+    """
+    def get_document_collection(self):
+        return MongoDB.get_database()[DocumentModel.COLLECTION_NAME]
+
+    def get_department_collection(self):
+        return MongoDB.get_database()["departments"]
+
+    @staticmethod
+    def _ref_no_candidates(relative_name: str) -> List[str]:
+        """Possible ref_nos for an archive or directory entry, most specific first."""
+        path = PurePosixPath(relative_name)
+        without_extension = str(path.with_suffix(""))
+        candidates = [without_extension, path.stem, path.stem.replace("_", "/")]
+        return list(dict.fromkeys(candidates))
+
+    @staticmethod
+    def _is_attachment(relative_name: str) -> bool:
+        parts = PurePosixPath(relative_name).parts
+        return bool(parts) and not any(part.startswith(".") or part == "__MACOSX" for part in parts)
+
+    def _resolve_directory(self, directory: str) -> Path:
+        root = Path(settings.ATTACHMENT_IMPORT_PATH).resolve()
+        source = (root / directory).resolve()
+        if source != root and root not in source.parents:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Directory must be inside the attachment import path")
+        if not source.is_dir():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Directory not found")
+        return source
+
+    @staticmethod
+    def _list_directory(source: Path) -> List[str]:
+        entries = []
+        pending = [source]
+        while pending:
+            with os.scandir(pending.pop()) as scanner:
+                for entry in scanner:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        entries.append(Path(entry.path).relative_to(source).as_posix())
+        return sorted(entries)
+
+    async def import_attachments(self, archive: Optional[UploadFile] = None, directory: Optional[str] = None,
+                                 overwrite: bool = False) -> Dict[str, Any]:
+        """
+        Matches every file to a document by ref_no and stores it through FileStorageService.
+        Ref_nos are resolved with one $in query per batch, files are written by a bounded
+        pool of workers, and file_path is set with one bulk_write per batch. Only the first
+        file matching a ref_no is stored; later ones are reported as conflicts.
+        """
+        if (archive is None) == (directory is None):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide either a ZIP archive or a directory")
+
+        try:
+            if archive is not None:
+                if not archive.filename.lower().endswith(".zip"):
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Archive must be a ZIP file")
+                try:
+                    zip_file = await asyncio.to_thread(zipfile.ZipFile, archive.file)
+                except zipfile.BadZipFile:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ZIP archive")
+                with zip_file:
+                    names = [info.filename for info in zip_file.infolist() if not info.is_dir()]
+                    return await self._import_entries(names, zip_file.open, overwrite)
+
+            source = self._resolve_directory(directory)
+            names = await asyncio.to_thread(self._list_directory, source)
+            return await self._import_entries(names, lambda name: open(source / name, "rb"), overwrite)
+        except Exception as e:
+            handle_service_exception(e)
+
+    async def _import_entries(self, names: List[str], open_entry: Callable[[str], BinaryIO],
+                              overwrite: bool) -> Dict[str, Any]:
+        names = [name for name in names if self._is_attachment(name)]
+        department_names = {
+            dept["_id"]: dept["name"]
+            async for dept in self.get_department_collection().find({}, {"_id": 1, "name": 1})
+        }
+        report = {
+            "total_files": len(names),
+            "stored_count": 0,
+            "skipped_existing": [],
+            "conflicting_files": [],
+            "unmatched_files": [],
+            "failed_files": [],
+        }
+        semaphore = asyncio.Semaphore(settings.ATTACHMENT_IMPORT_CONCURRENCY)
+        batch_size = settings.ATTACHMENT_IMPORT_BATCH_SIZE
+        # ref_no -> the file claimed for it, so two files never write the same document concurrently
+        claimed: Dict[str, str] = {}
+
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            candidates = {name: self._ref_no_candidates(name) for name in batch}
+            all_ref_nos = list({ref_no for refs in candidates.values() for ref_no in refs})
+            documents = {
+                doc["ref_no"]: doc
+                async for doc in self.get_document_collection().find(
+                    {"ref_no": {"$in": all_ref_nos}},
+                    {"_id": 1, "ref_no": 1, "department_id": 1, "created_date": 1, "file_path": 1}
+                )
+            }
+
+            matches = []
+            for name in batch:
+                document = next((documents[ref] for ref in candidates[name] if ref in documents), None)
+                if document is None:
+                    report["unmatched_files"].append(name)
+                elif document["ref_no"] in claimed:
+                    report["conflicting_files"].append({"file": name, "ref_no": document["ref_no"],
+                                                        "imported_file": claimed[document["ref_no"]]})
+                elif document.get("file_path") and not overwrite:
+                    report["skipped_existing"].append(name)
+                else:
+                    claimed[document["ref_no"]] = name
+                    matches.append((name, document))
+
+            results = await asyncio.gather(*[
+                self._store_entry(name, document, department_names, open_entry, semaphore)
+                for name, document in matches
+            ])
+
+            operations = []
+            replaced_paths = []
+            for (name, document), (stored_file, error) in zip(matches, results):
+                if error:
+                    report["failed_files"].append({"file": name, "error": error})
+                    continue
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": stored_file}))
+                if document.get("file_path"):
+                    replaced_paths.append((document["file_path"], stored_file["file_path"]))
+
+            if operations:
+                await self.get_document_collection().bulk_write(operations, ordered=False)
+                report["stored_count"] += len(operations)
+
+            file_storage = FileStorageService()
+            for old_path, new_path in replaced_paths:
+                try:
+                    await file_storage.release_replaced_file(old_path, new_path)
+                except Exception as e:
+                    logger.warning(f"Failed to delete replaced file {old_path}: {str(e)}")
+
+            logger.info(f"Attachment import: {start + len(batch)}/{len(names)} files processed")
+
+        report["matched_count"] = (report["stored_count"] + len(report["failed_files"]) + len(report["skipped_existing"])
+                                   + len(report["conflicting_files"]))
+        return report
+
+    async def _store_entry(self, name: str, document: dict, department_names: Dict, open_entry: Callable[[str], BinaryIO],
+                           semaphore: asyncio.Semaphore) -> tuple[Optional[Dict], Optional[str]]:
+        """Writes one file for a document; returns (stored_file, None) or (None, error)."""
+        async with semaphore:
+            try:
+                department_name = department_names.get(document["department_id"], "Unknown")
+                created_date = document["created_date"].isoformat() if isinstance(document["created_date"], datetime) \
+                    else document["created_date"]
+                source = await asyncio.to_thread(open_entry, name)
+                try:
+                    upload = UploadFile(file=source, filename=PurePosixPath(name).name)
+                    stored_file = await FileStorageService().save_file(upload, department_name, document["ref_no"], created_date)
+                finally:
+                    source.close()
+                return stored_file, None
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                logger.warning(f"Failed to import attachment {name}: {error}")
+                return None, error
@@ -0,0 +1,121 @@
+"""
+Converts path-layout attachments (department/year/ref_no.ext) into content-addressed blobs.
+
+Each file is hashed, copied into blobs/ through the configured storage backend unless the
+blob already exists, counted in the ``blobs`` collection and repointed on its document before
+the old path is deleted, so an interrupted run can simply be started again. Identical files
+collapse into one blob.
+
+Usage:
+    python -m app.services.blob_migration [--batch-size 500] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.models.blob import BlobModel
+from app.services.FileStorageService import BLOB_PREFIX, FileStorageService
+
+logger = logging.getLogger(__name__)
+
+
+async def _hash_file(storage: FileStorageService, relative_path: str, encoding: Optional[str]) -> Tuple[str, int]:
+    checksum = hashlib.sha256()
+    size = 0
+    async for chunk in storage.open_file(relative_path, chunk_size=settings.UPLOAD_CHUNK_SIZE, encoding=encoding):
+        checksum.update(chunk)
+        size += len(chunk)
+    return checksum.hexdigest(), size
+
+
+async def _migrate_document(storage: FileStorageService, document: Dict, report: Dict) -> None:
+    old_path = document["file_path"]
+    if await storage.stat_file(old_path) is None:
+        report["missing_files"].append(old_path)
+        return
+
+    # Compressed files are decoded so the blob is keyed by the original content
+    encoding = document.get("file_encoding")
+    checksum, size = await _hash_file(storage, old_path, encoding)
+    stored_file, created = await storage.store_blob(
+        storage.open_file(old_path, chunk_size=settings.UPLOAD_CHUNK_SIZE, encoding=encoding),
+        checksum, size, os.path.splitext(old_path)[1]
+    )
+    new_path = stored_file["file_path"]
+
+    # Only repoint the document if nobody replaced its file meanwhile; otherwise give the reference back
+    result = await MongoDB.get_database()["documents"].update_one(
+        {"_id": document["_id"], "file_path": old_path},
+        {"$set": stored_file}
+    )
+    if result.matched_count == 0:
+        await storage.delete_file(new_path)
+        return
+
+    await storage.delete_file(old_path)
+    report["migrated_count"] += 1
+    if not created:
+        report["deduplicated_count"] += 1
+        report["bytes_reclaimed"] += size
+
+
+async def migrate_to_blobs(batch_size: int = 500, concurrency: int = 4) -> Dict:
+    """Migrates every document whose file_path is not yet a blob; returns a summary report."""
+    storage = FileStorageService()
+    report = {"migrated_count": 0, "deduplicated_count": 0, "bytes_reclaimed": 0, "missing_files": [], "failed_files": []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def migrate(document: Dict) -> None:
+        async with semaphore:
+            try:
+                await _migrate_document(storage, document, report)
+            except Exception as e:
+                logger.warning(f"Failed to migrate {document['file_path']}: {str(e)}")
+                report["failed_files"].append({"file": document["file_path"], "error": str(e)})
+
+    query = {"file_path": {"$nin": [None, ""], "$not": {"$regex": f"^{BLOB_PREFIX}/"}}}
+    cursor = MongoDB.get_database()["documents"].find(query, {"_id": 1, "file_path": 1, "file_encoding": 1}).batch_size(batch_size)
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await asyncio.gather(*(migrate(doc) for doc in batch))
+            batch = []
+            logger.info(f"Blob migration: {report['migrated_count']} files migrated")
+    if batch:
+        await asyncio.gather(*(migrate(doc) for doc in batch))
+
+    logger.info(
+        f"Blob migration finished: {report['migrated_count']} migrated, "
+        f"{report['deduplicated_count']} deduplicated, {report['bytes_reclaimed']} bytes reclaimed"
+    )
+    return report
+
+
+async def run_migration(batch_size: int, concurrency: int) -> Dict:
+    await MongoDB.connect_to_database()
+    try:
+        await BlobModel.ensure_indexes()
+        return await migrate_to_blobs(batch_size, concurrency)
+    finally:
+        await MongoDB.close_database_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move path-layout attachments into content-addressed blobs")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents read per batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Files hashed and moved at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    report = asyncio.run(run_migration(args.batch_size, args.concurrency))
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,41 @@
+import asyncio
 from datetime import datetime
 import io
+import logging
+import os
+import time
+from pathlib import Path
 import pandas as pd
-from typing import Any, List, Dict, Coroutine
+from typing import Any, Awaitable, BinaryIO, Callable, List, Dict, Coroutine, Optional
 from bson import ObjectId
 from fastapi import HTTPException, UploadFile, status
 from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
 
+from app.core.config import settings
 from app.core.database import MongoDB
 from app.core.exceptions import handle_service_exception
+from app.core.utils import to_object_id
 from app.schemas.admin import AdminUser
 from app.schemas.base import PyObjectId
 from app.schemas.department import csvDepartment
 from app.schemas.document import csvDocumentData
 from app.services.department import DepartmentService
 
+logger = logging.getLogger(__name__)
+
+DOCUMENT_CSV_COLUMNS = ["id", "RefNo", "Title", "StatusID", "CreatedBy", "CreatedDate",
+                        "FiledBy", "FiledDate", "DocumentTypeID", "DepartmentID"]
+DOCUMENT_REQUIRED_COLUMNS = ["id", "RefNo", "Title", "StatusID", "CreatedBy", "CreatedDate",
+                             "DocumentTypeID", "DepartmentID"]
+DOCUMENT_REJECTION_REASONS = ("missing_required_field", "invalid_id", "invalid_created_date",
+                              "unknown_department", "unknown_document_type", "empty_title")
+
+DOCUMENT_IMPORT_MODES = {"insert", "upsert"}
+WRITE_COUNT_KEYS = ("inserted_count", "updated_count", "unchanged_count", "duplicate_count", "failed_count")
+DUPLICATE_KEY_ERROR = 11000
+DUPLICATE_IMPORT_MESSAGE = "{count} rows were already imported; re-run the import with mode=upsert to update them"
+
 
 class CSVImportService:
     """
@@ -66,7 +88,7 @@ class CSVImportService:
                 df.columns = df.columns.str.strip()
 
             # 3. Process Data in Memory
-            dept_lookup = {row['id']: row['name'] for _, row in departments_df.iterrows()}
+            dept_lookup = dict(zip(departments_df['id'].tolist(), departments_df['name'].tolist()))
             prefix_lookup = self._build_prefix_lookup(generated_ids_df)
             dept_doc_types = self._build_dept_doc_types(document_types_df, dept_lookup, prefix_lookup)
 
@@ -133,6 +155,7 @@ class CSVImportService:
             if bulk_operations:
                 print(f"Executing bulk write for {len(bulk_operations)} departments...")
                 await self.get_department_collection().bulk_write(bulk_operations)
+                await DepartmentService().bump_version()
                 print("Bulk write complete.")
 
                 # 6. Fetch updated documents and convert for response
@@ -157,150 +180,572 @@ class CSVImportService:
 
     def _build_prefix_lookup(self, generated_ids_df: pd.DataFrame) -> dict:
         """Helper to build a lookup dictionary for prefix information."""
-        prefix_lookup = {}
-        for _, gen_row in generated_ids_df.iterrows():
-            doc_type_id = gen_row['documenttypeid']
-            year = str(int(gen_row['year']))
-            if doc_type_id not in prefix_lookup:
-                prefix_lookup[doc_type_id] = {
-                    'prefix': gen_row['prefix'],
-                    'padding': int(gen_row['padding']),
-                    'counters': {},
-                }
-            prefix_lookup[doc_type_id]['counters'][year] = int(gen_row['number'])
+        generated_ids_df = generated_ids_df.assign(
+            year=generated_ids_df['year'].astype(int).astype(str),
+            padding=generated_ids_df['padding'].astype(int),
+            number=generated_ids_df['number'].astype(int),
+        )
+
+        # Prefix and padding come from the first row seen for a document type,
+        # while a repeated (document type, year) pair keeps its last number.
+        heads = generated_ids_df.drop_duplicates('documenttypeid', keep='first')
+        prefix_lookup = {
+            doc_type_id: {'prefix': prefix, 'padding': padding, 'counters': {}}
+            for doc_type_id, prefix, padding in zip(
+                heads['documenttypeid'].tolist(), heads['prefix'].tolist(), heads['padding'].tolist()
+            )
+        }
+        counters = generated_ids_df.drop_duplicates(['documenttypeid', 'year'], keep='last')
+        for doc_type_id, year, number in zip(
+                counters['documenttypeid'].tolist(), counters['year'].tolist(), counters['number'].tolist()
+        ):
+            prefix_lookup[doc_type_id]['counters'][year] = number
         return prefix_lookup
 
     def _build_dept_doc_types(self, document_types_df: pd.DataFrame, dept_lookup: dict, prefix_lookup: dict) -> dict:
         """Helper to build the nested document type structure for departments."""
+        document_types_df = document_types_df[document_types_df['departmentid'].isin(list(dept_lookup))]
+        created_date = datetime.now()
         dept_doc_types = {}
-        for _, doc_type_row in document_types_df.iterrows():
-            dept_id = doc_type_row['departmentid']
-            doc_type_id = doc_type_row['id']
-
-            if dept_id not in dept_lookup:
-                continue
-
-            if dept_id not in dept_doc_types:
-                dept_doc_types[dept_id] = []
-
+        for dept_id, doc_type_id, name in zip(
+                document_types_df['departmentid'].tolist(),
+                document_types_df['id'].tolist(),
+                document_types_df['name'].tolist()
+        ):
             prefix_info = prefix_lookup.get(doc_type_id)
-            doc_type = {
+            dept_doc_types.setdefault(dept_id, []).append({
                 '_id': ObjectId(),
                 'inserted_id': doc_type_id,
-                'name': doc_type_row['name'],
+                'name': name,
                 'prefix': prefix_info['prefix'] if prefix_info else f"DEFAULT_{doc_type_id}",
                 'padding': prefix_info['padding'] if prefix_info else 4,
                 'counters': prefix_info['counters'] if prefix_info else {},
-                'created_date': datetime.now()
-            }
-            dept_doc_types[dept_id].append(doc_type)
+                'created_date': created_date
+            })
         return dept_doc_types
 
-    async def import_documents_from_csv(self, approval_paper_file: UploadFile) -> list[Any] | dict[str, int | str]:
+    @staticmethod
+    def _validate_document_chunk(chunk: pd.DataFrame, dept_map: Dict, doc_type_map: Dict,
+                                 mode: str = "insert") -> tuple[pd.DataFrame, pd.Series]:
+        """
+        Vectorized validation and mapping of a raw document CSV chunk.
+        Returns the mapped chunk and each row's rejection reason (None for valid rows);
+        when several checks fail, the first one listed is reported. The mapped id is the
+        legacy id when it is an integer and NaN otherwise; only upserts, which are keyed
+        on it, reject rows without one.
+        """
+        # Map status IDs to strings
+        status_map = {1: 'Not Filed', 2: 'Filed', 3: 'Suspended'}
+        numeric_id = pd.to_numeric(chunk["id"], errors='coerce')
+        integral_id = numeric_id.where(numeric_id % 1 == 0)
+        mapped = chunk.assign(
+            id=integral_id,
+            CreatedDate=pd.to_datetime(chunk["CreatedDate"], errors='coerce'),
+            FiledDate=pd.to_datetime(chunk["FiledDate"], errors='coerce'),
+            Status=chunk["StatusID"].map(status_map).fillna('Suspended'),
+            DepartmentMongoID=chunk["DepartmentID"].map(dept_map),
+            DocumentTypeMongoID=chunk["DocumentTypeID"].map(doc_type_map),
+        )
+        # Keys are in the order of DOCUMENT_REJECTION_REASONS
+        checks = {
+            "missing_required_field": chunk[DOCUMENT_REQUIRED_COLUMNS].isna().any(axis=1),
+            "invalid_id": integral_id.isna() if mode == "upsert" else pd.Series(False, index=chunk.index),
+            "invalid_created_date": mapped["CreatedDate"].isna(),
+            "unknown_department": mapped["DepartmentMongoID"].isna(),
+            "unknown_document_type": mapped["DocumentTypeMongoID"].isna(),
+            "empty_title": ~(chunk["Title"].astype("string").str.strip().str.len().fillna(0) > 0),
+        }
+        return mapped, CSVImportService._collect_rejection_reasons(chunk.index, checks)
+
+    @staticmethod
+    def _collect_rejection_reasons(index: pd.Index, checks: Dict[str, pd.Series]) -> pd.Series:
+        """Combines boolean rejection masks into one reason per row; earlier checks take precedence."""
+        reasons = pd.Series(None, index=index, dtype=object)
+        for reason, mask in reversed(checks.items()):
+            reasons = reasons.mask(mask, reason)
+        return reasons
+
+    @staticmethod
+    def _validate_departments(departments_df: pd.DataFrame) -> pd.Series:
+        return CSVImportService._collect_rejection_reasons(departments_df.index, {
+            "missing_required_field": departments_df[["id", "name"]].isna().any(axis=1),
+            "duplicate_id": departments_df["id"].duplicated(keep="first"),
+        })
+
+    @staticmethod
+    def _validate_document_types(document_types_df: pd.DataFrame, dept_ids) -> pd.Series:
+        return CSVImportService._collect_rejection_reasons(document_types_df.index, {
+            "missing_required_field": document_types_df[["id", "name", "departmentid"]].isna().any(axis=1),
+            "unknown_department": ~document_types_df["departmentid"].isin(list(dept_ids)),
+        })
+
+    @staticmethod
+    def _validate_generated_ids(generated_ids_df: pd.DataFrame, doc_type_ids) -> pd.Series:
+        numeric = generated_ids_df[["year", "padding", "number"]].apply(pd.to_numeric, errors="coerce")
+        return CSVImportService._collect_rejection_reasons(generated_ids_df.index, {
+            "missing_required_field": generated_ids_df[
+                ["documenttypeid", "year", "prefix", "padding", "number"]
+            ].isna().any(axis=1),
+            "invalid_number": numeric.isna().any(axis=1),
+            "unknown_document_type": ~generated_ids_df["documenttypeid"].isin(list(doc_type_ids)),
+        })
+
+    @staticmethod
+    def _validate_admins(admin_df: pd.DataFrame) -> pd.Series:
+        usernames = admin_df["username"].astype("string").str.strip()
+        return CSVImportService._collect_rejection_reasons(admin_df.index, {
+            "missing_username": usernames.fillna("") == "",
+            "username_too_short": usernames.str.len().fillna(0) < 3,
+        })
+
+    @staticmethod
+    def _prepare_document_chunk(chunk: pd.DataFrame, dept_map: Dict, doc_type_map: Dict,
+                                mode: str = "insert") -> pd.DataFrame:
+        """Returns only the valid, mapped rows of a raw document CSV chunk."""
+        chunk, reasons = CSVImportService._validate_document_chunk(chunk, dept_map, doc_type_map, mode)
+        rejected = reasons.notna()
+        rejected_count = int(rejected.sum())
+        if rejected_count > 0:
+            logger.info(f"Skipped {rejected_count} invalid rows in this chunk.")
+        return chunk[~rejected]
+
+    @staticmethod
+    def _build_document_records(chunk: pd.DataFrame) -> List[Dict]:
+        """
+        Builds the Mongo documents for a validated and mapped chunk using column operations.
+        Strings are stripped per column and missing filing data is turned into None. Rows
+        without an integer legacy id get no inserted_id, as the unique index on it is sparse.
+        """
+        filed_by = chunk["FiledBy"]
+        filed_date = chunk["FiledDate"]
+        legacy_id = chunk["id"]
+        records = pd.DataFrame({
+            "_id": [ObjectId() for _ in range(len(chunk))],
+            "inserted_id": legacy_id.astype("Int64").astype(object).where(legacy_id.notna(), None),
+            "ref_no": chunk["RefNo"].astype(str).str.strip(),
+            "title": chunk["Title"].astype(str).str.strip(),
+            "status": chunk["Status"],
+            "created_by": chunk["CreatedBy"].astype(str).str.strip(),
+            "created_date": chunk["CreatedDate"],
+            "filed_by": filed_by.astype(str).str.strip().where(filed_by.notna(), None),
+            "filed_date": filed_date.astype(object).where(filed_date.notna(), None),
+            "document_type_id": chunk["DocumentTypeMongoID"],
+            "department_id": chunk["DepartmentMongoID"],
+        }, index=chunk.index)
+        documents = records.to_dict("records")
+        if legacy_id.isna().any():
+            for document in documents:
+                if document["inserted_id"] is None:
+                    del document["inserted_id"]
+        return documents
+
+    async def import_documents_from_csv(self, approval_paper_file: UploadFile,
+                                        mode: str = "insert") -> list[Any] | dict[str, int | str]:
         """
         Imports a large number of documents from a single CSV file.
-        Uses chunked processing and batch inserts for high performance.
+        Parsing and transformation run in a worker thread while earlier chunks are
+        being written, with a bounded queue and a bounded number of writes in flight.
+        In "upsert" mode documents are keyed on their legacy id, so re-imports are idempotent.
         """
         if not approval_paper_file.filename.endswith('.csv'):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be a CSV")
 
         try:
-            # Define required columns to reduce memory usage
-            required_columns = ["id", "RefNo", "Title", "StatusID", "CreatedBy", "CreatedDate",
-                                "FiledBy", "FiledDate", "DocumentTypeID", "DepartmentID"]
-
-            # Initialize response list
-            inserted_doc_ids = []
-            chunk_size = 50000
-
-            # Process CSV in chunks
-            for chunk in pd.read_csv(
-                    io.BytesIO(await approval_paper_file.read()),
-                    usecols=required_columns,
-                    chunksize=chunk_size,
-                    on_bad_lines='skip'
-            ):
-                # Clean column names
-                chunk.columns = chunk.columns.str.strip()
+            dept_map, doc_type_map = await self.get_document_import_maps()
+            totals = await self.run_document_import(approval_paper_file.file, dept_map, doc_type_map, mode=mode)
 
-                # Get unique IDs for departments and document types
-             
-                all_dept_ids = [int(d) for d in chunk["DepartmentID"].dropna().unique() if str(d).isdigit()]
-                all_doc_type_ids = [int(d) for d in chunk["DocumentTypeID"].dropna().unique() if str(d).isdigit()]
-                
-
-                # Fetch department and document type mappings
-                dept_map = await DepartmentService().get_department_map_by_custom_ids(all_dept_ids)
-                doc_type_map = await DepartmentService().get_document_type_map_by_custom_ids(all_doc_type_ids)
-                
-                if not dept_map or not doc_type_map:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="No valid departments or document types found in the provided CSV. Please import departments or document types first."
-                    )
-
-                # Vectorized validation and data transformation
-                chunk = chunk.dropna(subset=["id", "RefNo", "Title", "StatusID", "CreatedBy", "CreatedDate",
-                                            "DocumentTypeID", "DepartmentID"])
-                chunk["CreatedDate"] = pd.to_datetime(chunk["CreatedDate"], errors='coerce')
-                chunk["FiledDate"] = pd.to_datetime(chunk["FiledDate"], errors='coerce')
-                chunk = chunk[chunk["CreatedDate"].notna()]  # Drop rows with invalid CreatedDate
-
-                # Map status IDs to strings
-                status_map = {1: 'Not Filed', 2: 'Filed', 3: 'Suspended'}
-                chunk["Status"] = chunk["StatusID"].map(status_map).fillna('Suspended')
-
-                # Map department and document type IDs
-                chunk["DepartmentMongoID"] = chunk["DepartmentID"].map(dept_map)
-                chunk["DocumentTypeMongoID"] = chunk["DocumentTypeID"].map(doc_type_map)
-
-                # Filter out rows with invalid mappings
-                chunk = chunk[chunk["DepartmentMongoID"].notna() & chunk["DocumentTypeMongoID"].notna()]
-
-                # Skip rows with empty titles
-                empty_title_count = len(chunk[chunk["Title"].str.strip().str.len() == 0])
-                chunk = chunk[chunk["Title"].str.strip().str.len() > 0]
-                if empty_title_count > 0:
-                    print(f"Skipped {empty_title_count} rows with empty titles in this chunk.")
-
-                if chunk.empty:
-                    print("Skipping chunk: No valid documents after mapping and title validation.")
-                    continue
-
-                # Prepare documents for insertion
-                documents_to_insert = [
-                    {
-                        "_id": ObjectId(),
-                        "ref_no": str(row["RefNo"]).strip(),
-                        "title": str(row["Title"]).strip(),
-                        "status": row["Status"],
-                        "created_by": str(row["CreatedBy"]).strip(),
-                        "created_date": row["CreatedDate"],
-                        "filed_by": str(row["FiledBy"]).strip() if pd.notna(row["FiledBy"]) else None,
-                        "filed_date": row["FiledDate"] if pd.notna(row["FiledDate"]) else None,
-                        "document_type_id": row["DocumentTypeMongoID"],
-                        "department_id": row["DepartmentMongoID"]
-                    }
-                    for _, row in chunk.iterrows()  # Fallback to iterrows for final transformation
-                ]
-
-                if documents_to_insert:
-                    print(f"Inserting {len(documents_to_insert)} documents in chunk...")
-                    result = await self.get_document_collection().insert_many(documents_to_insert, ordered=False)
-                    inserted_doc_ids.extend(result.inserted_ids)
-                    print(f"Inserted {len(result.inserted_ids)} documents in chunk.")
-
-            print(f"Successfully processed {len(inserted_doc_ids)} documents")
-            return {"inserted_count": len(inserted_doc_ids), "status": "success"}
+            logger.info(f"Successfully processed {totals['inserted_count']} documents")
+            if totals["duplicate_count"]:
+                return {**totals, "status": "success",
+                        "message": DUPLICATE_IMPORT_MESSAGE.format(count=totals["duplicate_count"])}
+            return {**totals, "status": "success"}
 
         except Exception as e:
-            print(f"An error occurred during document import: {e}")
+            logger.error(f"An error occurred during document import: {e}")
             handle_service_exception(e)
             return []
 
+    async def get_document_import_maps(self) -> tuple[Dict, Dict]:
+        """Fetches the department and document type legacy-id maps once for a whole import."""
+        dept_map = await DepartmentService().get_department_map()
+        doc_type_map = await DepartmentService().get_document_type_map()
+
+        if not dept_map or not doc_type_map:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No valid departments or document types found in the provided CSV. Please import departments or document types first."
+            )
+        return dept_map, doc_type_map
+
+    async def run_document_import(
+            self,
+            source: BinaryIO,
+            dept_map: Dict,
+            doc_type_map: Dict,
+            mode: str = "insert",
+            start_chunk: int = 0,
+            chunk_size: Optional[int] = None,
+            on_chunk_committed: Optional[Callable[[int, Dict[str, int]], Awaitable[None]]] = None
+    ) -> Dict[str, int]:
+        """
+        Runs the parse/write pipeline over a document CSV and returns the row totals.
+
+        Chunks before ``start_chunk`` are read but not imported. ``on_chunk_committed``
+        is awaited in chunk order once every insert of a chunk (and of all earlier
+        chunks) has finished, which makes the chunk index a safe resume point.
+        """
+        if mode not in DOCUMENT_IMPORT_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid import mode. Must be one of {DOCUMENT_IMPORT_MODES}"
+            )
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CSV_IMPORT_QUEUE_SIZE)
+        producer = asyncio.create_task(self._produce_document_batches(
+            source, dept_map, doc_type_map, queue, start_chunk, chunk_size or settings.CSV_IMPORT_CHUNK_SIZE, mode
+        ))
+        try:
+            totals = await self._consume_document_batches(queue, mode, on_chunk_committed)
+        except BaseException:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            raise
+        await producer
+        return totals
+
+    async def _produce_document_batches(self, source: BinaryIO, dept_map: Dict, doc_type_map: Dict,
+                                        queue: asyncio.Queue, start_chunk: int, chunk_size: int,
+                                        mode: str = "insert") -> None:
+        """Parses and transforms CSV chunks off the event loop and queues the resulting documents."""
+        try:
+            reader = await asyncio.to_thread(
+                pd.read_csv,
+                source,
+                usecols=DOCUMENT_CSV_COLUMNS,
+                chunksize=chunk_size,
+                on_bad_lines='skip'
+            )
+            chunk_index = 0
+            while (batch := await asyncio.to_thread(
+                    self._next_document_batch, reader, dept_map, doc_type_map, chunk_index < start_chunk, mode
+            )) is not None:
+                if chunk_index >= start_chunk:
+                    await queue.put((chunk_index, *batch))
+                chunk_index += 1
+            reader.close()
+        except Exception:
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    def _next_document_batch(self, reader, dept_map: Dict, doc_type_map: Dict,
+                             skip: bool = False, mode: str = "insert") -> Optional[tuple[int, List[Dict]]]:
+        """
+        Reads the next chunk from the CSV reader and returns its row count and documents.
+        Returns None once the reader is exhausted; skipped chunks are not transformed.
+        """
+        chunk = next(reader, None)
+        if chunk is None:
+            return None
+        rows_read = len(chunk)
+        if skip:
+            return rows_read, []
+
+        # Clean column names
+        chunk.columns = chunk.columns.str.strip()
+        chunk = self._prepare_document_chunk(chunk, dept_map, doc_type_map, mode)
+
+        if chunk.empty:
+            logger.info("Skipping chunk: No valid documents after mapping and title validation.")
+            return rows_read, []
+        return rows_read, self._build_document_records(chunk)
+
+    async def _consume_document_batches(
+            self,
+            queue: asyncio.Queue,
+            mode: str,
+            on_chunk_committed: Optional[Callable[[int, Dict[str, int]], Awaitable[None]]] = None
+    ) -> Dict[str, int]:
+        """Splits queued documents into sub-batches and writes them with bounded concurrency."""
+        batch_size = settings.CSV_IMPORT_INSERT_BATCH_SIZE
+        max_in_flight = settings.CSV_IMPORT_MAX_CONCURRENT_INSERTS
+        totals = {"rows_read": 0, **dict.fromkeys(WRITE_COUNT_KEYS, 0), "skipped_count": 0}
+        # Chunks in arrival order, each with the number of writes still outstanding
+        open_chunks: Dict[int, Dict[str, int]] = {}
+        in_flight: set[asyncio.Task] = set()
+
+        async def settle(done: set[asyncio.Task]) -> None:
+            for task in done:
+                chunk_index, counts = task.result()
+                open_chunks[chunk_index]["pending"] -= 1
+                for key, value in counts.items():
+                    open_chunks[chunk_index][key] += value
+            while open_chunks:
+                chunk_index, stats = next(iter(open_chunks.items()))
+                if stats["pending"]:
+                    break
+                del open_chunks[chunk_index]
+                stats.pop("pending")
+                for key, value in stats.items():
+                    totals[key] += value
+                if on_chunk_committed:
+                    await on_chunk_committed(chunk_index, stats)
+
+        try:
+            while (item := await queue.get()) is not None:
+                chunk_index, rows_read, documents = item
+                # Held open by one extra count until all of its sub-batches are scheduled
+                open_chunks[chunk_index] = {
+                    "pending": 1,
+                    "rows_read": rows_read,
+                    **dict.fromkeys(WRITE_COUNT_KEYS, 0),
+                    "skipped_count": rows_read - len(documents),
+                }
+                if documents:
+                    logger.info(f"Writing {len(documents)} documents in chunk...")
+                for start in range(0, len(documents), batch_size):
+                    # Stop pulling from the queue while the writers are saturated
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    else:
+                        done = {task for task in in_flight if task.done()}
+                        in_flight -= done
+                    await settle(done)
+                    open_chunks[chunk_index]["pending"] += 1
+                    in_flight.add(asyncio.create_task(
+                        self._write_document_batch(chunk_index, documents[start:start + batch_size], mode)
+                    ))
+                open_chunks[chunk_index]["pending"] -= 1
+                await settle(set())
+
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight)
+                await settle(done)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+
+        return totals
+
+    async def _write_document_batch(self, chunk_index: int, documents: List[Dict],
+                                    mode: str) -> tuple[int, Dict[str, int]]:
+        """
+        Writes one sub-batch and returns its chunk index with its WRITE_COUNT_KEYS counts.
+        In insert mode, rows rejected by the unique inserted_id index were imported before
+        and are counted as duplicates rather than failures.
+        """
+        counts = dict.fromkeys(WRITE_COUNT_KEYS, 0)
+        try:
+            if mode == "upsert":
+                result = await self.get_document_collection().bulk_write(
+                    self._build_upsert_operations(documents), ordered=False
+                )
+                details = result.bulk_api_result
+            else:
+                result = await self.get_document_collection().insert_many(documents, ordered=False)
+                details = {"nInserted": len(result.inserted_ids)}
+        except BulkWriteError as e:
+            details = e.details
+            errors = details.get("writeErrors", [])
+            if mode == "insert":
+                counts["duplicate_count"] = sum(1 for error in errors if error.get("code") == DUPLICATE_KEY_ERROR)
+            counts["failed_count"] = len(errors) - counts["duplicate_count"]
+            if counts["duplicate_count"]:
+                logger.warning(f"Chunk {chunk_index}: "
+                               + DUPLICATE_IMPORT_MESSAGE.format(count=counts["duplicate_count"]))
+            if counts["failed_count"]:
+                logger.warning(f"{counts['failed_count']} documents failed to write in chunk {chunk_index}.")
+
+        counts["inserted_count"] = details.get("nInserted", 0) + details.get("nUpserted", 0)
+        counts["updated_count"] = details.get("nModified", 0)
+        counts["unchanged_count"] = details.get("nMatched", 0) - details.get("nModified", 0)
+        return chunk_index, counts
+
+    @staticmethod
+    def _build_upsert_operations(documents: List[Dict]) -> List[UpdateOne]:
+        """Keys each document on its legacy id; a fresh _id is only used when the document is new."""
+        operations = []
+        for document in documents:
+            fields = dict(document)
+            object_id = fields.pop("_id")
+            operations.append(UpdateOne(
+                {"inserted_id": fields["inserted_id"]},
+                {"$set": fields, "$setOnInsert": {"_id": object_id}},
+                upsert=True
+            ))
+        return operations
+
+    @staticmethod
+    def _report_file(report_id: ObjectId) -> Path:
+        return Path(settings.IMPORT_STAGING_PATH).resolve() / "reports" / f"{report_id}.csv"
+
+    @staticmethod
+    def _purge_expired_reports() -> int:
+        reports_dir = Path(settings.IMPORT_STAGING_PATH).resolve() / "reports"
+        if not reports_dir.is_dir():
+            return 0
+        cutoff = time.time() - settings.IMPORT_REPORT_TTL_SECONDS
+        removed = 0
+        for report_file in reports_dir.glob("*.csv"):
+            if report_file.stat().st_mtime < cutoff:
+                report_file.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    async def purge_expired_reports(self) -> int:
+        """Removes dry-run reports older than IMPORT_REPORT_TTL_SECONDS; returns how many."""
+        return await asyncio.to_thread(self._purge_expired_reports)
+
+    def get_rejection_report_path(self, report_id: str) -> Path:
+        """Returns the rejected-rows CSV written by a dry run."""
+        report_file = self._report_file(to_object_id(report_id))
+        if not report_file.exists():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import report not found")
+        return report_file
+
+    @staticmethod
+    def _dry_run_response(summary: Dict[str, Any], report_id: ObjectId) -> Dict[str, Any]:
+        has_report = summary["rejected_count"] > 0
+        return {
+            "dry_run": True,
+            **summary,
+            "report_id": str(report_id) if has_report else None,
+            "report_url": f"{settings.API_V1_PREFIX}/import-reports/{report_id}" if has_report else None,
+        }
+
+    async def dry_run_documents_csv(self, approval_paper_file: UploadFile, mode: str = "insert") -> Dict[str, Any]:
+        """
+        Runs the full document validation and mapping without writing anything.
+        Returns counts per rejection reason and, if any rows were rejected, the id of a
+        downloadable CSV of those rows with their row numbers.
+        """
+        if not approval_paper_file.filename.endswith('.csv'):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be a CSV")
+
+        try:
+            dept_map = await DepartmentService().get_department_map()
+            doc_type_map = await DepartmentService().get_document_type_map()
+            report_id = ObjectId()
+            summary = await asyncio.to_thread(
+                self._write_document_rejection_report,
+                approval_paper_file.file, dept_map, doc_type_map, self._report_file(report_id), mode
+            )
+            return self._dry_run_response(summary, report_id)
+        except Exception as e:
+            logger.error(f"An error occurred during document dry run: {e}")
+            handle_service_exception(e)
+
+    def _write_document_rejection_report(self, source: BinaryIO, dept_map: Dict, doc_type_map: Dict,
+                                         report_file: Path, mode: str = "insert") -> Dict[str, Any]:
+        """
+        Streams the CSV chunk by chunk, appending rejected rows to ``report_file``.
+        The report's "row" column is the 1-based position among the rows pandas parsed, not a
+        line number: malformed lines are skipped and quoted fields may span several lines.
+        """
+        rows_read = 0
+        rejections = dict.fromkeys(DOCUMENT_REJECTION_REASONS, 0)
+        os.makedirs(report_file.parent, exist_ok=True)
+
+        with open(report_file, "w", newline="") as report, pd.read_csv(
+                source,
+                usecols=DOCUMENT_CSV_COLUMNS,
+                chunksize=settings.CSV_IMPORT_CHUNK_SIZE,
+                on_bad_lines='skip'
+        ) as reader:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                rows_read += len(chunk)
+                _, reasons = self._validate_document_chunk(chunk, dept_map, doc_type_map, mode)
+                rejected = reasons.notna()
+                if not rejected.any():
+                    continue
+                for reason, count in reasons[rejected].value_counts().items():
+                    rejections[reason] += int(count)
+                rejected_rows = chunk[rejected].copy()
+                rejected_rows.insert(0, "reason", reasons[rejected])
+                rejected_rows.insert(0, "row", rejected_rows.index + 1)
+                rejected_rows.to_csv(report, header=report.tell() == 0, index=False)
+
+        rejected_count = sum(rejections.values())
+        if not rejected_count:
+            os.remove(report_file)
+        return {
+            "rows_read": rows_read,
+            "valid_count": rows_read - rejected_count,
+            "rejected_count": rejected_count,
+            "rejections": rejections,
+        }
+
+    async def dry_run_department_csvs(self, department_file: UploadFile, document_type_file: UploadFile,
+                                      generated_id_file: UploadFile,
+                                      admin_file: Optional[UploadFile] = None) -> Dict[str, Any]:
+        """
+        Validates the department, document type, generated ID and admin CSVs without writing
+        anything, reporting the rows import_csv and import_admins_from_csv would fail on or skip.
+        """
+        files = {
+            "department_file": department_file,
+            "document_type_file": document_type_file,
+            "generated_id_file": generated_id_file,
+        }
+        if admin_file:
+            files["admin_file"] = admin_file
+        for file in files.values():
+            if not file.filename.endswith('.csv'):
+                raise HTTPException(status_code=400, detail=f"File {file.filename} must be a CSV file")
+
+        try:
+            frames = {}
+            for key, file in files.items():
+                frames[key] = pd.read_csv(io.BytesIO(await file.read()))
+                frames[key].columns = frames[key].columns.str.strip()
+
+            reasons = {"department_file": self._validate_departments(frames["department_file"])}
+            dept_ids = frames["department_file"].loc[reasons["department_file"].isna(), "id"]
+            reasons["document_type_file"] = self._validate_document_types(frames["document_type_file"], dept_ids)
+            doc_type_ids = frames["document_type_file"].loc[reasons["document_type_file"].isna(), "id"]
+            reasons["generated_id_file"] = self._validate_generated_ids(frames["generated_id_file"], doc_type_ids)
+            if admin_file:
+                reasons["admin_file"] = self._validate_admins(frames["admin_file"])
+
+            report_id = ObjectId()
+            file_summaries = {}
+            rejected_frames = []
+            for key, file_reasons in reasons.items():
+                rejected = file_reasons.notna()
+                file_summaries[key] = {
+                    "rows_read": len(file_reasons),
+                    "valid_count": int((~rejected).sum()),
+                    "rejected_count": int(rejected.sum()),
+                    "rejections": {k: int(v) for k, v in file_reasons[rejected].value_counts().items()},
+                }
+                if rejected.any():
+                    rejected_rows = frames[key][rejected].copy()
+                    rejected_rows.insert(0, "reason", file_reasons[rejected])
+                    rejected_rows.insert(0, "row", rejected_rows.index + 1)
+                    rejected_rows.insert(0, "file", files[key].filename)
+                    rejected_frames.append(rejected_rows)
+
+            if rejected_frames:
+                report_file = self._report_file(report_id)
+                os.makedirs(report_file.parent, exist_ok=True)
+                pd.concat(rejected_frames, ignore_index=True).to_csv(report_file, index=False)
+
+            summary = {
+                "rows_read": sum(f["rows_read"] for f in file_summaries.values()),
+                "valid_count": sum(f["valid_count"] for f in file_summaries.values()),
+                "rejected_count": sum(f["rejected_count"] for f in file_summaries.values()),
+                "files": file_summaries,
+            }
+            return self._dry_run_response(summary, report_id)
+        except Exception as e:
+            logger.error(f"An error occurred during department dry run: {e}")
+            handle_service_exception(e)
+
     def _is_valid_row(self, row: pd.Series) -> bool:
         """Helper to validate a row from the document CSV."""
-        return all(pd.notna(row.get(col)) for col in ["id", "RefNo", "Title", "StatusID", "CreatedBy", "CreatedDate", "DocumentTypeID", "DepartmentID"])
+        return all(pd.notna(row.get(col)) for col in DOCUMENT_REQUIRED_COLUMNS)
 
 
     async def import_admins_from_csv(self, admin_file: UploadFile) -> List[dict]:
@@ -1,15 +1,37 @@
 from datetime import datetime
 from fastapi import HTTPException, status
 from bson import ObjectId
-from typing import Dict, List, Optional, Any, Coroutine
+from typing import Dict, List, Optional, Any, Coroutine, Tuple
+from pydantic import TypeAdapter
 from app.core.database import MongoDB
 from app.models.department import DepartmentModel
 from app.schemas.base import PyObjectId
-from app.schemas.department import DepartmentCreate, DepartmentInDB, DepartmentInDBMinimal, DepartmentResponse, DocumentTypeCreate, DocumentTypeInDB,  DocumentTypeWithDepartment, csvDepartment, csvDocumentType
+from app.schemas.department import DepartmentCreate, DepartmentInDB, DepartmentInDBMinimal, DepartmentResponse, DepartmentSummary, DocumentTypeCreate, DocumentTypeInDB,  DocumentTypeWithDepartment, csvDepartment, csvDocumentType
 from app.services.utils import validate_document_types
 from app.core.utils import to_object_id
 from app.core.exceptions import handle_service_exception
-import re
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# _id of the department_versions document
+DEPARTMENTS_VERSION_ID = "departments"
+DEPARTMENT_SUMMARY_PROJECTION = {"name": 1, "full_name": 1, "status": 1}
+_summary_adapter = TypeAdapter(List[DepartmentSummary])
+# active_only -> (version, JSON body) of the last summary listing built in this process
+_summary_cache: Dict[bool, Tuple[int, bytes]] = {}
+_document_types_adapter = TypeAdapter(List[DocumentTypeWithDepartment])
+# (version, counters_version) and JSON body of the last document type listing built in this process
+_document_types_cache: Optional[Tuple[Tuple[int, int], bytes]] = None
+
+
+def _duplicate_key_exception(e: DuplicateKeyError) -> HTTPException:
+    """Maps a unique index violation on the departments collection to the API error for it."""
+    key_pattern = (e.details or {}).get("keyPattern") or {}
+    if "document_types.prefix" in key_pattern or "document_types.prefix" in str(e):
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Document type prefix already exists")
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Department name exists")
+
+
 class DepartmentService:
     def __init__(self, collection_name: str = "departments"):
         self.collection_name = collection_name
@@ -17,6 +39,68 @@ class DepartmentService:
     def get_collection(self):
         return MongoDB.get_database()[self.collection_name]
 
+    async def find_by_name(self, department_name: str, projection: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        """
+        Finds a department by name, ignoring case, through the name_ci collation index.
+        name_ci is unique, but should names predating it differ only by case, the exact
+        match is used and a name matching none of them exactly is rejected as ambiguous.
+        """
+        if projection is not None:
+            projection = {**projection, "name": 1}
+        matches = await self.get_collection().find(
+            {"name": department_name}, projection, collation=DepartmentModel.NAME_COLLATION
+        ).limit(2).to_list(length=2)
+        if len(matches) < 2:
+            return matches[0] if matches else None
+        exact = await self.get_collection().find_one({"name": department_name}, projection)
+        if exact is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Department name '{department_name}' matches several departments that differ only by case"
+            )
+        return exact
+
+    async def get_versions(self) -> Tuple[int, int]:
+        """
+        Current (version, counters_version) of the departments collection: version changes
+        whenever a department or document type is written, counters_version whenever only
+        the document numbering counters changed.
+        """
+        versions = await MongoDB.get_database()[DepartmentModel.VERSION_COLLECTION_NAME].find_one({"_id": DEPARTMENTS_VERSION_ID})
+        versions = versions or {}
+        return versions.get("version", 0), versions.get("counters_version", 0)
+
+    async def bump_version(self, counters: bool = False) -> None:
+        """
+        Invalidates cached department listings; call after every write to the departments
+        collection, with counters=True when the write only changed document numbering counters.
+        """
+        await MongoDB.get_database()[DepartmentModel.VERSION_COLLECTION_NAME].update_one(
+            {"_id": DEPARTMENTS_VERSION_ID}, {"$inc": {"counters_version" if counters else "version": 1}}, upsert=True
+        )
+
+    async def get_department_summaries(self, active_only: bool = False) -> Tuple[int, bytes]:
+        """
+        JSON list of DepartmentSummary for all departments, or only the active ones, and the
+        version it was built at. The body is rebuilt only when the version moved on, so
+        unchanged listings cost one lookup of the version document.
+        """
+        try:
+            # Read the version first: a write racing the rebuild then only causes one more rebuild
+            version, _ = await self.get_versions()
+            cached = _summary_cache.get(active_only)
+            if cached and cached[0] == version:
+                return cached
+            if active_only:
+                cursor = self.get_collection().find({"status": 1}, DEPARTMENT_SUMMARY_PROJECTION).sort("priority", 1)
+            else:
+                cursor = self.get_collection().find({}, DEPARTMENT_SUMMARY_PROJECTION)
+            departments = [DepartmentSummary(**dept) async for dept in cursor]
+            _summary_cache[active_only] = version, _summary_adapter.dump_json(departments, by_alias=True)
+            return _summary_cache[active_only]
+        except Exception as e:
+            handle_service_exception(e)
+
     async def get_all_departments(self) -> List[DepartmentInDB]:
 
         try:
@@ -36,20 +120,9 @@ class DepartmentService:
 
     async def create_department(self, department_data: DepartmentCreate) -> DepartmentInDB:
         try:
-            existing_department = await self.get_collection().find_one({"name": department_data.name})
-            if existing_department:
-                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Department name exists")
-
+            # Name and prefix uniqueness across departments is enforced by the unique indexes on insert
             validate_document_types(department_data.document_types)
 
-            existing_prefixes = await self.get_collection().aggregate([
-                {"$unwind": "$document_types"},
-                {"$match": {"document_types.prefix": {"$in": [doc.prefix for doc in department_data.document_types]}}},
-                {"$project": {"prefix": "$document_types.prefix"}}
-            ]).to_list(length=len(department_data.document_types))
-            if existing_prefixes:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Document type prefix already exists")
-
             doc_types_with_ids = [
                 {**doc.model_dump(), "_id": ObjectId() , "created_date": datetime.now()} for doc in department_data.document_types
             ]
@@ -58,8 +131,12 @@ class DepartmentService:
 
             department_dict["created_date"] = datetime.now()
 
-            result = await self.get_collection().insert_one(department_dict)
+            try:
+                result = await self.get_collection().insert_one(department_dict)
+            except DuplicateKeyError as e:
+                raise _duplicate_key_exception(e)
             department_dict["_id"] = result.inserted_id
+            await self.bump_version()
             return DepartmentInDB(**department_dict)
         except Exception as e:
             handle_service_exception(e)
@@ -82,25 +159,25 @@ class DepartmentService:
                     detail="Status must be either 0 or 1"
                 )
             
-            filter_query = {"$or": []}
-            for dept in departments:
-                if ObjectId.is_valid(dept):
-                    filter_query["$or"].append({"_id": ObjectId(dept)})
-                else:
-                    # Option 1: Case-insensitive regex search
-                    filter_query["$or"].append({
-                        "name": {"$regex": f"^{re.escape(dept)}$", "$options": "i"}
-                    })
-            
-            result = await self.get_collection().update_many(filter_query, {"$set": {"status": new_status}})
+            # One indexed query: ids through _id, names case-insensitively through name_ci
+            ids = [ObjectId(dept) for dept in departments if ObjectId.is_valid(dept)]
+            names = [dept for dept in departments if not ObjectId.is_valid(dept)]
+            filter_query = {"$or": [{"_id": {"$in": ids}}, {"name": {"$in": names}}]}
+
+            result = await self.get_collection().update_many(
+                filter_query, {"$set": {"status": new_status}}, collation=DepartmentModel.NAME_COLLATION
+            )
             
             if result.modified_count == 0:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="No departments found to update"
                 )
+            await self.bump_version()
             
-            updated_departments = await self.get_collection().find(filter_query).to_list(length=None)
+            updated_departments = await self.get_collection().find(
+                filter_query, collation=DepartmentModel.NAME_COLLATION
+            ).to_list(length=None)
             return [DepartmentInDB(**dept) for dept in updated_departments]
             
         except Exception as e:
@@ -108,10 +185,17 @@ class DepartmentService:
 
     async def delete_department_by_id(self, department_id: PyObjectId) :
         result = await self.get_collection().delete_one({"_id": ObjectId(department_id)})
+        if result.deleted_count:
+            await self.bump_version()
         return result.deleted_count > 0
 
     async def delete_department_by_name(self, department_name: str) :
-        result = await self.get_collection().delete_one({"name": department_name})
+        department = await self.find_by_name(department_name, {"_id": 1})
+        if not department:
+            return False
+        result = await self.get_collection().delete_one({"_id": department["_id"]})
+        if result.deleted_count:
+            await self.bump_version()
         return result.deleted_count > 0
 
     
@@ -128,77 +212,73 @@ class DepartmentService:
                     {"_id": department_oid},
                     {"$pull": {"document_types": {"_id": document_type_oid}}}
                 )
+                await self.bump_version()
             except Exception as e:
                 handle_service_exception(e)
 
     async def delete_document_type_by_name(self, department_name: str, document_type_id: PyObjectId) -> None:
         try:
             document_type_oid = to_object_id(document_type_id)
-            department = await self.get_collection().find_one({"name": department_name.upper()})
+            department = await self.find_by_name(department_name, {"document_types._id": 1})
             if not department:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
             if document_type_oid not in [doc["_id"] for doc in department.get("document_types", [])]:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document type not found")
             await self.get_collection().update_one(
-                {"name": department_name.upper()},
+                {"_id": department["_id"]},
                 {"$pull": {"document_types": {"_id": document_type_oid}}}
             )
+            await self.bump_version()
         except Exception as e:
             handle_service_exception(e)
 
     async def add_document_type(self, department_id: PyObjectId, doc_type: DocumentTypeCreate) -> DepartmentInDB:
         try:
-            department_oid = to_object_id(department_id)
-            department = await self.get_collection().find_one({"_id": department_oid})
-            if not department:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
-            existing_doc_types = department.get("document_types", [])
-            validate_document_types([doc_type], existing_doc_types)
-            existing_prefixes = await self.get_collection().aggregate([
-                {"$unwind": "$document_types"},
-                {"$match": {"document_types.prefix": doc_type.prefix}},
-                {"$project": {"prefix": "$document_types.prefix"}}
-            ]).to_list(length=1)
-            if existing_prefixes:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Document type prefix already exists")
-            doc_type_dict = doc_type.model_dump()
-            doc_type_dict["_id"] = ObjectId()
-            doc_type_dict["created_date"] = datetime.now()
-            await self.get_collection().update_one(
-                {"_id": department_oid},
-                {"$push": {"document_types": doc_type_dict}}
-            )
-            department = await self.get_collection().find_one({"_id": department_oid})
-            return DepartmentInDB(**department)
+            return await self._push_document_type(to_object_id(department_id), doc_type)
         except Exception as e:
             handle_service_exception(e)
 
     async def add_document_type_by_name(self, department_name: str, doc_type: DocumentTypeCreate) -> DepartmentInDB:
         try:
-            department = await self.get_collection().find_one({"name": department_name.upper()})
+            department = await self.find_by_name(department_name, {"_id": 1})
             if not department:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
-            existing_doc_types = department.get("document_types", [])
-            validate_document_types([doc_type], existing_doc_types)
-            existing_prefixes = await self.get_collection().aggregate([
-                {"$unwind": "$document_types"},
-                {"$match": {"document_types.prefix": doc_type.prefix}},
-                {"$project": {"prefix": "$document_types.prefix"}}
-            ]).to_list(length=1)
-            if existing_prefixes:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Document type prefix already exists")
-            doc_type_dict = doc_type.model_dump()
-            doc_type_dict["_id"] = ObjectId()
-            doc_type_dict["created_date"] = datetime.now()
-            await self.get_collection().update_one(
-                {"name": department_name.upper()},
-                {"$push": {"document_types": doc_type_dict}}
-            )
-            department = await self.get_collection().find_one({"name": department_name.upper()})
-            return DepartmentInDB(**department)
+            return await self._push_document_type(department["_id"], doc_type)
         except Exception as e:
             handle_service_exception(e)
 
+    async def _push_document_type(self, department_oid: ObjectId, doc_type: DocumentTypeCreate) -> DepartmentInDB:
+        """
+        Appends a document type to the department in one write.
+        The unique index on document_types.prefix rejects prefixes used by other departments,
+        while the filter guards names and prefixes within the department itself, which a
+        multikey index does not. The department is only read again to explain a rejected push.
+        """
+        doc_type_dict = doc_type.model_dump()
+        doc_type_dict["_id"] = ObjectId()
+        doc_type_dict["created_date"] = datetime.now()
+        try:
+            department = await self.get_collection().find_one_and_update(
+                {
+                    "_id": department_oid,
+                    "document_types.name": {"$ne": doc_type.name},
+                    "document_types.prefix": {"$ne": doc_type.prefix},
+                },
+                {"$push": {"document_types": doc_type_dict}},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError as e:
+            raise _duplicate_key_exception(e)
+        if department is None:
+            department = await self.get_collection().find_one({"_id": department_oid}, {"document_types.name": 1, "document_types.prefix": 1})
+            if not department:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
+            validate_document_types([doc_type], department.get("document_types", []))
+            # The conflicting document type was removed in the meantime
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Department was modified concurrently, please retry")
+        await self.bump_version()
+        return DepartmentInDB(**department)
+
     async def get_document_types(self, department_id: str) -> List[DocumentTypeInDB]:
         try:
             department_id = to_object_id(department_id)
@@ -213,8 +293,8 @@ class DepartmentService:
 
     async def get_document_types_by_department_name(self, department_name: str) -> List[DocumentTypeInDB]:
         try:
-            department = await self.get_collection().find_one({"name": department_name.upper()})
-        
+            department = await self.find_by_name(department_name)
+
             if not department:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Department not found")
             doc_types = department.get("document_types", [])
@@ -222,20 +302,40 @@ class DepartmentService:
         except Exception as e:
             handle_service_exception(e)
 
-    async def get_all_document_types_with_departments(self) -> List[DocumentTypeWithDepartment]:
+    async def get_all_document_types_with_departments(self) -> Tuple[Tuple[int, int], bytes]:
+        """
+        JSON list of DocumentTypeWithDepartment for every document type, and the
+        (version, counters_version) it was built at. One pipeline unwinds the document types
+        and projects only the response fields; the body is rebuilt only when a version moved on.
+        """
+        global _document_types_cache
         try:
-            departments = await self.get_collection().find().to_list(length=None)
-            all_doc_types = []
-            for dept in departments:
-                department = DepartmentInDBMinimal(**dept)
-                doc_types = dept.get("document_types", [])
-                for doc_type in doc_types:
-                    doc_type_with_dept = DocumentTypeWithDepartment(
-                        **doc_type,
-                        department=department
-                    )
-                    all_doc_types.append(doc_type_with_dept)
-            return all_doc_types
+            versions = await self.get_versions()
+            if _document_types_cache and _document_types_cache[0] == versions:
+                return _document_types_cache
+            pipeline = [
+                {"$match": {"document_types.0": {"$exists": True}}},
+                {"$unwind": "$document_types"},
+                {"$project": {
+                    "_id": "$document_types._id",
+                    "name": "$document_types.name",
+                    "prefix": "$document_types.prefix",
+                    "padding": "$document_types.padding",
+                    "counters": {"$ifNull": ["$document_types.counters", {}]},
+                    "created_date": "$document_types.created_date",
+                    "department": {
+                        "_id": "$_id",
+                        "name": "$name",
+                        "full_name": "$full_name",
+                        "status": "$status",
+                        "created_date": "$created_date",
+                    },
+                }}
+            ]
+            doc_types = await self.get_collection().aggregate(pipeline).to_list(length=None)
+            body = _document_types_adapter.dump_json(_document_types_adapter.validate_python(doc_types), by_alias=True)
+            _document_types_cache = versions, body
+            return _document_types_cache
         except Exception as e:
             handle_service_exception(e)
 
@@ -305,7 +405,9 @@ class DepartmentService:
     async def get_document_type_map_by_custom_ids(self, custom_ids: List[int]) -> Dict[int, PyObjectId]:
         """
         Efficiently fetches a map of custom document type IDs to their MongoDB ObjectIds.
-        Uses an aggregation pipeline to search within the embedded document_types array.
+        Uses an aggregation pipeline to search within the embedded document_types array;
+        the leading $match selects the departments through the document_types.inserted_id
+        index so only those are unwound.
 
         Args:
             custom_ids: A list of integer IDs for document types.
@@ -318,6 +420,7 @@ class DepartmentService:
             return {}
             
         pipeline = [
+            {"$match": {"document_types.inserted_id": {"$in": custom_ids}}},
             {"$unwind": "$document_types"},
             {"$match": {"document_types.inserted_id": {"$in": custom_ids}}},
             {"$project": {
@@ -332,4 +435,43 @@ class DepartmentService:
         async for doc in cursor:
             doc_type_map[doc["doc_type_id"]] = doc["mongo_id"]
             
-        return doc_type_map
\ No newline at end of file
+        return doc_type_map
+
+    async def get_department_map(self) -> Dict[int, PyObjectId]:
+        """
+        Fetches the map of every custom department ID to its MongoDB ObjectId.
+        Used by the CSV importer so the map is loaded once per import.
+        """
+        dept_map = {}
+        cursor = self.get_collection().find(
+            {"inserted_id": {"$ne": None}},
+            {"_id": 1, "inserted_id": 1}
+        )
+        async for dept in cursor:
+            dept_map[dept["inserted_id"]] = dept["_id"]
+
+        return dept_map
+
+    async def get_document_type_map(self) -> Dict[int, PyObjectId]:
+        """
+        Fetches the map of every custom document type ID to its MongoDB ObjectId.
+        Used by the CSV importer so the map is loaded once per import.
+        """
+        # $exists, not $ne: None, which would skip departments where only some document types have an id
+        pipeline = [
+            {"$match": {"document_types.inserted_id": {"$exists": True}}},
+            {"$unwind": "$document_types"},
+            {"$match": {"document_types.inserted_id": {"$ne": None}}},
+            {"$project": {
+                "_id": 0,
+                "doc_type_id": "$document_types.inserted_id",
+                "mongo_id": "$document_types._id"
+            }}
+        ]
+
+        doc_type_map = {}
+        cursor = self.get_collection().aggregate(pipeline)
+        async for doc in cursor:
+            doc_type_map[doc["doc_type_id"]] = doc["mongo_id"]
+
+        return doc_type_map
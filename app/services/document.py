@@ -27,6 +27,7 @@ from app.schemas.document import (
 from app.core.utils import to_object_id
 from app.core.exceptions import handle_service_exception
 from app.services.FileStorageService import FileStorageService
+from app.services.utils import format_ref_no
 
 from fastapi import UploadFile
 import logging
@@ -44,7 +45,9 @@ class DocumentService:
         if db is None:
             raise HTTPException(status_code=500, detail="Database connection not established")
 
-        self.gridfs_bucket = AsyncIOMotorGridFSBucket(db, bucket_name=settings.GRIDFS_BUCKET_NAME)
+        self.gridfs_bucket = AsyncIOMotorGridFSBucket(
+            db, bucket_name=settings.GRIDFS_BUCKET_NAME, chunk_size_bytes=settings.GRIDFS_CHUNK_SIZE_BYTES
+        )
     def get_collection(self):
         collection = MongoDB.get_database()[self.collection_name]
         return collection
@@ -107,6 +110,7 @@ class DocumentService:
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to increment document counter"
                 )
+            await DepartmentService().bump_version(counters=True)
 
             # Retrieve updated document type
             pipeline = [
@@ -131,11 +135,7 @@ class DocumentService:
             padding = doc_type.get("padding", 2)
             prefix = doc_type["prefix"]
 
-            seq_str = str(counter_value)
-            padded_seq = seq_str if len(seq_str) > padding else seq_str.zfill(padding)
-
-            year_suffix = str(year % 100)
-            ref_no = f"{prefix}/{padded_seq}/{year_suffix}"
+            ref_no = format_ref_no(prefix, counter_value, padding, year)
 
             # Ensure ref_no is unique
             existing = await self.get_collection().find_one({"ref_no": ref_no})
@@ -208,13 +208,12 @@ class DocumentService:
                                                                                   datetime) else document[
                     "created_date"]
 
-                # Save new file and get relative path
-                relative_path = await file_storage.save_file(file, department_name, ref_no, created_date)
-                update_fields["file_path"] = relative_path
+                # Save new file and record its relative path, size and checksum
+                stored_file = await file_storage.save_file(file, department_name, ref_no, created_date)
+                update_fields.update(stored_file)
 
-                # Delete old file if exists
-                if document.get("file_path"):
-                    await file_storage.delete_file(document["file_path"])
+                # Release the old file now that the new one is stored
+                await file_storage.release_replaced_file(document.get("file_path"), stored_file["file_path"])
 
             if is_admin and isinstance(update_data, DocumentUpdateAdmin):
                 if update_fields.get("status") == "Filed":
@@ -229,7 +228,7 @@ class DocumentService:
                 if not isinstance(update_data, DocumentUpdateNormal):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                                         detail="Admin fields not allowed for normal users")
-                allowed_fields = {"title", "document_type_id", "department_id", "file_path"}
+                allowed_fields = {"title", "document_type_id", "department_id", "file_path", "file_size", "file_checksum", "file_encoding", "file_stored_size"}
                 if any(field not in allowed_fields for field in update_fields):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                                         detail="Normal users can only update title, document_type_id, department_id, and file_path")
@@ -271,6 +270,64 @@ class DocumentService:
         except Exception as e:
             handle_service_exception(e)
 
+    @staticmethod
+    def build_document_filter(
+            search: Optional[str] = None,
+            status_filter: Optional[str] = None,
+            department_id: Optional[str] = None,
+            document_type_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Builds the Mongo filter shared by the paginated listing and the file archive export."""
+        query_filter: Dict[str, Any] = {}
+
+        if search:
+            or_filters = [
+                {"title": {"$regex": search, "$options": "i"}},
+                {"ref_no": {"$regex": search, "$options": "i"}},
+                {"created_by": {"$regex": search, "$options": "i"}}
+            ]
+
+            # Try to interpret search as a date in DD/MM/YYYY format
+            try:
+                search_date = datetime.strptime(search, "%d/%m/%Y")
+                next_day = search_date + timedelta(days=1)
+
+                # Add created_date range filter to match the specific date
+                or_filters.append({
+                    "created_date": {
+                        "$gte": search_date,
+                        "$lt": next_day
+                    }
+                })
+                or_filters.append({
+                    "filed_date": {
+                        "$gte": search_date,
+                        "$lt": next_day
+                    }
+                })
+            except ValueError:
+                # Ignore if not a valid date format
+                pass
+
+            query_filter["$or"] = or_filters
+
+        if status_filter:
+            valid_statuses = {"Not Filed", "Filed", "Suspended"}
+            if status_filter not in valid_statuses:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid status. Must be one of {valid_statuses}"
+                )
+            query_filter["status"] = status_filter
+
+        if department_id:
+            query_filter["department_id"] = to_object_id(department_id)
+
+        if document_type_id:
+            query_filter["document_type_id"] = to_object_id(document_type_id)
+
+        return query_filter
+
     async def get_documents_paginated(
             self,
             page: int = 1,
@@ -284,53 +341,7 @@ class DocumentService:
     ) -> DocumentPaginationResponse:
         try:
             skip = (page - 1) * limit
-            query_filter: Dict[str, Any] = {}
-
-            if search:
-                or_filters = [
-                    {"title": {"$regex": search, "$options": "i"}},
-                    {"ref_no": {"$regex": search, "$options": "i"}},
-                    {"created_by": {"$regex": search, "$options": "i"}}
-                ]
-
-                # Try to interpret search as a date in DD/MM/YYYY format
-                try:
-                    search_date = datetime.strptime(search, "%d/%m/%Y")
-                    next_day = search_date + timedelta(days=1)
-
-                    # Add created_date range filter to match the specific date
-                    or_filters.append({
-                        "created_date": {
-                            "$gte": search_date,
-                            "$lt": next_day
-                        }
-                    })
-                    or_filters.append({
-                        "filed_date": {
-                            "$gte": search_date,
-                            "$lt": next_day
-                        }
-                    })
-                except ValueError:
-                    # Ignore if not a valid date format
-                    pass
-
-                query_filter["$or"] = or_filters
-
-            if status_filter:
-                valid_statuses = {"Not Filed", "Filed", "Suspended"}
-                if status_filter not in valid_statuses:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Invalid status. Must be one of {valid_statuses}"
-                    )
-                query_filter["status"] = status_filter
-
-            if department_id:
-                query_filter["department_id"] = to_object_id(department_id)
-
-            if document_type_id:
-                query_filter["document_type_id"] = to_object_id(document_type_id)
+            query_filter = self.build_document_filter(search, status_filter, department_id, document_type_id)
 
             valid_sort_fields = {
                 "created_date", "title", "ref_no", "status",
@@ -417,6 +428,7 @@ class DocumentService:
                                 }
                             }
                         )
+                        await DepartmentService().bump_version(counters=True)
                         logger.info(f"Decremented counter for department {department_id}, document type {document_type_id}, year {year}")
             except Exception as e:
                 logger.warning(f"Failed to decrement department counter: {str(e)}")
@@ -559,11 +571,7 @@ class DocumentService:
                 if not counter_doc.get("sequence_value"):
                     counter_doc["sequence_value"] = 1
                     counter_doc["padding"] = doc_type.get("padding", 2)
-                seq_str = str(counter_doc["sequence_value"])
-                padded_seq = seq_str if len(seq_str) > counter_doc.get("padding", 2) else seq_str.zfill(counter_doc.get("padding", 2))
-
-                year_suffix = str(year % 100)
-                ref_no = f"{doc_type['prefix']}/{padded_seq}/{year_suffix}"
+                ref_no = format_ref_no(doc_type["prefix"], counter_doc["sequence_value"], counter_doc.get("padding", 2), year)
 
                 existing = await self.get_collection().find_one({"ref_no": ref_no})
                 if existing:
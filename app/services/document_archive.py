@@ -0,0 +1,231 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+import re
+import zipfile
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.core.exceptions import handle_service_exception
+from app.core.utils import to_object_id
+from app.models.document import DocumentModel
+from app.schemas.document import DocumentArchiveRequest
+from app.services.document import DocumentService
+from app.services.FileStorageService import FileStorageService
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = [
+    "entry", "ref_no", "title", "department", "document_type", "status",
+    "created_by", "created_date", "filed_by", "filed_date", "file_size", "file_checksum", "included",
+]
+
+
+class _ZipSink:
+    """
+    Write-only target for zipfile. It has no seek(), so zipfile writes data descriptors
+    instead of rewinding to patch headers, and whatever was written can be drained as bytes.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class DocumentArchiveService:
+    """Streams the attachments of many documents as one ZIP, named department/ref_no, with a manifest."""
+
+    def get_document_collection(self):
+        return MongoDB.get_database()[DocumentModel.COLLECTION_NAME]
+
+    def get_department_collection(self):
+        return MongoDB.get_database()["departments"]
+
+    @staticmethod
+    def _entry_part(name: str) -> str:
+        return re.sub(r'[\\/:*?"<>|]+', "_", name.strip()) or "_"
+
+    async def get_archive_documents(self, request: DocumentArchiveRequest) -> List[Dict[str, Any]]:
+        """Resolves the requested documents, sorted by department and ref_no, with names for the manifest."""
+        try:
+            if request.document_ids:
+                query_filter: Dict[str, Any] = {"_id": {"$in": [to_object_id(doc_id) for doc_id in request.document_ids]}}
+            else:
+                query_filter = DocumentService.build_document_filter(
+                    request.search, request.status, request.department_id, request.document_type_id
+                )
+                filed_range = {}
+                if request.filed_from:
+                    filed_range["$gte"] = request.filed_from
+                if request.filed_to:
+                    filed_range["$lt"] = request.filed_to
+                if filed_range:
+                    query_filter["filed_date"] = filed_range
+
+            projection = {
+                "ref_no": 1, "title": 1, "status": 1, "department_id": 1, "document_type_id": 1,
+                "created_by": 1, "created_date": 1, "filed_by": 1, "filed_date": 1,
+                "file_path": 1, "file_size": 1, "file_checksum": 1, "file_encoding": 1,
+            }
+            documents = await self.get_document_collection().find(query_filter, projection) \
+                .limit(settings.ARCHIVE_MAX_DOCUMENTS + 1) \
+                .to_list(length=settings.ARCHIVE_MAX_DOCUMENTS + 1)
+            if not documents:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No documents match the request")
+            if len(documents) > settings.ARCHIVE_MAX_DOCUMENTS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Archives are limited to {settings.ARCHIVE_MAX_DOCUMENTS} documents; narrow the filter"
+                )
+
+            department_ids = list({doc["department_id"] for doc in documents})
+            departments, document_types = {}, {}
+            async for dept in self.get_department_collection().find(
+                {"_id": {"$in": department_ids}}, {"name": 1, "document_types._id": 1, "document_types.name": 1}
+            ):
+                departments[dept["_id"]] = dept["name"]
+                for doc_type in dept.get("document_types", []):
+                    document_types[doc_type["_id"]] = doc_type["name"]
+
+            for doc in documents:
+                doc["department_name"] = departments.get(doc["department_id"], "Unknown")
+                doc["document_type_name"] = document_types.get(doc.get("document_type_id"), "")
+            documents.sort(key=lambda doc: (doc["department_name"], doc["ref_no"]))
+            return documents
+        except Exception as e:
+            handle_service_exception(e)
+
+    @staticmethod
+    async def _read_file(file_storage: FileStorageService, doc: Dict[str, Any], queue: asyncio.Queue) -> None:
+        """Feeds a file's chunks into its bounded queue, ending with None, or with the error that stopped it."""
+        try:
+            async for chunk in file_storage.open_file(
+                doc["file_path"], chunk_size=settings.ARCHIVE_READ_CHUNK_SIZE, encoding=doc.get("file_encoding")
+            ):
+                await queue.put(chunk)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def stream_archive(self, documents: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        """
+        Yields the ZIP as it is built. Up to ARCHIVE_PREFETCH_FILES files are read concurrently,
+        each buffering at most ARCHIVE_PREFETCH_CHUNKS chunks, while entries are written in order;
+        files are stored uncompressed since scans and PDFs are already compressed. A file that
+        fails before its first chunk is left out as "missing"; one that fails midway keeps the
+        bytes already sent and is marked "truncated" in the manifest.
+        """
+        file_storage = FileStorageService()
+        sink = _ZipSink()
+        archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        pending: Deque[Tuple[Dict[str, Any], asyncio.Queue, asyncio.Task]] = deque()
+        with_files = iter([doc for doc in documents if doc.get("file_path")])
+        manifest_rows = {id(doc): self._manifest_row(doc, "", "no file") for doc in documents}
+        used_names = set()
+        current = None
+
+        def prefetch() -> None:
+            while len(pending) < settings.ARCHIVE_PREFETCH_FILES:
+                doc = next(with_files, None)
+                if doc is None:
+                    return
+                queue = asyncio.Queue(maxsize=settings.ARCHIVE_PREFETCH_CHUNKS)
+                reader = self._read_file(file_storage, doc, queue)
+                pending.append((doc, queue, asyncio.create_task(reader)))
+
+        try:
+            prefetch()
+            while pending:
+                doc, queue, current = pending.popleft()
+                prefetch()
+
+                chunk = await queue.get()
+                if isinstance(chunk, Exception):
+                    logger.warning(f"Skipping {doc['file_path']} in archive: {str(chunk)}")
+                    manifest_rows[id(doc)] = self._manifest_row(doc, "", "missing")
+                    continue
+
+                entry_name = self._unique_name(doc, used_names)
+                info = zipfile.ZipInfo(entry_name, date_time=self._entry_time(doc))
+                info.compress_type = zipfile.ZIP_STORED
+                included = "yes"
+                with archive.open(info, mode="w", force_zip64=True) as entry:
+                    while chunk is not None:
+                        if isinstance(chunk, Exception):
+                            logger.warning(f"Truncated {doc['file_path']} in archive: {str(chunk)}")
+                            included = "truncated"
+                            break
+                        entry.write(chunk)
+                        yield sink.drain()
+                        chunk = await queue.get()
+                manifest_rows[id(doc)] = self._manifest_row(doc, entry_name, included)
+
+            manifest = io.StringIO()
+            writer = csv.DictWriter(manifest, fieldnames=MANIFEST_COLUMNS)
+            writer.writeheader()
+            writer.writerows(manifest_rows[id(doc)] for doc in documents)
+            archive.writestr(zipfile.ZipInfo(MANIFEST_NAME, date_time=datetime.now().timetuple()[:6]), manifest.getvalue())
+            archive.close()
+            yield sink.drain()
+        finally:
+            # The reader of the entry being written is no longer in pending
+            if current is not None:
+                current.cancel()
+            for _, _, task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _entry_time(doc: Dict[str, Any]) -> Tuple[int, ...]:
+        timestamp = doc.get("filed_date") or doc.get("created_date")
+        if not isinstance(timestamp, datetime) or timestamp.year < 1980:
+            timestamp = datetime.now()
+        return timestamp.timetuple()[:6]
+
+    def _unique_name(self, doc: Dict[str, Any], used_names: set) -> str:
+        extension = os.path.splitext(doc["file_path"])[1]
+        base = f"{self._entry_part(doc['department_name'])}/{self._entry_part(doc['ref_no'])}"
+        name, counter = f"{base}{extension}", 1
+        while name in used_names:
+            counter += 1
+            name = f"{base}-{counter}{extension}"
+        used_names.add(name)
+        return name
+
+    @staticmethod
+    def _manifest_row(doc: Dict[str, Any], entry_name: str, included: str) -> Dict[str, Any]:
+        def iso(value):
+            return value.isoformat() if isinstance(value, datetime) else value
+
+        return {
+            "entry": entry_name,
+            "ref_no": doc["ref_no"],
+            "title": doc.get("title"),
+            "department": doc["department_name"],
+            "document_type": doc["document_type_name"],
+            "status": doc.get("status"),
+            "created_by": doc.get("created_by"),
+            "created_date": iso(doc.get("created_date")),
+            "filed_by": doc.get("filed_by"),
+            "filed_date": iso(doc.get("filed_date")),
+            "file_size": doc.get("file_size"),
+            "file_checksum": doc.get("file_checksum"),
+            "included": included,
+        }
@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiofiles
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile, status
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.core.exceptions import handle_service_exception
+from app.core.utils import to_object_id
+from app.models.import_job import ImportJobModel
+from app.schemas.import_job import ImportJobResponse
+from app.services.csvservice import CSVImportService, DOCUMENT_IMPORT_MODES, DUPLICATE_IMPORT_MESSAGE, WRITE_COUNT_KEYS
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = ["queued", "running"]
+STAGING_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Identifies this process as the owner of the jobs it claims
+WORKER_ID = ObjectId()
+
+# Strong references to running job tasks so they are not garbage collected mid-run
+_running_jobs: Dict[ObjectId, asyncio.Task] = {}
+
+_background_task: Optional[asyncio.Task] = None
+
+
+class ImportJobLeaseLost(Exception):
+    """Raised when another process has taken over a job this process was running."""
+
+
+class ImportJobService:
+    """
+    Runs CSV document imports as background jobs persisted in the 'import_jobs' collection.
+    The upload is staged on disk and every committed chunk is checkpointed, so a job
+    interrupted by a crash or restart resumes after its last committed chunk.
+    """
+    def __init__(self, collection_name: str = ImportJobModel.COLLECTION_NAME):
+        self.collection_name = collection_name
+
+    def get_collection(self):
+        return MongoDB.get_database()[self.collection_name]
+
+    @staticmethod
+    def _staging_file(job_id: ObjectId) -> Path:
+        return Path(settings.IMPORT_STAGING_PATH).resolve() / f"{job_id}.csv"
+
+    @staticmethod
+    def _lease_until() -> datetime:
+        return datetime.now() + timedelta(seconds=settings.IMPORT_JOB_LEASE_SECONDS)
+
+    @staticmethod
+    def _to_response(job: dict) -> ImportJobResponse:
+        rows_per_second = 0.0
+        if job.get("started_date"):
+            elapsed = ((job.get("finished_date") or datetime.now()) - job["started_date"]).total_seconds()
+            if elapsed > 0:
+                rows_per_second = round(job.get("rows_read", 0) / elapsed, 1)
+        if job.get("duplicate_count"):
+            job = {**job, "message": DUPLICATE_IMPORT_MESSAGE.format(count=job["duplicate_count"])}
+        return ImportJobResponse(**job, rows_per_second=rows_per_second)
+
+    async def create_document_import_job(self, approval_paper_file: UploadFile, mode: str = "insert") -> ImportJobResponse:
+        if not approval_paper_file.filename.endswith('.csv'):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be a CSV")
+        if mode not in DOCUMENT_IMPORT_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid import mode. Must be one of {DOCUMENT_IMPORT_MODES}"
+            )
+
+        try:
+            job_id = ObjectId()
+            staging_file = self._staging_file(job_id)
+            os.makedirs(staging_file.parent, exist_ok=True)
+            async with aiofiles.open(staging_file, "wb") as out_file:
+                while chunk := await approval_paper_file.read(STAGING_COPY_CHUNK_SIZE):
+                    await out_file.write(chunk)
+
+            job = {
+                "_id": job_id,
+                "filename": approval_paper_file.filename,
+                "status": "queued",
+                "mode": mode,
+                "chunk_size": settings.CSV_IMPORT_CHUNK_SIZE,
+                "committed_chunks": 0,
+                "rows_read": 0,
+                **dict.fromkeys(WRITE_COUNT_KEYS, 0),
+                "skipped_count": 0,
+                "worker_id": WORKER_ID,
+                "lease_until": self._lease_until(),
+                "created_date": datetime.now(),
+            }
+            await self.get_collection().insert_one(job)
+            self._start(job_id)
+            return self._to_response(job)
+        except Exception as e:
+            handle_service_exception(e)
+
+    async def get_job(self, job_id: str) -> ImportJobResponse:
+        try:
+            job = await self.get_collection().find_one({"_id": to_object_id(job_id)})
+            if not job:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+            return self._to_response(job)
+        except Exception as e:
+            handle_service_exception(e)
+
+    async def resume_job(self, job_id: str) -> ImportJobResponse:
+        """Restarts a failed job from its last committed chunk."""
+        try:
+            job = await self.get_collection().find_one_and_update(
+                {"_id": to_object_id(job_id), "status": "failed", "staging_removed": {"$ne": True}},
+                {"$set": {
+                    "status": "queued", "worker_id": WORKER_ID, "lease_until": self._lease_until(),
+                    "error": None, "finished_date": None
+                }},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Only failed import jobs whose upload is still staged can be resumed"
+                )
+            self._start(job["_id"])
+            return self._to_response(job)
+        except Exception as e:
+            handle_service_exception(e)
+
+    async def resume_unfinished_jobs(self) -> int:
+        """
+        Claims and restarts queued or running jobs whose lease has expired, i.e. jobs whose
+        process stopped or crashed. Jobs of live processes keep a lease renewed by their runner,
+        and the claim is a conditional update, so only one process resumes a job.
+        """
+        resumed = 0
+        cursor = self.get_collection().find(
+            {
+                "status": {"$in": UNFINISHED_STATUSES},
+                "$or": [{"lease_until": {"$lt": datetime.now()}}, {"lease_until": None}],
+            },
+            {"_id": 1}
+        )
+        async for job in cursor:
+            if job["_id"] in _running_jobs:
+                continue
+            claimed = await self.get_collection().update_one(
+                {
+                    "_id": job["_id"],
+                    "status": {"$in": UNFINISHED_STATUSES},
+                    "$or": [{"lease_until": {"$lt": datetime.now()}}, {"lease_until": None}],
+                },
+                {"$set": {"worker_id": WORKER_ID, "lease_until": self._lease_until()}}
+            )
+            if claimed.matched_count:
+                self._start(job["_id"])
+                resumed += 1
+        return resumed
+
+    async def purge_expired_staging_files(self) -> int:
+        """
+        Removes staged CSVs older than IMPORT_STAGING_TTL_SECONDS unless their job is still
+        queued or running. Failed jobs keep their upload for resume_job until then, and uploads
+        left behind without a job record are removed as well.
+        """
+        staging_dir = Path(settings.IMPORT_STAGING_PATH).resolve()
+        if not staging_dir.is_dir():
+            return 0
+        cutoff = time.time() - settings.IMPORT_STAGING_TTL_SECONDS
+        removed = 0
+        for staging_file in staging_dir.glob("*.csv"):
+            if staging_file.stat().st_mtime >= cutoff or not ObjectId.is_valid(staging_file.stem):
+                continue
+            job_id = ObjectId(staging_file.stem)
+            job = await self.get_collection().find_one({"_id": job_id}, {"status": 1})
+            if job and job["status"] in UNFINISHED_STATUSES:
+                continue
+            staging_file.unlink(missing_ok=True)
+            if job:
+                await self.get_collection().update_one({"_id": job_id}, {"$set": {"staging_removed": True}})
+            removed += 1
+        return removed
+
+    @staticmethod
+    def start_background() -> None:
+        """
+        Periodically takes over jobs whose lease has expired and removes expired staging files and
+        dry-run reports, so jobs of a stopped or crashed process are picked up by the processes still running.
+        """
+        global _background_task
+
+        async def run() -> None:
+            service = ImportJobService()
+            while True:
+                try:
+                    resumed = await service.resume_unfinished_jobs()
+                    if resumed:
+                        logger.info(f"Resumed {resumed} interrupted import jobs")
+                    removed = await service.purge_expired_staging_files()
+                    if removed:
+                        logger.info(f"Removed {removed} expired import staging files")
+                    removed = await CSVImportService().purge_expired_reports()
+                    if removed:
+                        logger.info(f"Removed {removed} expired import reports")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Import job sweep failed: {str(e)}")
+                await asyncio.sleep(settings.IMPORT_JOB_LEASE_SECONDS)
+
+        _background_task = asyncio.create_task(run())
+
+    @staticmethod
+    async def stop_background() -> None:
+        if _background_task is not None:
+            _background_task.cancel()
+            await asyncio.gather(_background_task, return_exceptions=True)
+
+    @staticmethod
+    async def cancel_running_jobs() -> None:
+        """
+        Stops this process's jobs on shutdown. They stay 'running' with their lease released,
+        so another process resumes them from the last committed chunk.
+        """
+        tasks = list(_running_jobs.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job_id: ObjectId) -> None:
+        task = asyncio.create_task(self._run_job(job_id))
+        _running_jobs[job_id] = task
+        task.add_done_callback(lambda _: _running_jobs.pop(job_id, None))
+
+    async def _heartbeat(self, job_id: ObjectId, runner: asyncio.Task) -> None:
+        """Renews the job lease while it runs and stops the runner once another process owns the job."""
+        while True:
+            await asyncio.sleep(settings.IMPORT_JOB_LEASE_SECONDS / 3)
+            renewed = await self.get_collection().update_one(
+                {"_id": job_id, "worker_id": WORKER_ID},
+                {"$set": {"lease_until": self._lease_until()}}
+            )
+            if not renewed.matched_count:
+                logger.warning(f"Import job {job_id} was taken over by another process; stopping here")
+                runner.cancel(ImportJobLeaseLost.__name__)
+                return
+
+    async def _run_job(self, job_id: ObjectId) -> None:
+        collection = self.get_collection()
+        owned = {"_id": job_id, "worker_id": WORKER_ID}
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, asyncio.current_task()))
+        try:
+            job = await collection.find_one_and_update(
+                owned,
+                {"$set": {"status": "running", "lease_until": self._lease_until(), "updated_date": datetime.now()}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                raise ImportJobLeaseLost()
+            if not job.get("started_date"):
+                job["started_date"] = datetime.now()
+                await collection.update_one(owned, {"$set": {"started_date": job["started_date"]}})
+            logger.info(f"Import job {job_id} running from chunk {job['committed_chunks']}")
+
+            async def on_chunk_committed(chunk_index: int, stats: Dict[str, int]) -> None:
+                committed = await collection.update_one(
+                    owned,
+                    {
+                        "$set": {"committed_chunks": chunk_index + 1, "updated_date": datetime.now()},
+                        "$inc": stats
+                    }
+                )
+                if not committed.matched_count:
+                    raise ImportJobLeaseLost()
+
+            csv_service = CSVImportService()
+            dept_map, doc_type_map = await csv_service.get_document_import_maps()
+            with open(self._staging_file(job_id), "rb") as source:
+                await csv_service.run_document_import(
+                    source,
+                    dept_map,
+                    doc_type_map,
+                    mode=job.get("mode", "insert"),
+                    start_chunk=job["committed_chunks"],
+                    chunk_size=job["chunk_size"],
+                    on_chunk_committed=on_chunk_committed
+                )
+
+            completed = await collection.update_one(
+                owned,
+                {"$set": {"status": "completed", "finished_date": datetime.now()}}
+            )
+            if not completed.matched_count:
+                raise ImportJobLeaseLost()
+            logger.info(f"Import job {job_id} completed")
+            # The job is done whatever happens to its upload, e.g. already purged by the staging sweep
+            try:
+                os.remove(self._staging_file(job_id))
+            except OSError as e:
+                logger.warning(f"Could not remove the staged upload of import job {job_id}: {str(e)}")
+        except ImportJobLeaseLost:
+            logger.warning(f"Import job {job_id} is owned by another process; stopped running it here")
+        except asyncio.CancelledError as e:
+            if ImportJobLeaseLost.__name__ in e.args:
+                return
+            logger.info(f"Import job {job_id} interrupted; it will resume from its last committed chunk")
+            # Release the lease so a running process takes the job over without waiting for expiry
+            await collection.update_one(owned, {"$set": {"lease_until": None}})
+            raise
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Import job {job_id} failed: {error}")
+            await collection.update_one(
+                owned,
+                {"$set": {"status": "failed", "error": error, "finished_date": datetime.now()}}
+            )
+        finally:
+            heartbeat.cancel()
@@ -0,0 +1,350 @@
+"""
+Background integrity scrubber for stored attachments.
+
+Walks documents that have a file_path in _id order, re-hashes each file in a thread pool and
+compares it with the stored file_checksum (or file_size when no checksum was recorded).
+Missing or mismatching files are recorded in the ``integrity_failures`` collection, one entry
+per document, and removed again once the file checks out. Progress is checkpointed in
+``integrity_checkpoints`` after every batch, so a restarted scrubber resumes where it stopped.
+Reads are throttled to SCRUB_MAX_BYTES_PER_SECOND so scrubbing does not compete with serving.
+
+It runs inside the API process when SCRUB_ENABLED is set, or on its own:
+    python -m app.services.integrity_scrubber [--once]
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from math import ceil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.core.exceptions import handle_service_exception
+from app.models.document import DocumentModel
+from app.models.integrity import IntegrityFailureModel
+from app.schemas.integrity import IntegrityFailureListResponse
+from app.services.FileStorageService import FileStorageService
+from app.services.storage_compression import zstd_decompressor
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ID = "attachments"
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Identifies this process as the holder of the scrub lease
+WORKER_ID = ObjectId()
+
+_background_task: Optional[asyncio.Task] = None
+
+
+class _RateLimiter:
+    """Shared byte budget for the hashing threads and the event loop; 0 disables throttling."""
+    def __init__(self, bytes_per_second: int):
+        self.bytes_per_second = bytes_per_second
+        self.next_free = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, size: int) -> float:
+        """Books size bytes and returns how long the caller must wait before reading them."""
+        if self.bytes_per_second <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            start = max(self.next_free, now)
+            self.next_free = start + size / self.bytes_per_second
+            return start - now
+
+
+class IntegrityScrubber:
+    def __init__(self, batch_size: Optional[int] = None, threads: Optional[int] = None,
+                 bytes_per_second: Optional[int] = None):
+        self.batch_size = batch_size or settings.SCRUB_BATCH_SIZE
+        self.threads = threads or settings.SCRUB_THREADS
+        self.limiter = _RateLimiter(
+            settings.SCRUB_MAX_BYTES_PER_SECOND if bytes_per_second is None else bytes_per_second
+        )
+        self.storage = FileStorageService()
+        # Set when a batch is abandoned so hashing threads stop reading
+        self.abandoned = threading.Event()
+
+    def get_document_collection(self):
+        return MongoDB.get_database()[DocumentModel.COLLECTION_NAME]
+
+    def get_failure_collection(self):
+        return MongoDB.get_database()[IntegrityFailureModel.COLLECTION_NAME]
+
+    def get_checkpoint_collection(self):
+        return MongoDB.get_database()[IntegrityFailureModel.CHECKPOINT_COLLECTION_NAME]
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Takes or renews the scrub lease and returns the checkpoint, or None while another
+        process holds the lease, so only one API worker scrubs at a time.
+        """
+        now = datetime.now()
+        try:
+            return await self.get_checkpoint_collection().find_one_and_update(
+                {
+                    "_id": CHECKPOINT_ID,
+                    "$or": [{"lease_owner": WORKER_ID}, {"lease_until": {"$lt": now}}, {"lease_until": None}],
+                },
+                {
+                    "$set": {"lease_owner": WORKER_ID, "lease_until": now + timedelta(seconds=settings.SCRUB_LEASE_SECONDS)},
+                    "$setOnInsert": {"last_id": None, "pass_started": now, "checked": 0, "failed": 0, "bytes_read": 0},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return None
+
+    async def _renew_lease(self) -> bool:
+        """Extends the lease this process holds; False once another process has taken it over."""
+        renewed = await self.get_checkpoint_collection().update_one(
+            {"_id": CHECKPOINT_ID, "lease_owner": WORKER_ID},
+            {"$set": {"lease_until": datetime.now() + timedelta(seconds=settings.SCRUB_LEASE_SECONDS)}}
+        )
+        return renewed.matched_count > 0
+
+    async def _scrub_batch_leased(self, executor: ThreadPoolExecutor, documents: List[Dict]) -> Optional[Tuple[int, int]]:
+        """
+        Runs _scrub_batch while renewing the lease every third of SCRUB_LEASE_SECONDS, since a
+        throttled batch of large files can outlast the lease. Returns None, abandoning the batch,
+        if the lease was lost anyway.
+        """
+        self.abandoned.clear()
+        batch = asyncio.ensure_future(self._scrub_batch(executor, documents))
+        try:
+            while True:
+                done, _ = await asyncio.wait({batch}, timeout=settings.SCRUB_LEASE_SECONDS / 3)
+                if done:
+                    return batch.result()
+                if not await self._renew_lease():
+                    logger.warning("Integrity scrub lease was taken over by another process; abandoning the batch")
+                    self.abandoned.set()
+                    return None
+        finally:
+            if not batch.done():
+                batch.cancel()
+                await asyncio.gather(batch, return_exceptions=True)
+
+    def _hash_local(self, path: Path, encoding: Optional[str]) -> Tuple[str, int]:
+        """Reads and hashes a local file in a pool thread, decoding compressed files."""
+        checksum = hashlib.sha256()
+        size = 0
+        decompressor = zstd_decompressor() if encoding else None
+        with open(path, "rb") as source:
+            while chunk := source.read(READ_CHUNK_SIZE):
+                if self.abandoned.is_set():
+                    raise RuntimeError("Scrub batch abandoned")
+                delay = self.limiter.reserve(len(chunk))
+                if delay:
+                    time.sleep(delay)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                checksum.update(chunk)
+                size += len(chunk)
+        return checksum.hexdigest(), size
+
+    async def _hash_remote(self, executor: ThreadPoolExecutor, document: Dict) -> Tuple[str, int]:
+        """Streams a file from a remote backend, hashing in the pool while the next chunk downloads."""
+        loop = asyncio.get_running_loop()
+        checksum = hashlib.sha256()
+        size = 0
+        async for chunk in self.storage.open_file(
+            document["file_path"], chunk_size=READ_CHUNK_SIZE, encoding=document.get("file_encoding")
+        ):
+            delay = self.limiter.reserve(len(chunk))
+            if delay:
+                await asyncio.sleep(delay)
+            await loop.run_in_executor(executor, checksum.update, chunk)
+            size += len(chunk)
+        return checksum.hexdigest(), size
+
+    async def _check(self, executor: ThreadPoolExecutor, document: Dict) -> Optional[Dict[str, Any]]:
+        """Returns the failure found for a document's file, or None when it is intact."""
+        failure = {
+            "file_path": document["file_path"],
+            "expected_checksum": document.get("file_checksum"),
+            "expected_size": document.get("file_size"),
+        }
+        try:
+            local_file = self.storage.get_file_path(document["file_path"])
+            if local_file is not None:
+                checksum, size = await asyncio.get_running_loop().run_in_executor(
+                    executor, self._hash_local, local_file, document.get("file_encoding")
+                )
+            else:
+                checksum, size = await self._hash_remote(executor, document)
+        except FileNotFoundError:
+            return {**failure, "kind": "missing"}
+        except Exception as e:
+            return {**failure, "kind": "unreadable", "error": str(e)}
+
+        if document.get("file_checksum"):
+            if checksum != document["file_checksum"]:
+                return {**failure, "kind": "checksum_mismatch", "actual_checksum": checksum, "actual_size": size}
+        elif document.get("file_size") is not None and size != document["file_size"]:
+            return {**failure, "kind": "size_mismatch", "actual_checksum": checksum, "actual_size": size}
+        return None
+
+    async def _scrub_batch(self, executor: ThreadPoolExecutor, documents: List[Dict]) -> Tuple[int, int]:
+        semaphore = asyncio.Semaphore(self.threads)
+
+        async def check(document: Dict) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self._check(executor, document)
+
+        results = await asyncio.gather(*(check(document) for document in documents))
+        now = datetime.now()
+        failures = self.get_failure_collection()
+        failed, bytes_read = 0, 0
+        for document, failure in zip(documents, results):
+            if failure is None or failure["kind"] not in ("missing", "unreadable"):
+                bytes_read += document.get("file_stored_size") or document.get("file_size") or 0
+            if failure is None:
+                await failures.delete_one({"document_id": document["_id"]})
+                continue
+            failed += 1
+            logger.warning(f"Integrity check failed for {document['file_path']}: {failure['kind']}")
+            await failures.update_one(
+                {"document_id": document["_id"]},
+                {"$set": {**failure, "last_checked": now}, "$setOnInsert": {"first_detected": now}},
+                upsert=True
+            )
+        return failed, bytes_read
+
+    async def scrub(self, once: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Scrubs batch after batch from the checkpoint. With once=True it runs one full pass right
+        away and returns its summary; otherwise passes start SCRUB_PASS_INTERVAL_SECONDS apart.
+        """
+        projection = {"file_path": 1, "file_size": 1, "file_checksum": 1, "file_encoding": 1, "file_stored_size": 1}
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="scrubber") as executor:
+            while True:
+                checkpoint = await self._claim()
+                if checkpoint is None:
+                    await asyncio.sleep(settings.SCRUB_LEASE_SECONDS)
+                    continue
+                next_pass = checkpoint.get("next_pass")
+                if not once and checkpoint["last_id"] is None and next_pass and next_pass > datetime.now():
+                    # Renew the lease while waiting so the pause is not taken over by another process
+                    wait = (next_pass - datetime.now()).total_seconds()
+                    await asyncio.sleep(min(wait, settings.SCRUB_LEASE_SECONDS / 2))
+                    continue
+
+                query: Dict[str, Any] = {"file_path": {"$nin": [None, ""]}}
+                if checkpoint["last_id"] is not None:
+                    query["_id"] = {"$gt": checkpoint["last_id"]}
+                documents = await self.get_document_collection().find(query, projection) \
+                    .sort("_id", 1).limit(self.batch_size).to_list(length=self.batch_size)
+
+                if documents:
+                    result = await self._scrub_batch_leased(executor, documents)
+                    if result is None:
+                        continue
+                    failed, bytes_read = result
+                    await self.get_checkpoint_collection().update_one(
+                        {"_id": CHECKPOINT_ID, "lease_owner": WORKER_ID},
+                        {
+                            "$set": {"last_id": documents[-1]["_id"], "updated_date": datetime.now()},
+                            "$inc": {"checked": len(documents), "failed": failed, "bytes_read": bytes_read},
+                        }
+                    )
+                    continue
+
+                # End of a pass: failures not seen again belong to deleted documents or detached files
+                await self.get_failure_collection().delete_many({"last_checked": {"$lt": checkpoint["pass_started"]}})
+                summary = {
+                    "started": checkpoint["pass_started"],
+                    "finished": datetime.now(),
+                    "checked": checkpoint["checked"],
+                    "failed": checkpoint["failed"],
+                    "bytes_read": checkpoint["bytes_read"],
+                }
+                # Keep the pass summary and start the next pass from the beginning
+                await self.get_checkpoint_collection().update_one(
+                    {"_id": CHECKPOINT_ID, "lease_owner": WORKER_ID},
+                    {"$set": {
+                        "last_pass": summary, "last_id": None,
+                        "next_pass": summary["finished"] + timedelta(seconds=settings.SCRUB_PASS_INTERVAL_SECONDS),
+                        "pass_started": summary["finished"], "checked": 0, "failed": 0, "bytes_read": 0,
+                    }}
+                )
+                logger.info(f"Integrity scrub pass finished: {summary['checked']} files, {summary['failed']} failures")
+                if once:
+                    return summary
+
+    async def get_failures(self, page: int = 1, limit: int = 50, kind: Optional[str] = None) -> IntegrityFailureListResponse:
+        try:
+            query = {"kind": kind} if kind else {}
+            total = await self.get_failure_collection().count_documents(query)
+            failures = await self.get_failure_collection().find(query) \
+                .sort("last_checked", -1).skip((page - 1) * limit).limit(limit).to_list(length=limit)
+            checkpoint = await self.get_checkpoint_collection().find_one(
+                {"_id": CHECKPOINT_ID}, {"_id": 0, "lease_owner": 0}
+            )
+            return IntegrityFailureListResponse(
+                total=total,
+                page=page,
+                limit=limit,
+                pages=ceil(total / limit) if total else 0,
+                failures=failures,
+                checkpoint=checkpoint
+            )
+        except Exception as e:
+            handle_service_exception(e)
+
+    @staticmethod
+    def start_background() -> None:
+        """Starts the scrubber as a task of the running API process."""
+        global _background_task
+
+        async def run() -> None:
+            try:
+                await IntegrityScrubber().scrub()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Integrity scrubber stopped: {str(e)}")
+
+        _background_task = asyncio.create_task(run())
+
+    @staticmethod
+    async def stop_background() -> None:
+        """Stops the scrubber on shutdown; the next start resumes from the checkpoint."""
+        if _background_task is not None:
+            _background_task.cancel()
+            await asyncio.gather(_background_task, return_exceptions=True)
+
+
+async def run_scrubber(once: bool) -> Optional[Dict]:
+    await MongoDB.connect_to_database()
+    try:
+        await IntegrityFailureModel.ensure_indexes()
+        return await IntegrityScrubber().scrub(once=once)
+    finally:
+        await MongoDB.close_database_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-hash stored attachments and record missing or corrupted files")
+    parser.add_argument("--once", action="store_true", help="Stop after one full pass instead of running continuously")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    print(asyncio.run(run_scrubber(args.once)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
+import argparse
+import asyncio
+from datetime import datetime, timezone
 from bson import ObjectId
 from faker import Faker
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
 import random
 import logging
 
@@ -8,7 +13,9 @@ from app.core.database import MongoDB
 from app.schemas.admin import AdminUser
 from app.schemas.base import PyObjectId
 from app.schemas.document import DocumentCreate
+from app.services.department import DepartmentService
 from app.services.document import DocumentService
+from app.services.utils import format_ref_no
 
 # Initialize Faker
 fake = Faker()
@@ -18,7 +25,15 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 
-async def seed_users() -> List[Dict]:
+def seeded_object_ids(rng: np.random.Generator, count: int, created: datetime) -> List[ObjectId]:
+    """ObjectIds carrying the timestamp of ``created`` with tails drawn from ``rng``, so seeded reruns match."""
+    timestamp = int(created.replace(tzinfo=timezone.utc).timestamp()).to_bytes(4, "big")
+    tails = rng.integers(0, 256, size=(count, 8), dtype=np.uint8)
+    return [ObjectId(timestamp + tail.tobytes()) for tail in tails]
+
+
+async def seed_users(rng: Optional[np.random.Generator] = None, created: Optional[datetime] = None) -> List[Dict]:
+    """Replaces the users; with ``rng`` and ``created`` their ids are reproducible."""
     db = MongoDB.get_database()
     users = []
     usernames = [
@@ -32,10 +47,11 @@ async def seed_users() -> List[Dict]:
         "chuacy"
     ]
 
-    for username in usernames:
+    ids = seeded_object_ids(rng, len(usernames), created) if rng is not None else None
+    for i, username in enumerate(usernames):
         user = AdminUser(username=username)
         users.append(user.model_dump(by_alias=True))
-        users[-1]["_id"] = ObjectId()
+        users[-1]["_id"] = ids[i] if ids else ObjectId()
 
     await db["users"].delete_many({})
     await db["users"].insert_many(users)
@@ -43,7 +59,12 @@ async def seed_users() -> List[Dict]:
     return users
 
 
-async def seed_departments() -> List[Dict]:
+async def seed_departments(rng: Optional[np.random.Generator] = None,
+                           created: Optional[datetime] = None) -> List[Dict]:
+    """
+    Replaces the departments and their document types. With ``rng`` and ``created`` the ids
+    come from ``rng`` and everything is created at ``created``, so seeded reruns match.
+    """
     db = MongoDB.get_database()
 
     department_map = {
@@ -109,27 +130,36 @@ async def seed_departments() -> List[Dict]:
         prefix_code = prefix_map.get(doc_type_name, ''.join(filter(str.isalnum, doc_type_name)).upper()[:6])
         return f"{dept_code}-{prefix_code}"
 
+    def new_id() -> ObjectId:
+        return seeded_object_ids(rng, 1, created)[0] if rng is not None else ObjectId()
+
+    def created_date() -> datetime:
+        return created if rng is not None else fake.date_time_this_decade()
+
     departments = []
     for dept_name, doc_type_names in department_map.items():
         doc_types = []
         for doc_type_name in doc_type_names:
             doc_types.append({
-                "_id": ObjectId(),
+                "_id": new_id(),
                 "name": doc_type_name,
                 "prefix": generate_prefix(dept_name, doc_type_name),
                 "padding": 2,
-                "created_date": fake.date_time_this_decade()
+                "counters": {},
+                "created_date": created_date()
             })
 
         departments.append({
-            "_id": ObjectId(),
+            "_id": new_id(),
             "name": dept_name,
+            "status": 1,
             "document_types": doc_types,
-            "created_date": fake.date_time_this_decade()
+            "created_date": created_date()
         })
 
     await db["departments"].delete_many({})
     await db["departments"].insert_many(departments)
+    await DepartmentService().bump_version()
     logger.info(
         f"Seeded {len(departments)} departments with {sum(len(d['document_types']) for d in departments)} document types"
     )
@@ -167,6 +197,136 @@ async def seed_documents(departments: List[Dict], users: List[Dict]) -> None:
         logger.warning(f"Expected at least 100 documents, but got {doc_count}")
 
 
+# Share of documents per status, matching production
+STATUS_WEIGHTS = {"Filed": 0.70, "Not Filed": 0.25, "Suspended": 0.05}
+
+
+# Years of documents generated by the scale seeder, ending at --end-year
+SCALE_YEARS = 10
+
+
+class ScaleDocumentGenerator:
+    """
+    Generates reproducible batches of documents with production-like distributions:
+    Zipf-skewed document types (and so departments), log-normal title lengths,
+    document volume growing over the years and filing delays of a few weeks.
+    All randomness comes from one seeded NumPy generator and one seeded Faker.
+    """
+    def __init__(self, departments: List[Dict], users: List[Dict], seed: int, end_year: int, years: int = SCALE_YEARS):
+        self.rng = np.random.default_rng(seed)
+        faker = Faker()
+        faker.seed_instance(seed)
+        self.vocabulary = np.array(sorted({word.title() for word in faker.words(nb=5000)}))
+        self.usernames = np.array([user["username"] for user in users])
+
+        self.doc_types = [
+            (dept["_id"], doc_type["_id"], doc_type["name"], doc_type["prefix"], doc_type.get("padding", 2))
+            for dept in departments
+            for doc_type in dept["document_types"]
+        ]
+        ranks = self.rng.permutation(len(self.doc_types)) + 1
+        weights = 1.0 / ranks ** 1.1
+        self.doc_type_weights = weights / weights.sum()
+
+        self.years = np.arange(end_year - years + 1, end_year + 1)
+        year_weights = np.linspace(1.0, 3.0, len(self.years))
+        self.year_weights = year_weights / year_weights.sum()
+
+        # Next sequence number per (document type index, year), carried across batches
+        self.counters: Dict[Tuple[int, int], int] = {}
+
+    def generate(self, size: int) -> List[Dict]:
+        rng = self.rng
+        type_idx = rng.choice(len(self.doc_types), size=size, p=self.doc_type_weights)
+        years = rng.choice(self.years, size=size, p=self.year_weights)
+        seconds_in_year = rng.integers(0, 365 * 24 * 3600, size=size)
+        created = pd.to_datetime(years.astype(str), format="%Y") + pd.to_timedelta(seconds_in_year, unit="s")
+        statuses = rng.choice(list(STATUS_WEIGHTS), size=size, p=list(STATUS_WEIGHTS.values()))
+        filed = statuses == "Filed"
+        filed_delay = pd.to_timedelta(rng.exponential(14 * 24 * 3600, size=size).astype("int64"), unit="s")
+
+        # Sequence numbers continue per (document type, year) across batches
+        frame = pd.DataFrame({"type_idx": type_idx, "year": years})
+        sequence = frame.groupby(["type_idx", "year"]).cumcount().to_numpy() + 1
+        offsets = np.array([self.counters.get(key, 0) for key in zip(type_idx.tolist(), years.tolist())])
+        sequence += offsets
+        for key, count in frame.value_counts().items():
+            self.counters[key] = self.counters.get(key, 0) + count
+
+        title_lengths = np.clip(rng.lognormal(mean=1.6, sigma=0.5, size=size).astype(int), 2, 30)
+        words = self.vocabulary[rng.integers(0, len(self.vocabulary), size=(size, 30))]
+
+        # ObjectIds derived from the creation time and the seeded generator, so reruns match
+        tails = rng.integers(0, 256, size=(size, 8), dtype=np.uint8)
+        timestamps = (created.astype("int64") // 10 ** 9).to_numpy().astype(">u4")
+
+        created_dates = created.to_pydatetime()
+        filed_dates = (created + filed_delay).to_pydatetime()
+        creators = self.usernames[rng.integers(0, len(self.usernames), size=size)].tolist()
+        filers = self.usernames[rng.integers(0, len(self.usernames), size=size)].tolist()
+
+        documents = []
+        for i in range(size):
+            dept_id, doc_type_id, doc_type_name, prefix, padding = self.doc_types[type_idx[i]]
+            status = str(statuses[i])
+            documents.append({
+                "_id": ObjectId(timestamps[i].tobytes() + tails[i].tobytes()),
+                "ref_no": format_ref_no(prefix, int(sequence[i]), padding, int(years[i])),
+                "title": f"{doc_type_name} for {' '.join(words[i, :title_lengths[i]])}",
+                "status": status,
+                "created_by": creators[i],
+                "created_date": created_dates[i],
+                "filed_by": filers[i] if status != "Not Filed" else None,
+                "filed_date": filed_dates[i] if filed[i] else None,
+                "document_type_id": doc_type_id,
+                "department_id": dept_id,
+            })
+        return documents
+
+    def counter_updates(self) -> Dict[Tuple[ObjectId, ObjectId], Dict[str, int]]:
+        """Per (department, document type), the highest sequence generated for each year."""
+        updates: Dict[Tuple[ObjectId, ObjectId], Dict[str, int]] = {}
+        for (type_idx, year), count in self.counters.items():
+            dept_id, doc_type_id = self.doc_types[type_idx][:2]
+            updates.setdefault((dept_id, doc_type_id), {})[str(year)] = count
+        return updates
+
+
+async def seed_documents_at_scale(departments: List[Dict], users: List[Dict], total: int, seed: int,
+                                  end_year: int, batch_size: int = 10000, concurrency: int = 4) -> None:
+    """
+    Generates ``total`` documents in NumPy batches and writes them with parallel
+    unordered insert_many calls, then advances the document type counters so that
+    documents created afterwards continue the generated ref_no sequences.
+    """
+    db = MongoDB.get_database()
+    generator = ScaleDocumentGenerator(departments, users, seed, end_year)
+    in_flight: set = set()
+    inserted = 0
+    started = datetime.now()
+
+    for start in range(0, total, batch_size):
+        documents = await asyncio.to_thread(generator.generate, min(batch_size, total - start))
+        if len(in_flight) >= concurrency:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            inserted += sum(len(task.result().inserted_ids) for task in done)
+            elapsed = (datetime.now() - started).total_seconds()
+            logger.info(f"Inserted {inserted}/{total} documents ({inserted / elapsed:,.0f} docs/sec)")
+        in_flight.add(asyncio.create_task(db["documents"].insert_many(documents, ordered=False)))
+
+    if in_flight:
+        done, _ = await asyncio.wait(in_flight)
+        inserted += sum(len(task.result().inserted_ids) for task in done)
+
+    for (dept_id, doc_type_id), counters in generator.counter_updates().items():
+        await db["departments"].update_one(
+            {"_id": dept_id, "document_types._id": doc_type_id},
+            {"$set": {f"document_types.$.counters.{year}": count for year, count in counters.items()}}
+        )
+    await DepartmentService().bump_version(counters=True)
+    logger.info(f"Seeded {inserted} documents in {(datetime.now() - started).total_seconds():.1f}s")
+
+
 async def seed_data():
     """Seed all data (10 users, 20 departments, 1 department with 8 document types, 1 document type with 100 documents)"""
     try:
@@ -183,3 +343,38 @@ async def seed_data():
     except Exception as e:
         logger.error(f"❌ Error seeding database: {str(e)}")
         raise
+
+
+async def seed_scale_data(total: int, seed: int, end_year: int, batch_size: int, concurrency: int) -> None:
+    """Reseed users and departments, then generate ``total`` documents from ``seed``."""
+    fake.seed_instance(seed)
+    random.seed(seed)
+    # Separate stream from the document generator's, seeded from the same value
+    id_rng = np.random.default_rng([seed, 1])
+    created = datetime(end_year - SCALE_YEARS + 1, 1, 1)
+    await MongoDB.connect_to_database()
+    try:
+        users = await seed_users(id_rng, created)
+        departments = await seed_departments(id_rng, created)
+        await MongoDB.get_database()["documents"].delete_many({})
+        await seed_documents_at_scale(departments, users, total, seed, end_year, batch_size, concurrency)
+    finally:
+        await MongoDB.close_database_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replace the database contents with a reproducible production-scale dataset."
+    )
+    parser.add_argument("--documents", type=int, default=1_000_000, help="Number of documents to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed yields the same dataset")
+    parser.add_argument("--end-year", type=int, default=datetime.now().year - 1,
+                        help="Last year documents are created in; pin it to keep datasets identical across years")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Documents per insert_many call")
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many calls in flight at once")
+    args = parser.parse_args()
+    asyncio.run(seed_scale_data(args.documents, args.seed, args.end_year, args.batch_size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Storage backends behind FileStorageService.
+
+Every backend stores opaque objects under a POSIX-style key (the relative path that
+documents keep in file_path) and moves data as async chunk streams, so no backend ever
+holds a whole file in memory:
+
+- ``put`` consumes an async iterator of chunks; large objects go up as multipart
+  uploads (S3) or GridFS chunks, and a failed upload never replaces the existing object.
+- ``get`` yields chunks of ``[start, end)``, which is what HTTP range requests need.
+- ``stat`` returns size and modification time, or None when the key does not exist.
+- ``delete`` is idempotent.
+"""
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiofiles
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.core.config import settings
+from app.core.database import MongoDB
+
+READ_CHUNK_SIZE = 256 * 1024
+
+
+class StorageBackend(ABC):
+    """Async streaming object store keyed by relative path."""
+    name: str
+
+    @abstractmethod
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> None:
+        """Stores the chunks under key, replacing any existing object only once the upload completed."""
+
+    @abstractmethod
+    def get(self, key: str, start: int = 0, end: Optional[int] = None,
+            chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yields the bytes of key in [start, end); raises FileNotFoundError when key does not exist."""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns {"size", "last_modified"} for key, or None when it does not exist."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Removes key; removing a missing key is not an error."""
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Filesystem path of key when the backend is a local disk, so callers can use sendfile paths."""
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def local_path(self, key: str) -> Path:
+        return self.root / key
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> None:
+        target = self.local_path(key)
+        os.makedirs(target.parent, exist_ok=True)
+        # Written through a hidden temp file in the same directory and renamed into place
+        temp_path = target.parent / f".{target.name}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(temp_path, "wb") as out_file:
+                async for chunk in chunks:
+                    await out_file.write(chunk)
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None,
+                  chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.local_path(key), "rb") as source:
+            await source.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await source.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def stat(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            stat_result = await asyncio.to_thread(os.stat, self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return {
+            "size": stat_result.st_size,
+            "last_modified": datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc),
+        }
+
+    async def delete(self, key: str) -> None:
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class GridFSStorageBackend(StorageBackend):
+    """Objects are GridFS files named by key; a put uploads a new revision and then drops the older ones."""
+    name = "gridfs"
+
+    def __init__(self, bucket_name: str, chunk_size_bytes: int):
+        self.bucket_name = bucket_name
+        self.chunk_size_bytes = chunk_size_bytes
+
+    def get_bucket(self) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(
+            MongoDB.get_database(), bucket_name=self.bucket_name, chunk_size_bytes=self.chunk_size_bytes
+        )
+
+    def get_files_collection(self):
+        return MongoDB.get_database()[f"{self.bucket_name}.files"]
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> None:
+        bucket = self.get_bucket()
+        grid_in = bucket.open_upload_stream(key, metadata={"content_type": content_type})
+        try:
+            async for chunk in chunks:
+                await grid_in.write(chunk)
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        async for old in self.get_files_collection().find({"filename": key, "_id": {"$ne": grid_in._id}}, {"_id": 1}):
+            await bucket.delete(old["_id"])
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None,
+                  chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        newest = await self.get_files_collection().find_one({"filename": key}, sort=[("uploadDate", -1)])
+        if newest is None:
+            raise FileNotFoundError(key)
+        grid_out = await self.get_bucket().open_download_stream(newest["_id"])
+        grid_out.seek(start)
+        remaining = (end if end is not None else grid_out.length) - start
+        while remaining > 0:
+            chunk = await grid_out.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def stat(self, key: str) -> Optional[Dict[str, Any]]:
+        newest = await self.get_files_collection().find_one(
+            {"filename": key}, {"length": 1, "uploadDate": 1}, sort=[("uploadDate", -1)]
+        )
+        if newest is None:
+            return None
+        return {"size": newest["length"], "last_modified": newest["uploadDate"].replace(tzinfo=timezone.utc)}
+
+    async def delete(self, key: str) -> None:
+        bucket = self.get_bucket()
+        async for revision in self.get_files_collection().find({"filename": key}, {"_id": 1}):
+            await bucket.delete(revision["_id"])
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-compatible object storage (AWS, MinIO). boto3 calls run in worker threads; uploads
+    larger than S3_MULTIPART_PART_SIZE are sent as multipart uploads, one part buffered at a time.
+    """
+    name = "s3"
+
+    def __init__(self, bucket: str, part_size: int):
+        self.bucket = bucket
+        self.part_size = part_size
+        self.client = _s3_client()
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        response = getattr(error, "response", None) or {}
+        return response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}
+
+    async def put(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+
+        async def flush_part() -> None:
+            part_number = len(parts) + 1
+            response = await asyncio.to_thread(
+                self.client.upload_part, Bucket=self.bucket, Key=key, UploadId=upload_id,
+                PartNumber=part_number, Body=bytes(buffer)
+            )
+            parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+            buffer.clear()
+
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        response = await asyncio.to_thread(
+                            self.client.create_multipart_upload, Bucket=self.bucket, Key=key, **extra
+                        )
+                        upload_id = response["UploadId"]
+                    await flush_part()
+
+            if upload_id is None:
+                await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra)
+            else:
+                if buffer:
+                    await flush_part()
+                await asyncio.to_thread(
+                    self.client.complete_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id,
+                    MultipartUpload={"Parts": parts}
+                )
+        except BaseException:
+            if upload_id is not None:
+                await asyncio.to_thread(self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    async def get(self, key: str, start: int = 0, end: Optional[int] = None,
+                  chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        try:
+            response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key, **extra)
+        except Exception as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        body = response["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def stat(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return {"size": response["ContentLength"], "last_modified": response["LastModified"]}
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+
+@lru_cache(maxsize=1)
+def _s3_client():
+    try:
+        import boto3
+    except ImportError:
+        raise RuntimeError("STORAGE_TYPE=s3 requires the boto3 package")
+    return boto3.client(
+        "s3",
+        endpoint_url=settings.S3_ENDPOINT_URL or None,
+        region_name=settings.S3_REGION or None,
+        aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+        aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+    )
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend selected by STORAGE_TYPE."""
+    if settings.STORAGE_TYPE == "local":
+        return LocalStorageBackend(Path(settings.STORAGE_PATH).resolve())
+    if settings.STORAGE_TYPE == "gridfs":
+        return GridFSStorageBackend(settings.GRIDFS_BUCKET_NAME, settings.GRIDFS_CHUNK_SIZE_BYTES)
+    if settings.STORAGE_TYPE == "s3":
+        if not settings.S3_BUCKET:
+            raise RuntimeError("STORAGE_TYPE=s3 requires S3_BUCKET")
+        return S3StorageBackend(settings.S3_BUCKET, settings.S3_MULTIPART_PART_SIZE)
+    raise RuntimeError(f"Unknown STORAGE_TYPE '{settings.STORAGE_TYPE}'")
@@ -0,0 +1,301 @@
+"""
+Reconciles the storage tree with the file_path references in Mongo.
+Only local storage (STORAGE_TYPE="local") is walked.
+
+The tree is split into partitions (each top-level directory, and each blobs/<aa> fan-out
+directory). Within a partition the files found by os.scandir and the file_path values
+streamed from Mongo with an index-backed prefix query are both produced in path order and
+merge-diffed, so memory is bounded by one directory listing and a batch of orphans rather
+than by the size of the partition. Files nobody references are orphans; references to
+files that do not exist are dangling. Orphans can be reported, deleted or moved to
+STORAGE_QUARANTINE_PATH.
+
+Usage:
+    python -m app.services.storage_reconciliation [--action report|delete|quarantine] [--min-age 3600]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.models.blob import BlobModel
+from app.models.document import DocumentModel
+from app.services.FileStorageService import BLOB_PREFIX, FileStorageService
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_ACTIONS = {"report", "delete", "quarantine"}
+SAMPLE_SIZE = 1000
+# Hidden temp files written by LocalStorageBackend.put
+TEMP_FILE_PATTERN = re.compile(r"^\..+\.[0-9a-f]{32}\.tmp$")
+
+
+class StorageReconciliationService:
+    def __init__(self, action: str = "report", min_age_seconds: Optional[int] = None):
+        if action not in RECONCILE_ACTIONS:
+            raise ValueError(f"Unknown action '{action}', expected one of {sorted(RECONCILE_ACTIONS)}")
+        self.action = action
+        self.min_age_seconds = settings.STORAGE_GC_MIN_AGE_SECONDS if min_age_seconds is None else min_age_seconds
+        self.storage = FileStorageService()
+        if self.storage.backend.local_path("") is None:
+            raise ValueError(f"Storage reconciliation walks the local filesystem; STORAGE_TYPE '{settings.STORAGE_TYPE}' is not supported")
+        self.root = self.storage.storage_path
+        self.excluded = {
+            Path(path).resolve()
+            for path in (settings.IMPORT_STAGING_PATH, settings.ATTACHMENT_IMPORT_PATH, settings.STORAGE_QUARANTINE_PATH)
+        }
+        self.quarantine_path = Path(settings.STORAGE_QUARANTINE_PATH).resolve() / datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    def get_document_collection(self):
+        return MongoDB.get_database()[DocumentModel.COLLECTION_NAME]
+
+    def get_blob_collection(self):
+        return MongoDB.get_database()[BlobModel.COLLECTION_NAME]
+
+    def _is_skipped(self, entry: os.DirEntry) -> bool:
+        if entry.name.startswith(".") and not TEMP_FILE_PATTERN.match(entry.name):
+            return True
+        return Path(entry.path).resolve() in self.excluded
+
+    def _partitions(self) -> List[str]:
+        """Relative directories diffed one at a time; "" holds the files directly under the root."""
+        partitions = [""]
+        with os.scandir(self.root) as scanner:
+            for entry in scanner:
+                if not entry.is_dir(follow_symlinks=False) or self._is_skipped(entry):
+                    continue
+                if entry.name == BLOB_PREFIX:
+                    with os.scandir(entry.path) as blob_scanner:
+                        partitions.extend(
+                            f"{BLOB_PREFIX}/{sub.name}" for sub in blob_scanner
+                            if sub.is_dir(follow_symlinks=False) and not self._is_skipped(sub)
+                        )
+                    partitions.append(BLOB_PREFIX + "/")
+                else:
+                    partitions.append(entry.name)
+        return sorted(partitions)
+
+    def _sorted_entries(self, directory: Path, recursive: bool) -> List[os.DirEntry]:
+        """
+        A directory's entries in the order their relative paths sort. Directories sort by
+        name + "/", as every path beneath them does ("a.txt" comes before "a/b").
+        """
+        entries = []
+        with os.scandir(directory) as scanner:
+            for entry in scanner:
+                if self._is_skipped(entry):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        entries.append((entry.name + "/", entry))
+                elif entry.is_file(follow_symlinks=False):
+                    entries.append((entry.name, entry))
+        return [entry for _, entry in sorted(entries, key=lambda item: item[0])]
+
+    def _walk(self, partition: str) -> Iterator[Tuple[str, int, float]]:
+        """Yields (relative_path, size, mtime) for the files in a partition, sorted by relative_path."""
+        if partition == "" or partition.endswith("/"):
+            # Files sitting directly in the root or in blobs/, without descending
+            directory, recursive = self.root / partition.rstrip("/"), False
+        else:
+            directory, recursive = self.root / partition, True
+        pending = [iter(self._sorted_entries(directory, recursive))]
+        while pending:
+            entry = next(pending[-1], None)
+            if entry is None:
+                pending.pop()
+            elif entry.is_dir(follow_symlinks=False):
+                pending.append(iter(self._sorted_entries(Path(entry.path), recursive)))
+            else:
+                stat_result = entry.stat(follow_symlinks=False)
+                relative_path = Path(entry.path).relative_to(self.root).as_posix()
+                yield relative_path, stat_result.st_size, stat_result.st_mtime
+
+    @staticmethod
+    def _next_batch(iterator: Iterator, size: int) -> List:
+        batch = []
+        for item in iterator:
+            batch.append(item)
+            if len(batch) >= size:
+                break
+        return batch
+
+    @staticmethod
+    def _reference_filter(partition: str) -> Dict:
+        if partition == "":
+            return {"file_path": {"$regex": "^[^/]+$"}}
+        if partition.endswith("/"):
+            return {"file_path": {"$regex": f"^{re.escape(partition)}[^/]+$"}}
+        return {"file_path": {"$regex": f"^{re.escape(partition)}/"}}
+
+    async def _files_on_disk(self, partition: str) -> AsyncIterator[Tuple[str, int, float]]:
+        iterator = self._walk(partition)
+        while batch := await asyncio.to_thread(self._next_batch, iterator, settings.STORAGE_GC_SCAN_BATCH):
+            for item in batch:
+                yield item
+
+    async def _referenced_paths(self, partition: str) -> AsyncIterator[str]:
+        """Distinct file_path values in a partition, in path order (blobs are shared by many documents)."""
+        cursor = self.get_document_collection().find(
+            self._reference_filter(partition), {"_id": 0, "file_path": 1}
+        ).sort("file_path", 1).batch_size(settings.STORAGE_GC_SCAN_BATCH)
+        previous = None
+        async for document in cursor:
+            if document["file_path"] != previous:
+                previous = document["file_path"]
+                yield previous
+
+    def _dispose(self, relative_paths: List[str], cutoff: float) -> List[Dict]:
+        """
+        Deletes or quarantines orphans; returns the failures. Files touched since the scan, such
+        as files the sharding migration just staged, are left alone.
+        """
+        failures = []
+        for relative_path in relative_paths:
+            source = self.root / relative_path
+            try:
+                if os.stat(source).st_mtime > cutoff:
+                    failures.append({"file": relative_path, "error": "modified since the scan"})
+                    continue
+                if self.action == "delete":
+                    os.remove(source)
+                else:
+                    target = self.quarantine_path / relative_path
+                    os.makedirs(target.parent, exist_ok=True)
+                    shutil.move(source, target)
+            except OSError as e:
+                failures.append({"file": relative_path, "error": str(e)})
+        return failures
+
+    async def reconcile(self) -> Dict:
+        report = {
+            "action": self.action,
+            "partitions": 0,
+            "files_scanned": 0,
+            "bytes_scanned": 0,
+            "referenced_count": 0,
+            "orphan_count": 0,
+            "reclaimable_bytes": 0,
+            "skipped_recent": 0,
+            "dangling_count": 0,
+            "disposed_count": 0,
+            "orphans": [],
+            "dangling_references": [],
+            "failed_files": [],
+        }
+        cutoff = time.time() - self.min_age_seconds
+        partitions = await asyncio.to_thread(self._partitions)
+
+        for partition in partitions:
+            counts = {"files": 0, "orphans": 0, "dangling": 0}
+            orphans = []
+            files = self._files_on_disk(partition)
+            references = self._referenced_paths(partition)
+            file = await anext(files, None)
+            reference = await anext(references, None)
+
+            while file is not None or reference is not None:
+                if file is not None and (reference is None or file[0] <= reference):
+                    relative_path, size, mtime = file
+                    counts["files"] += 1
+                    report["bytes_scanned"] += size
+                    if relative_path == reference:
+                        report["referenced_count"] += 1
+                        reference = await anext(references, None)
+                    elif mtime > cutoff:
+                        # Recent files may belong to an upload whose document update has not landed yet
+                        report["skipped_recent"] += 1
+                    else:
+                        counts["orphans"] += 1
+                        report["reclaimable_bytes"] += size
+                        self._sample(report["orphans"], [relative_path])
+                        orphans.append(relative_path)
+                        if len(orphans) >= settings.STORAGE_GC_SCAN_BATCH:
+                            await self._dispose_orphans(orphans, cutoff, report)
+                            orphans = []
+                    file = await anext(files, None)
+                else:
+                    report["referenced_count"] += 1
+                    counts["dangling"] += 1
+                    self._sample(report["dangling_references"], [reference])
+                    reference = await anext(references, None)
+            await self._dispose_orphans(orphans, cutoff, report)
+
+            report["files_scanned"] += counts["files"]
+            report["orphan_count"] += counts["orphans"]
+            report["dangling_count"] += counts["dangling"]
+            report["partitions"] += 1
+            logger.info(
+                f"Reconciled {partition or '.'}: {counts['files']} files, {counts['orphans']} orphans, "
+                f"{counts['dangling']} dangling"
+            )
+
+        # References whose top-level directory does not exist at all were never visited above
+        top_levels = {partition.split("/")[0] for partition in partitions if partition}
+        async for group in self.get_document_collection().aggregate([
+            {"$match": {"file_path": {"$regex": "/"}}},
+            {"$group": {"_id": {"$arrayElemAt": [{"$split": ["$file_path", "/"]}, 0]}, "count": {"$sum": 1}}},
+        ]):
+            if group["_id"] not in top_levels:
+                report["dangling_count"] += group["count"]
+                cursor = self.get_document_collection().find(
+                    {"file_path": {"$regex": f"^{re.escape(group['_id'])}/"}}, {"_id": 0, "file_path": 1}
+                ).limit(SAMPLE_SIZE)
+                self._sample(report["dangling_references"], [document["file_path"] async for document in cursor])
+
+        logger.info(
+            f"Storage reconciliation finished: {report['orphan_count']} orphans "
+            f"({report['reclaimable_bytes']} bytes), {report['dangling_count']} dangling references"
+        )
+        return report
+
+    async def _dispose_orphans(self, orphans: List[str], cutoff: float, report: Dict) -> None:
+        if not orphans or self.action == "report":
+            return
+        failures = await asyncio.to_thread(self._dispose, orphans, cutoff)
+        report["disposed_count"] += len(orphans) - len(failures)
+        self._sample(report["failed_files"], failures)
+        disposed_blobs = set(orphans) - {failure["file"] for failure in failures}
+        disposed_blobs = [path for path in disposed_blobs if FileStorageService.is_blob_path(path)]
+        if disposed_blobs:
+            await self.get_blob_collection().delete_many({"_id": {"$in": disposed_blobs}})
+
+    @staticmethod
+    def _sample(target: List, items: List) -> None:
+        """Keeps at most SAMPLE_SIZE example paths in the report so it stays small."""
+        target.extend(items[:max(0, SAMPLE_SIZE - len(target))])
+
+
+async def run_reconciliation(action: str, min_age_seconds: Optional[int]) -> Dict:
+    await MongoDB.connect_to_database()
+    try:
+        await DocumentModel.ensure_indexes()
+        return await StorageReconciliationService(action, min_age_seconds).reconcile()
+    finally:
+        await MongoDB.close_database_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find orphaned files and dangling file_path references")
+    parser.add_argument("--action", choices=sorted(RECONCILE_ACTIONS), default="report",
+                        help="What to do with orphaned files")
+    parser.add_argument("--min-age", type=int, default=None,
+                        help="Ignore files modified within this many seconds (default STORAGE_GC_MIN_AGE_SECONDS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    report = asyncio.run(run_reconciliation(args.action, args.min_age))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Moves flat path-layout attachments (department/year/ref_no.ext) into the sharded layout
+(department/year/<aa>/<bb>/ref_no.ext).
+
+Documents are processed in batches. Each file is first made available at its sharded path
+(a hard link on local storage, a copy elsewhere), then the batch's file_path values are
+repointed with one guarded bulk write, and only then is the old path removed. Readers
+holding either path keep finding the file throughout, helped by FileStorageService falling
+back to the alternate layout. An interrupted run can simply be started again.
+Run it with STORAGE_LAYOUT=sharded so new uploads no longer write flat paths.
+
+Usage:
+    python -m app.services.storage_sharding [--batch-size 500] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.models.document import DocumentModel
+from app.services.FileStorageService import BLOB_PREFIX, FileStorageService
+
+logger = logging.getLogger(__name__)
+
+# Flat department/year/filename paths; blobs have their own fan-out
+FLAT_PATH_PATTERN = f"^(?!{BLOB_PREFIX}/)[^/]+/[^/]+/[^/]+$"
+STAGED, MISSING, CONFLICT = "staged", "missing", "conflict"
+
+
+def _link_local(old_file: Path, new_file: Path) -> str:
+    """
+    Hard-links old_file to new_file, copying across filesystems, without ever replacing new_file.
+    The staged file gets a fresh mtime: until the batch is repointed no document refers to it,
+    and storage reconciliation only spares unreferenced files younger than STORAGE_GC_MIN_AGE_SECONDS.
+    """
+    if not old_file.exists():
+        return MISSING
+    os.makedirs(new_file.parent, exist_ok=True)
+    try:
+        os.link(old_file, new_file)
+    except FileExistsError:
+        # Either left by an interrupted run, or an upload already landed at the sharded path
+        if not os.path.samefile(old_file, new_file):
+            return CONFLICT
+    except OSError:
+        temp_path = new_file.parent / f".{new_file.name}.{uuid.uuid4().hex}.tmp"
+        shutil.copy2(old_file, temp_path)
+        try:
+            os.link(temp_path, new_file)
+        except FileExistsError:
+            return CONFLICT
+        finally:
+            os.remove(temp_path)
+    os.utime(new_file)
+    return STAGED
+
+
+async def _stage(storage: FileStorageService, old_path: str, new_path: str) -> str:
+    """Makes the file at old_path available at new_path as well."""
+    old_file = storage.backend.local_path(old_path)
+    if old_file is not None:
+        return await asyncio.to_thread(_link_local, old_file, storage.backend.local_path(new_path))
+    old_stat = await storage.backend.stat(old_path)
+    if old_stat is None:
+        return MISSING
+    new_stat = await storage.backend.stat(new_path)
+    if new_stat is not None:
+        return STAGED if new_stat["size"] == old_stat["size"] else CONFLICT
+    await storage.backend.put(new_path, storage.backend.get(old_path))
+    return STAGED
+
+
+async def _migrate_batch(storage: FileStorageService, documents: List[Dict], concurrency: int, report: Dict) -> None:
+    collection = MongoDB.get_database()[DocumentModel.COLLECTION_NAME]
+    semaphore = asyncio.Semaphore(concurrency)
+    new_paths = {document["file_path"]: storage.sharded_path(document["file_path"]) for document in documents}
+
+    async def stage(old_path: str) -> str:
+        async with semaphore:
+            try:
+                outcome = await _stage(storage, old_path, new_paths[old_path])
+            except Exception as e:
+                logger.warning(f"Failed to shard {old_path}: {str(e)}")
+                report["failed_files"].append({"file": old_path, "error": str(e)})
+                return CONFLICT
+            if outcome == MISSING:
+                report["missing_files"].append(old_path)
+            elif outcome == CONFLICT:
+                report["skipped_count"] += 1
+            return outcome
+
+    old_paths = list(new_paths)
+    staged = {path for path, outcome in zip(old_paths, await asyncio.gather(*(stage(path) for path in old_paths)))
+              if outcome == STAGED}
+
+    # Only documents still pointing at the old path are repointed
+    operations = [
+        UpdateOne(
+            {"_id": document["_id"], "file_path": document["file_path"]},
+            {"$set": {"file_path": new_paths[document["file_path"]]}}
+        )
+        for document in documents if document["file_path"] in staged
+    ]
+    if not operations:
+        return
+    result = await collection.bulk_write(operations, ordered=False)
+    report["moved_count"] += result.modified_count
+    report["skipped_count"] += len(operations) - result.modified_count
+
+    # Whichever of the two paths nobody refers to any more is removed
+    candidates = [path for old_path in staged for path in (old_path, new_paths[old_path])]
+    referenced = {
+        document["file_path"]
+        async for document in collection.find({"file_path": {"$in": candidates}}, {"_id": 0, "file_path": 1})
+    }
+    for path in candidates:
+        if path not in referenced:
+            await storage.backend.delete(path)
+
+
+async def shard_storage(batch_size: int = 500, concurrency: int = 8) -> Dict:
+    """Moves every flat path-layout file into the sharded layout; returns a summary report."""
+    # With any other layout an upload could rewrite a flat path after it was staged
+    if settings.STORAGE_LAYOUT != "sharded":
+        raise ValueError(f"Set STORAGE_LAYOUT=sharded before migrating; it is '{settings.STORAGE_LAYOUT}'")
+    storage = FileStorageService()
+    report = {"moved_count": 0, "skipped_count": 0, "missing_files": [], "failed_files": []}
+
+    cursor = MongoDB.get_database()[DocumentModel.COLLECTION_NAME].find(
+        {"file_path": {"$regex": FLAT_PATH_PATTERN}}, {"_id": 1, "file_path": 1}
+    ).batch_size(batch_size)
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await _migrate_batch(storage, batch, concurrency, report)
+            batch = []
+            logger.info(f"Storage sharding: {report['moved_count']} files moved")
+    if batch:
+        await _migrate_batch(storage, batch, concurrency, report)
+
+    logger.info(
+        f"Storage sharding finished: {report['moved_count']} moved, {report['skipped_count']} skipped, "
+        f"{len(report['missing_files'])} missing, {len(report['failed_files'])} failed"
+    )
+    return report
+
+
+async def run_sharding(batch_size: int, concurrency: int) -> Dict:
+    await MongoDB.connect_to_database()
+    try:
+        return await shard_storage(batch_size, concurrency)
+    finally:
+        await MongoDB.close_database_connection()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move flat department/year attachments into hash-prefix subdirectories")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents repointed per bulk write")
+    parser.add_argument("--concurrency", type=int, default=8, help="Files linked or copied at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    report = asyncio.run(run_sharding(args.batch_size, args.concurrency))
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
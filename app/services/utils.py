@@ -5,6 +5,10 @@ from app.core.database import MongoDB
 from app.schemas.department import DocumentTypeCreate
 from app.core.config import settings  # Import settings from the appropriate module
 
+def format_ref_no(prefix: str, sequence: int, padding: int, year: int) -> str:
+    """Builds a reference number such as ``IT/007/25`` from a document type's prefix and counter."""
+    return f"{prefix}/{str(sequence).zfill(padding)}/{year % 100}"
+
 def validate_document_types(new_doc_types: List[DocumentTypeCreate], existing_doc_types: Optional[List[dict]] = None) -> None:
     """Validate document types for uniqueness of names and prefixes."""
     existing_doc_types = existing_doc_types or []
@@ -0,0 +1,130 @@
+"""
+Benchmark for resolving legacy department and document type ids.
+
+Seeds a scratch database with departments holding 10k embedded document types in
+total, then times the id lookups the CSV importer and seeders use, first without
+the ``inserted_id`` indexes and then with ``DepartmentModel.ensure_indexes``
+applied. For each lookup the winning plan stage (COLLSCAN or IXSCAN) is printed
+next to the timings. Needs a MongoDB at ``settings.MONGODB_URL``; the scratch
+database is dropped afterwards.
+
+Usage:
+    python -m benchmarks.department_lookup --document-types 10000 --departments 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.models.department import DepartmentModel
+from app.services.department import DepartmentService
+
+CHUNK_IDS = 200  # distinct document type ids in one CSV import chunk
+
+
+def build_departments(departments: int, document_types: int) -> List[Dict]:
+    per_department = -(-document_types // departments)
+    return [
+        {
+            "_id": ObjectId(),
+            "inserted_id": d + 1,
+            "name": f"DEPT{d}",
+            "status": 1,
+            "document_types": [
+                {
+                    "_id": ObjectId(),
+                    "inserted_id": d * per_department + t + 1,
+                    "name": f"Type {t}",
+                    "prefix": f"D{d}T{t}",
+                    "padding": 3,
+                    "counters": {},
+                }
+                for t in range(min(per_department, document_types - d * per_department))
+            ],
+        }
+        for d in range(departments)
+    ]
+
+
+async def best_of(func: Callable[[], Awaitable], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def plan_stage(collection, query: Dict) -> str:
+    """Leaf stage of the winning plan for query, e.g. COLLSCAN or IXSCAN."""
+    plan = (await collection.find(query).explain())["queryPlanner"]["winningPlan"]
+    while "inputStage" in plan or "queryPlan" in plan:
+        plan = plan.get("inputStage") or plan["queryPlan"]
+    return plan["stage"]
+
+
+async def run_lookups(service: DepartmentService, departments: int, document_types: int, rounds: int,
+                      rng: random.Random) -> Dict[str, Dict]:
+    collection = service.get_collection()
+    doc_type_ids = rng.sample(range(1, document_types + 1), min(CHUNK_IDS, document_types))
+    dept_ids = rng.sample(range(1, departments + 1), min(CHUNK_IDS, departments))
+    lookups = {
+        "department_by_custom_id": (
+            lambda: service.get_department_by_custom_id(dept_ids[0]), {"inserted_id": dept_ids[0]}),
+        "document_type_by_custom_id": (
+            lambda: service.get_document_types_by_custom_id(doc_type_ids[0]),
+            {"document_types.inserted_id": doc_type_ids[0]}),
+        "department_map_by_custom_ids": (
+            lambda: service.get_department_map_by_custom_ids(dept_ids), {"inserted_id": {"$in": dept_ids}}),
+        "document_type_map_by_custom_ids": (
+            lambda: service.get_document_type_map_by_custom_ids(doc_type_ids),
+            {"document_types.inserted_id": {"$in": doc_type_ids}}),
+    }
+    return {
+        name: {"ms": await best_of(func, rounds) * 1000, "plan": await plan_stage(collection, query)}
+        for name, (func, query) in lookups.items()
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, Dict]]:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    MongoDB.database = client[args.database]
+    service = DepartmentService()
+    rng = random.Random(args.seed)
+    try:
+        await client.drop_database(args.database)
+        await service.get_collection().insert_many(build_departments(args.departments, args.document_types))
+        results = {"without_indexes": await run_lookups(service, args.departments, args.document_types, args.rounds, rng)}
+        await DepartmentModel.ensure_indexes()
+        results["with_indexes"] = await run_lookups(service, args.departments, args.document_types, args.rounds, rng)
+        return results
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+        MongoDB.database = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--document-types", type=int, default=10_000, help="Document types across all departments")
+    parser.add_argument("--departments", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20, help="Timed runs per lookup; the best is reported")
+    parser.add_argument("--database", default="department_lookup_benchmark", help="Scratch database, dropped afterwards")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'lookup':<34}{'no index ms':>12}{'plan':>10}{'indexed ms':>12}{'plan':>10}")
+    for name, before in results["without_indexes"].items():
+        after = results["with_indexes"][name]
+        print(f"{name:<34}{before['ms']:>12.2f}{before['plan']:>10}{after['ms']:>12.2f}{after['plan']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Load-test harness for the approval paper API.
+
+Replays a weighted mix of traffic (create, paginated list, search, update,
+file download and count_status) from concurrent workers and reports p50/p95/p99
+latency and requests/sec per endpoint. The contention scenario fires many
+``create_document`` calls at a single document type at once and counts
+duplicate ref_nos alongside the latency figures.
+
+By default the real FastAPI app runs in-process (lifespan included) against
+``settings.MONGODB_URL``, so a local mongod is all that is needed; seed it first
+with ``python -m app.services.seed --documents N``. Pass ``--base-url`` to drive
+an already running server instead.
+
+Usage:
+    python -m benchmarks.load_test --duration 30 --concurrency 32 --output results.json
+    python -m benchmarks.load_test --mix create=1,list=6,search=2 --contention 200
+    python -m benchmarks.load_test --scenario contention --contention 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+
+DOCUMENT_PREFIX = f"{settings.API_V1_PREFIX}/document"
+DEPARTMENT_PREFIX = f"{settings.API_V1_PREFIX}/department"
+
+DEFAULT_MIX = "create=1,list=5,search=2,update=1,download=1,count_status=2"
+SEARCH_TERMS = ["approval", "tender", "proposal", "report", "budget", "contract", "review", "policy"]
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """Parses ``name=weight`` pairs, rejecting operations the harness does not know."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}', expected one of {sorted(OPERATIONS)}")
+        weights[name] = int(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Latency percentiles (ms) and throughput for one endpoint."""
+    if not latencies:
+        return {"count": 0, "errors": errors, "rps": 0.0}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+class LoadTestContext:
+    """Ids discovered from the target database that the operations draw from."""
+
+    def __init__(self, user: str, rng: random.Random):
+        self.headers = {"X-User-Name": user, "X-User-Full-Name": user}
+        self.rng = rng
+        self.departments: List[Dict] = []
+        self.document_ids: List[str] = []
+        self.file_document_ids: List[str] = []
+
+    async def load(self, client: httpx.AsyncClient, sample_pages: int = 10) -> None:
+        response = await client.get(f"{DEPARTMENT_PREFIX}/")
+        response.raise_for_status()
+        self.departments = [
+            department for department in response.json()
+            if department.get("document_types")
+        ]
+        if not self.departments:
+            raise SystemExit("No departments with document types found; seed the database first")
+
+        for page in range(1, sample_pages + 1):
+            response = await client.get(f"{DOCUMENT_PREFIX}/paginated", params={"page": page, "limit": 100})
+            response.raise_for_status()
+            documents = response.json()["documents"]
+            self.document_ids.extend(document["_id"] for document in documents)
+            self.file_document_ids.extend(document["_id"] for document in documents if document.get("file_path"))
+            if len(documents) < 100:
+                break
+
+    def pick_document_type(self) -> Dict:
+        department = self.rng.choice(self.departments)
+        document_type = self.rng.choice(department["document_types"])
+        return {"department_id": department["_id"], "document_type_id": document_type["_id"]}
+
+
+async def op_create(client: httpx.AsyncClient, ctx: LoadTestContext) -> httpx.Response:
+    payload = {"title": f"Load test {ctx.rng.choice(SEARCH_TERMS)}", **ctx.pick_document_type()}
+    response = await client.post(f"{DOCUMENT_PREFIX}/", json=payload, headers=ctx.headers)
+    if response.status_code == 201:
+        ctx.document_ids.append(response.json()["_id"])
+    return response
+
+
+async def op_list(client: httpx.AsyncClient, ctx: LoadTestContext) -> httpx.Response:
+    params = {"page": ctx.rng.randint(1, 20), "limit": ctx.rng.choice([10, 25, 50])}
+    if ctx.rng.random() < 0.3:
+        params["department_id"] = ctx.rng.choice(ctx.departments)["_id"]
+    return await client.get(f"{DOCUMENT_PREFIX}/paginated", params=params)
+
+
+async def op_search(client: httpx.AsyncClient, ctx: LoadTestContext) -> httpx.Response:
+    return await client.get(f"{DOCUMENT_PREFIX}/search", params={"search": ctx.rng.choice(SEARCH_TERMS)})
+
+
+async def op_update(client: httpx.AsyncClient, ctx: LoadTestContext) -> Optional[httpx.Response]:
+    if not ctx.document_ids:
+        return None
+    doc_id = ctx.rng.choice(ctx.document_ids)
+    data = {"title": f"Load test update {ctx.rng.randint(0, 1_000_000)}"}
+    return await client.put(f"{DOCUMENT_PREFIX}/{doc_id}", data=data, headers=ctx.headers)
+
+
+async def op_download(client: httpx.AsyncClient, ctx: LoadTestContext) -> Optional[httpx.Response]:
+    if not ctx.file_document_ids:
+        return None
+    doc_id = ctx.rng.choice(ctx.file_document_ids)
+    return await client.get(f"{DOCUMENT_PREFIX}/{doc_id}/file", headers=ctx.headers)
+
+
+async def op_count_status(client: httpx.AsyncClient, ctx: LoadTestContext) -> httpx.Response:
+    department_id = ctx.rng.choice(ctx.departments)["_id"]
+    return await client.get(f"{DOCUMENT_PREFIX}/count_status/{department_id}")
+
+
+OPERATIONS = {
+    "create": op_create,
+    "list": op_list,
+    "search": op_search,
+    "update": op_update,
+    "download": op_download,
+    "count_status": op_count_status,
+}
+
+
+async def run_mix(client: httpx.AsyncClient, ctx: LoadTestContext, mix: Dict[str, int],
+                  duration: float, concurrency: int) -> Dict:
+    """Runs ``concurrency`` workers drawing weighted operations until ``duration`` elapses."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    skipped: Dict[str, int] = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            name = ctx.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, ctx)
+            except httpx.HTTPError:
+                errors[name] += 1
+                continue
+            if response is None:
+                skipped[name] += 1
+                await asyncio.sleep(0)
+                continue
+            latencies[name].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {name: summarize(latencies[name], errors[name], elapsed) for name in names}
+    for name, count in skipped.items():
+        endpoints[name]["skipped"] = count
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": total,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def run_contention(client: httpx.AsyncClient, ctx: LoadTestContext, requests: int) -> Dict:
+    """Fires ``requests`` concurrent creates at one document type and checks ref_no uniqueness."""
+    target = ctx.pick_document_type()
+    latencies: List[float] = []
+    ref_nos: List[str] = []
+    errors = 0
+
+    async def create(index: int) -> None:
+        nonlocal errors
+        payload = {"title": f"Contention {index}", **target}
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{DOCUMENT_PREFIX}/", json=payload, headers=ctx.headers)
+        except httpx.HTTPError:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - started)
+        if response.status_code == 201:
+            ref_nos.append(response.json()["ref_no"])
+        else:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(create(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, errors, elapsed)
+    result.update({
+        "target": target,
+        "created": len(ref_nos),
+        "duplicate_ref_nos": len(ref_nos) - len(set(ref_nos)),
+    })
+    return result
+
+
+@asynccontextmanager
+async def open_client(base_url: Optional[str], concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+    """Client for a running server, or for the app started in-process with its lifespan."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            yield client
+        return
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            yield client
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    ctx = LoadTestContext(args.user, random.Random(args.seed))
+    results = {
+        "commit": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "scenario": args.scenario,
+            "base_url": args.base_url or "in-process",
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "contention": args.contention,
+            "seed": args.seed,
+        },
+    }
+    async with open_client(args.base_url, max(args.concurrency, args.contention)) as client:
+        await ctx.load(client)
+        if args.scenario in ("mix", "all"):
+            results["mix"] = await run_mix(client, ctx, args.mix, args.duration, args.concurrency)
+        if args.scenario in ("contention", "all") and args.contention:
+            results["contention"] = await run_contention(client, ctx, args.contention)
+    return results
+
+
+def print_report(results: Dict) -> None:
+    header = f"{'endpoint':<14}{'count':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    rows = dict(results.get("mix", {}).get("endpoints", {}))
+    if "contention" in results:
+        rows["contention"] = results["contention"]
+    print(header)
+    for name, stats in rows.items():
+        print(f"{name:<14}{stats['count']:>8}{stats['errors']:>8}{stats['rps']:>10}"
+              f"{stats.get('p50_ms', '-'):>10}{stats.get('p95_ms', '-'):>10}{stats.get('p99_ms', '-'):>10}")
+    if "mix" in results:
+        print(f"overall: {results['mix']['total_requests']} requests, {results['mix']['rps']} req/s")
+    if "contention" in results:
+        print(f"contention: {results['contention']['created']} created, "
+              f"{results['contention']['duplicate_ref_nos']} duplicate ref_nos")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the approval paper API")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--scenario", choices=["mix", "contention", "all"], default="all")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Weighted operations, e.g. {DEFAULT_MIX}")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run the traffic mix")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent workers for the traffic mix")
+    parser.add_argument("--contention", type=int, default=100,
+                        help="Concurrent create_document calls on one document type")
+    parser.add_argument("--user", default="alvinloh", help="X-User-Name sent with authenticated calls")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Timing fixture for the hot-path microbenchmarks.
+
+The benchmarks are deselected by default; run them with ``pytest -m benchmark``.
+
+Absolute timings depend on the machine, so each benchmark is measured relative to a fixed
+reference workload timed in the same run. Both keep the best of several rounds, and the
+ratio is compared to the one recorded in ``baselines.json``. A ratio above
+``baseline * BENCHMARK_THRESHOLD`` (default 1.5) fails the test. Set
+``BENCHMARK_UPDATE_BASELINES=1`` to record the ratios after an intended change; ordinary
+runs never write the file.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+BASELINE_FILE = Path(__file__).with_name("baselines.json")
+THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "1.5"))
+UPDATE_BASELINES = os.getenv("BENCHMARK_UPDATE_BASELINES") == "1"
+
+
+def _best_of(func: Callable, *args, rounds: int = 5, **kwargs) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _reference_workload() -> None:
+    """Plain interpreter work (object creation, dict access, string formatting) to scale timings by."""
+    rows = [{"id": i, "name": f"row {i}", "value": i * 3} for i in range(50_000)]
+    sorted(rows, key=lambda row: row["name"])
+    sum(row["value"] for row in rows if row["id"] % 2)
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    recorded: Dict[str, float] = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    measured: Dict[str, float] = {}
+    _reference_workload()  # warm-up
+    reference = _best_of(_reference_workload)
+    yield recorded, measured, reference
+
+    if UPDATE_BASELINES and measured:
+        updated = {**recorded, **measured}
+        BASELINE_FILE.write_text(json.dumps(dict(sorted(updated.items())), indent=2) + "\n")
+
+
+@pytest.fixture
+def benchmark(request, baselines):
+    recorded, measured, reference = baselines
+    name = request.node.name
+
+    def run(func: Callable, *args, rounds: int = 5, **kwargs) -> Any:
+        result = func(*args, **kwargs)  # warm-up, also the value handed back to the test
+        best = _best_of(func, *args, rounds=rounds, **kwargs)
+
+        ratio = round(best / reference, 4)
+        measured[name] = ratio
+        baseline = recorded.get(name)
+        print(f"\n{name}: {best * 1000:.2f}ms, {ratio:.3f}x reference (baseline {baseline or float('nan'):.3f}x)")
+        if baseline is None and not UPDATE_BASELINES:
+            pytest.fail(f"{name} has no baseline; record one with BENCHMARK_UPDATE_BASELINES=1")
+        if baseline and not UPDATE_BASELINES and ratio > baseline * THRESHOLD:
+            pytest.fail(
+                f"{name} regressed: {ratio:.3f}x the reference workload against a baseline of "
+                f"{baseline:.3f}x (threshold x{THRESHOLD})"
+            )
+        return result
+
+    return run
@@ -0,0 +1,112 @@
+import io
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.schemas.base import PyObjectId
+from app.schemas.department import DocumentTypeCreate
+from app.schemas.document import DocumentInDB
+from app.services.csvservice import CSVImportService, DOCUMENT_CSV_COLUMNS
+from app.services.utils import format_ref_no, validate_document_types
+from benchmarks.csv_document_import import generate_csv
+
+pytestmark = pytest.mark.benchmark
+
+ROWS = 10_000
+
+
+@pytest.fixture(scope="module")
+def document_rows():
+    department_ids = [ObjectId() for _ in range(20)]
+    doc_type_ids = [ObjectId() for _ in range(200)]
+    created = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "ref_no": format_ref_no("IT", i, 3, 2024),
+            "title": f"Approval paper {i}",
+            "document_type_id": doc_type_ids[i % 200],
+            "department_id": department_ids[i % 20],
+            "created_by": f"user{i % 50}",
+            "created_date": created + timedelta(minutes=i),
+            "filed_by": f"clerk{i % 7}" if i % 3 else None,
+            "filed_date": created + timedelta(days=1, minutes=i) if i % 3 else None,
+            "status": "Filed" if i % 3 else "Not Filed",
+        }
+        for i in range(ROWS)
+    ]
+
+
+@pytest.fixture(scope="module")
+def document_models(document_rows):
+    return [DocumentInDB(**row) for row in document_rows]
+
+
+def test_document_in_db_validation(benchmark, document_rows):
+    documents = benchmark(lambda: [DocumentInDB(**row) for row in document_rows])
+    assert len(documents) == ROWS
+
+
+def test_document_in_db_serialization(benchmark, document_models):
+    payloads = benchmark(lambda: [document.model_dump_json(by_alias=True) for document in document_models])
+    assert '"_id"' in payloads[0]
+
+
+def test_py_object_id_validation(benchmark):
+    values = [ObjectId() for _ in range(ROWS)] + [str(ObjectId()) for _ in range(ROWS)]
+    validated = benchmark(lambda: [PyObjectId.validate(value) for value in values])
+    assert len(validated) == 2 * ROWS
+
+
+def test_convert_oids_nested(benchmark):
+    departments = [
+        {
+            "_id": ObjectId(),
+            "name": f"Department {d}",
+            "created_date": datetime(2024, 1, 1),
+            "document_types": [
+                {
+                    "_id": ObjectId(),
+                    "name": f"Type {t}",
+                    "prefix": f"D{d}T{t}",
+                    "padding": 3,
+                    "counters": {str(year): t for year in range(2015, 2026)},
+                    "created_date": datetime(2024, 1, 1),
+                }
+                for t in range(50)
+            ],
+        }
+        for d in range(100)
+    ]
+    converted = benchmark(CSVImportService._convert_oids, departments)
+    assert isinstance(converted[0]["document_types"][0]["_id"], str)
+
+
+def test_csv_chunk_transform(benchmark):
+    raw = pd.read_csv(io.BytesIO(generate_csv(ROWS)), usecols=DOCUMENT_CSV_COLUMNS)
+    dept_map = {i: ObjectId() for i in range(1, 21)}
+    doc_type_map = {i: ObjectId() for i in range(1, 201)}
+
+    def transform():
+        chunk = CSVImportService._prepare_document_chunk(raw.copy(), dept_map, doc_type_map)
+        return CSVImportService._build_document_records(chunk)
+
+    records = benchmark(transform)
+    assert len(records) == ROWS
+
+
+def test_ref_no_formatting(benchmark):
+    ref_nos = benchmark(lambda: [format_ref_no("FIN", i, 4, 2025) for i in range(1, 10 * ROWS + 1)])
+    assert ref_nos[6] == "FIN/0007/25"
+
+
+def test_validate_document_types(benchmark):
+    existing = [{"name": f"Existing {i}", "prefix": f"EX{i}"} for i in range(ROWS * 2)]
+    new = [DocumentTypeCreate(name=f"New {i}", prefix=f"NW{i}", padding=3) for i in range(ROWS * 2)]
+    benchmark(validate_document_types, new, existing)
+
+    with pytest.raises(HTTPException):
+        validate_document_types(new + new[:1], existing)
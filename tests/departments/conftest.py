@@ -0,0 +1,216 @@
+"""
+In-memory stand-ins for the departments and department_versions collections.
+
+The departments fake enforces what DepartmentService relies on the indexes for: the unique
+case-insensitive name_ci index and the unique multikey index on document_types.prefix,
+which only rejects a prefix used by another department. Queries support the dotted paths,
+operators and pipeline stages the service issues, with collation matching names ignoring case.
+"""
+import copy
+from typing import Any, Dict, List, Optional
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import MongoDB
+from app.models.department import DepartmentModel
+from app.services import department as department_module
+
+MISSING = object()
+
+
+def _values(document: Any, path: str) -> List[Any]:
+    """
+    Every value at a dotted path, descending into arrays like Mongo does. An array element
+    without the field yields MISSING, which compares as null.
+    """
+    values = [document]
+    for key in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, list) and key.isdigit():
+                found.extend(value[int(key):int(key) + 1])
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, dict) and key in item:
+                    found.append(item[key])
+                elif isinstance(value, list) and isinstance(item, dict):
+                    found.append(MISSING)
+        values = found
+    return [item for value in values for item in (value if isinstance(value, list) else [value])]
+
+
+def _present(document: Any, path: str) -> List[Any]:
+    return [value for value in _values(document, path) if value is not MISSING]
+
+
+def _equal(a: Any, b: Any, collation: Optional[Dict]) -> bool:
+    a = None if a is MISSING else a
+    if collation and isinstance(a, str) and isinstance(b, str):
+        return a.casefold() == b.casefold()
+    return a == b
+
+
+def _matches(document: Dict[str, Any], query: Dict[str, Any], collation: Optional[Dict] = None) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, branch, collation) for branch in condition):
+                return False
+            continue
+        values = _values(document, key)
+        present = [value for value in values if value is not MISSING]
+        # A missing field compares as null
+        values = values or [None]
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$in" and not any(_equal(v, o, collation) for v in values for o in operand):
+                    return False
+                if operator == "$ne" and any(_equal(v, operand, collation) for v in values):
+                    return False
+                if operator == "$exists" and bool(present) != operand:
+                    return False
+        elif not any(_equal(value, condition, collation) for value in values):
+            return False
+    return True
+
+
+def _evaluate(document: Dict[str, Any], expression: Any) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        values = _present(document, expression[1:])
+        return values[0] if values else None
+    if isinstance(expression, dict) and "$ifNull" in expression:
+        value, default = expression["$ifNull"]
+        value = _evaluate(document, value)
+        return default if value is None else value
+    if isinstance(expression, dict):
+        return {key: _evaluate(document, value) for key, value in expression.items()}
+    return expression
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+        self.sorted_by = None
+
+    def sort(self, key, direction):
+        self.sorted_by = key
+        self.documents = sorted(self.documents, key=lambda document: document.get(key, 0), reverse=direction < 0)
+        return self
+
+    def limit(self, size):
+        self.documents = self.documents[:size]
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents[:length] if length else self.documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeDepartmentCollection:
+    def __init__(self, departments: List[Dict[str, Any]]):
+        self.departments = departments
+        self.calls: List[str] = []
+
+    def _check_unique(self, candidate: Dict[str, Any]) -> None:
+        for department in self.departments:
+            if department["_id"] == candidate["_id"]:
+                continue
+            if department["name"].casefold() == candidate["name"].casefold():
+                raise DuplicateKeyError("E11000 duplicate key error index: name_ci", 11000,
+                                        {"keyPattern": {"name": 1}})
+            if set(_present(department, "document_types.prefix")) & set(_present(candidate, "document_types.prefix")):
+                raise DuplicateKeyError("E11000 duplicate key error index: document_types.prefix_1", 11000,
+                                        {"keyPattern": {"document_types.prefix": 1}})
+
+    def find(self, query=None, projection=None, collation=None):
+        self.calls.append("find")
+        return FakeCursor([copy.deepcopy(d) for d in self.departments if _matches(d, query or {}, collation)])
+
+    async def find_one(self, query, projection=None, collation=None):
+        self.calls.append("find_one")
+        for department in self.departments:
+            if _matches(department, query, collation):
+                return copy.deepcopy(department)
+        return None
+
+    async def insert_one(self, document):
+        self.calls.append("insert_one")
+        # Like pymongo, add the _id to the inserted dict
+        document.setdefault("_id", ObjectId())
+        self._check_unique(document)
+        self.departments.append(copy.deepcopy(document))
+        return type("Result", (), {"inserted_id": document["_id"]})()
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        self.calls.append("find_one_and_update")
+        for department in self.departments:
+            if _matches(department, query):
+                updated = copy.deepcopy(department)
+                for key, value in update.get("$push", {}).items():
+                    updated.setdefault(key, []).append(value)
+                self._check_unique(updated)
+                department.clear()
+                department.update(updated)
+                return copy.deepcopy(department)
+        return None
+
+    async def update_many(self, query, update, collation=None):
+        self.calls.append("update_many")
+        modified = 0
+        for department in self.departments:
+            if _matches(department, query, collation):
+                modified += any(department.get(key) != value for key, value in update["$set"].items())
+                department.update(update["$set"])
+        return type("Result", (), {"modified_count": modified})()
+
+    def aggregate(self, pipeline):
+        self.calls.append("aggregate")
+        documents = copy.deepcopy(self.departments)
+        for stage in pipeline:
+            if "$match" in stage:
+                documents = [document for document in documents if _matches(document, stage["$match"])]
+            elif "$unwind" in stage:
+                key = stage["$unwind"][1:]
+                documents = [{**document, key: item} for document in documents for item in document.get(key, [])]
+            elif "$project" in stage:
+                projection = stage["$project"]
+                documents = [
+                    {key: _evaluate(document, value) for key, value in projection.items() if value != 0}
+                    for document in documents
+                ]
+        return FakeCursor(documents)
+
+
+class FakeVersionCollection:
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+    async def find_one(self, query):
+        document = self.documents.get(query["_id"])
+        return copy.deepcopy(document) if document else None
+
+    async def update_one(self, query, update, upsert=False):
+        document = self.documents.setdefault(query["_id"], {"_id": query["_id"]})
+        for key, value in update["$inc"].items():
+            document[key] = document.get(key, 0) + value
+
+
+@pytest.fixture
+def departments(monkeypatch):
+    """Installs an empty departments collection; tests append their departments to it."""
+    collection = FakeDepartmentCollection([])
+    monkeypatch.setattr(MongoDB, "database", {
+        DepartmentModel.COLLECTION_NAME: collection,
+        DepartmentModel.VERSION_COLLECTION_NAME: FakeVersionCollection(),
+    })
+    # The listing caches are per process; start every test cold
+    monkeypatch.setattr(department_module, "_summary_cache", {})
+    monkeypatch.setattr(department_module, "_document_types_cache", None)
+    return collection
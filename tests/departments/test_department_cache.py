@@ -0,0 +1,106 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.schemas.department import DocumentTypeCreate
+from app.services.department import DepartmentService
+
+
+@pytest.fixture
+def listed(departments):
+    departments.departments += [
+        {"_id": ObjectId(), "name": "IT", "status": 1, "priority": 2, "created_date": datetime(2024, 1, 1),
+         "document_types": [{"_id": ObjectId(), "name": "Ticket", "prefix": "IT-TKT", "padding": 3, "counters": {"2025": 7}}]},
+        {"_id": ObjectId(), "name": "Finance", "full_name": "Finance Division", "status": 1, "priority": 1,
+         "created_date": datetime(2024, 1, 1), "document_types": []},
+        {"_id": ObjectId(), "name": "Archive", "status": 0, "priority": 3, "created_date": datetime(2024, 1, 1),
+         "document_types": [{"_id": ObjectId(), "name": "Box", "prefix": "ARC-BOX", "padding": 4}]},
+    ]
+    return departments
+
+
+async def test_summaries_are_cached_until_the_version_is_bumped(listed):
+    service = DepartmentService()
+
+    version, body = await service.get_department_summaries()
+    assert version == 0
+    assert [department["name"] for department in json.loads(body)] == ["IT", "Finance", "Archive"]
+    assert set(json.loads(body)[0]) == {"_id", "name", "full_name", "status"}
+    listed.departments[0]["name"] = "Information Technology"
+
+    assert await service.get_department_summaries() == (version, body)
+    assert listed.calls.count("find") == 1
+    # Counter changes do not show in the summary
+    await service.bump_version(counters=True)
+    assert await service.get_department_summaries() == (version, body)
+
+    await service.bump_version()
+    version, body = await service.get_department_summaries()
+    assert version == 1
+    assert json.loads(body)[0]["name"] == "Information Technology"
+    assert listed.calls.count("find") == 2
+
+
+async def test_active_summaries_are_cached_separately(listed):
+    service = DepartmentService()
+
+    _, everything = await service.get_department_summaries()
+    _, active = await service.get_department_summaries(active_only=True)
+
+    assert [department["name"] for department in json.loads(active)] == ["Finance", "IT"]
+    assert everything != active
+    assert await service.get_department_summaries(active_only=True) == (0, active)
+    assert listed.calls.count("find") == 2
+
+
+async def test_department_writes_invalidate_the_summaries(listed):
+    service = DepartmentService()
+    await service.get_department_summaries(active_only=True)
+
+    await service.update_departments_status(["archive"], 1)
+
+    version, body = await service.get_department_summaries(active_only=True)
+    assert version == 1
+    assert [department["name"] for department in json.loads(body)] == ["Finance", "IT", "Archive"]
+
+
+async def test_document_types_are_cached_until_either_version_is_bumped(listed):
+    service = DepartmentService()
+
+    versions, body = await service.get_all_document_types_with_departments()
+    assert versions == (0, 0)
+    doc_types = json.loads(body)
+    assert [(doc_type["prefix"], doc_type["department"]["name"]) for doc_type in doc_types] == [
+        ("IT-TKT", "IT"), ("ARC-BOX", "Archive"),
+    ]
+    assert doc_types[0]["counters"] == {"2025": 7}
+    # Missing counters are listed as empty
+    assert doc_types[1]["counters"] == {}
+    assert "document_types" not in doc_types[0]["department"]
+
+    listed.departments[0]["document_types"][0]["counters"]["2025"] = 8
+    assert await service.get_all_document_types_with_departments() == (versions, body)
+    assert listed.calls.count("aggregate") == 1
+
+    # Numbering a document only bumps counters_version, which the listing includes
+    await service.bump_version(counters=True)
+    versions, body = await service.get_all_document_types_with_departments()
+    assert versions == (0, 1)
+    assert json.loads(body)[0]["counters"] == {"2025": 8}
+
+    await service.bump_version()
+    assert (await service.get_all_document_types_with_departments())[0] == (1, 1)
+    assert listed.calls.count("aggregate") == 3
+
+
+async def test_adding_a_document_type_invalidates_the_listing(listed):
+    service = DepartmentService()
+    await service.get_all_document_types_with_departments()
+
+    await service.add_document_type_by_name("finance", DocumentTypeCreate(name="Invoice", prefix="FIN-INV", padding=3, counters={}))
+
+    versions, body = await service.get_all_document_types_with_departments()
+    assert versions == (1, 0)
+    assert sorted(doc_type["prefix"] for doc_type in json.loads(body)) == ["ARC-BOX", "FIN-INV", "IT-TKT"]
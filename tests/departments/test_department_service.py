@@ -0,0 +1,158 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.schemas.department import DepartmentCreate, DocumentTypeCreate
+from app.services.department import DepartmentService
+
+
+def _department(name: str, *doc_types, **fields):
+    return {
+        "_id": ObjectId(), "name": name, "status": 1, "created_date": datetime(2024, 1, 1),
+        "document_types": [
+            {"_id": ObjectId(), "name": doc_name, "prefix": prefix, "padding": 3, "counters": {}, **extra}
+            for doc_name, prefix, extra in doc_types
+        ],
+        **fields,
+    }
+
+
+@pytest.fixture
+def finance(departments):
+    department = _department("Finance", ("Invoice", "FIN-INV", {}))
+    departments.departments.append(department)
+    departments.departments.append(_department("IT", ("Ticket", "IT-TKT", {})))
+    return department
+
+
+async def test_add_document_type_pushes_in_one_write(departments, finance):
+    service = DepartmentService()
+    department = await service.add_document_type(str(finance["_id"]), DocumentTypeCreate(name="Receipt", prefix="FIN-RCP", padding=3, counters={}))
+
+    assert [doc_type.prefix for doc_type in department.document_types] == ["FIN-INV", "FIN-RCP"]
+    assert departments.calls == ["find_one_and_update"]
+    assert await service.get_versions() == (1, 0)
+
+
+async def test_add_document_type_rejects_a_prefix_of_another_department(departments, finance):
+    with pytest.raises(HTTPException) as exc:
+        await DepartmentService().add_document_type(str(finance["_id"]), DocumentTypeCreate(name="Ticket", prefix="IT-TKT", padding=3, counters={}))
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Document type prefix already exists"
+    assert len(finance["document_types"]) == 1
+
+
+@pytest.mark.parametrize("doc_type, detail", [
+    (DocumentTypeCreate(name="Receipt", prefix="FIN-INV", padding=3, counters={}), "Document type prefix already exists in department"),
+    (DocumentTypeCreate(name="Invoice", prefix="FIN-NEW", padding=3, counters={}), "Document type name already exists in department"),
+])
+async def test_add_document_type_rejects_duplicates_within_the_department(departments, finance, doc_type, detail):
+    # The multikey unique index does not see duplicates inside one department; the push filter does
+    service = DepartmentService()
+    with pytest.raises(HTTPException) as exc:
+        await service.add_document_type_by_name("finance", doc_type)
+    assert exc.value.status_code == 400
+    assert exc.value.detail == detail
+    assert len(finance["document_types"]) == 1
+    assert await service.get_versions() == (0, 0)
+
+
+async def test_add_document_type_to_a_missing_department(departments, finance):
+    with pytest.raises(HTTPException) as exc:
+        await DepartmentService().add_document_type(str(ObjectId()), DocumentTypeCreate(name="Receipt", prefix="FIN-RCP", padding=3, counters={}))
+    assert exc.value.status_code == 404
+
+
+async def test_create_department_rejects_a_prefix_of_another_department(departments, finance):
+    department = DepartmentCreate(name="Audit", status=1, document_types=[DocumentTypeCreate(name="Report", prefix="FIN-INV", padding=3, counters={})])
+    with pytest.raises(HTTPException) as exc:
+        await DepartmentService().create_department(department)
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Document type prefix already exists"
+    assert [department["name"] for department in departments.departments] == ["Finance", "IT"]
+
+
+@pytest.fixture
+def legacy(departments):
+    finance = _department("Finance", ("Invoice", "FIN-INV", {"inserted_id": 201}), ("Receipt", "FIN-RCP", {}), inserted_id=101)
+    it = _department("IT", ("Ticket", "IT-TKT", {"inserted_id": 202}), inserted_id=102)
+    departments.departments += [finance, it, _department("Audit")]
+    return finance, it
+
+
+async def test_legacy_id_maps(legacy):
+    finance, it = legacy
+    service = DepartmentService()
+
+    assert await service.get_department_map() == {101: finance["_id"], 102: it["_id"]}
+    assert await service.get_document_type_map() == {
+        201: finance["document_types"][0]["_id"], 202: it["document_types"][0]["_id"],
+    }
+    assert await service.get_department_map_by_custom_ids([102, 999]) == {102: it["_id"]}
+    # The department is matched as a whole; only its document types with a requested id are mapped
+    assert await service.get_document_type_map_by_custom_ids([201]) == {201: finance["document_types"][0]["_id"]}
+    assert await service.get_document_type_map_by_custom_ids([]) == {}
+
+
+async def test_legacy_id_lookups(legacy):
+    finance, it = legacy
+    service = DepartmentService()
+
+    assert await service.get_department_by_custom_id(102) == it["_id"]
+    assert await service.get_department_by_custom_id(999) is None
+    assert await service.get_document_types_by_custom_id(201) == finance["document_types"][0]["_id"]
+    assert await service.get_document_types_by_custom_id(999) is None
+
+
+async def test_find_by_name_ignores_case(departments, finance):
+    service = DepartmentService()
+    assert (await service.find_by_name("FINANCE"))["_id"] == finance["_id"]
+    assert (await service.find_by_name("finance", {"_id": 1}))["_id"] == finance["_id"]
+    assert await service.find_by_name("Audit") is None
+
+
+async def test_find_by_name_prefers_the_exact_match_among_case_variants(departments, finance):
+    # Names that predate the unique name_ci index may still differ only by case
+    shouting = _department("FINANCE")
+    departments.departments.append(shouting)
+    service = DepartmentService()
+
+    assert (await service.find_by_name("FINANCE"))["_id"] == shouting["_id"]
+    assert (await service.find_by_name("Finance"))["_id"] == finance["_id"]
+    with pytest.raises(HTTPException) as exc:
+        await service.find_by_name("finance")
+    assert exc.value.status_code == 409
+
+
+async def test_create_department_rejects_a_name_differing_only_by_case(departments, finance):
+    with pytest.raises(HTTPException) as exc:
+        await DepartmentService().create_department(DepartmentCreate(name="FINANCE", status=1))
+    assert exc.value.status_code == 409
+    assert exc.value.detail == "Department name exists"
+
+
+async def test_create_department_rejects_duplicate_document_type_names(departments):
+    department = DepartmentCreate(name="Audit", status=1, document_types=[
+        DocumentTypeCreate(name="Report", prefix="AUD-R1", padding=3, counters={}),
+        DocumentTypeCreate(name="Report", prefix="AUD-R2", padding=3, counters={}),
+    ])
+    with pytest.raises(HTTPException) as exc:
+        await DepartmentService().create_department(department)
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Duplicate document type names provided"
+    assert departments.departments == []
+
+
+async def test_update_departments_status_by_name_and_id_in_one_query(departments, finance):
+    audit = _department("Audit")
+    departments.departments.append(audit)
+    service = DepartmentService()
+
+    updated = await service.update_departments_status(["fInAnCe", str(audit["_id"])], 0)
+
+    assert sorted(department.name for department in updated) == ["Audit", "Finance"]
+    assert [department["status"] for department in departments.departments] == [0, 1, 0]
+    assert departments.calls.count("update_many") == 1
+    assert await service.get_versions() == (1, 0)
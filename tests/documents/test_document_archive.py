@@ -0,0 +1,69 @@
+import asyncio
+import csv
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.services import document_archive
+from app.services.document_archive import MANIFEST_NAME, DocumentArchiveService
+
+FILES = {
+    "IT/2025/IT-001-25.pdf": [b"first ", b"file"],
+    "IT/2025/IT-002-25.pdf": [b"second ", RuntimeError("disk went away")],
+    "IT/2025/IT-003-25.pdf": [RuntimeError("not found")],
+}
+
+
+class FakeFileStorage:
+    opened = []
+
+    async def open_file(self, relative_path, chunk_size=None, encoding=None):
+        FakeFileStorage.opened.append(relative_path)
+        for chunk in FILES.get(relative_path, [b"x" * 10] * 1000):
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+            await asyncio.sleep(0)
+
+
+def _document(ref_no, file_path):
+    return {
+        "ref_no": ref_no, "title": ref_no, "department_name": "IT", "document_type_name": "Memo",
+        "created_date": datetime(2025, 1, 2), "file_path": file_path,
+    }
+
+
+@pytest.fixture(autouse=True)
+def fake_storage(monkeypatch):
+    FakeFileStorage.opened = []
+    monkeypatch.setattr(document_archive, "FileStorageService", FakeFileStorage)
+    monkeypatch.setattr(settings, "ARCHIVE_PREFETCH_FILES", 2)
+    monkeypatch.setattr(settings, "ARCHIVE_PREFETCH_CHUNKS", 1)
+
+
+async def test_archive_marks_missing_and_truncated_files_in_the_manifest():
+    documents = [_document(f"IT/00{i}/25", path) for i, path in enumerate(FILES, start=1)]
+    documents.append(_document("IT/004/25", None))
+
+    data = b"".join([chunk async for chunk in DocumentArchiveService().stream_archive(documents)])
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        manifest = list(csv.DictReader(io.StringIO(archive.read(MANIFEST_NAME).decode())))
+        assert archive.read("IT/IT_001_25.pdf") == b"first file"
+        assert archive.read("IT/IT_002_25.pdf") == b"second "
+    assert [row["included"] for row in manifest] == ["yes", "truncated", "missing", "no file"]
+
+
+async def test_closing_the_stream_cancels_every_reader():
+    documents = [_document(f"IT/{i:03d}/25", f"IT/2025/big-{i}.pdf") for i in range(4)]
+    stream = DocumentArchiveService().stream_archive(documents)
+    await stream.__anext__()
+    tasks = {task for task in asyncio.all_tasks() if task is not asyncio.current_task()}
+    assert tasks
+
+    await stream.aclose()
+    await asyncio.sleep(0)
+    assert all(task.done() for task in tasks)
@@ -0,0 +1,205 @@
+from email.utils import formatdate
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.api.v1.routers import document as document_router
+from app.api.v1.routers.document import _is_not_modified, _parse_range
+from app.core.config import settings
+from app.core.dependencies.auth import get_current_user_from_header
+from app.core.dependencies.document import get_document_service
+from app.core.utils import sign_file_url, verify_file_signature
+
+DATA = bytes(range(256)) * 40
+DOC_ID = str(ObjectId())
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 100)),
+    ("bytes=100-", (100, 1000)),
+    ("bytes=990-5000", (990, 1000)),
+    ("bytes=-10", (990, 1000)),
+    ("bytes=-5000", (0, 1000)),
+    ("BYTES=0-0", (0, 1)),
+    # Malformed or multi-range headers are ignored and the whole file is sent
+    ("bytes=5-3", None),
+    ("bytes=abc-", None),
+    ("bytes=--5", None),
+    ("bytes=-", None),
+    ("bytes=+1-2", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header, size", [("bytes=1000-", 1000), ("bytes=1000-2000", 1000), ("bytes=-0", 1000), ("bytes=-5", 0)])
+def test_parse_range_rejects_unsatisfiable_ranges(header, size):
+    with pytest.raises(HTTPException) as exc_info:
+        _parse_range(header, size)
+    assert exc_info.value.status_code == 416
+    assert exc_info.value.headers["Content-Range"] == f"bytes */{size}"
+
+
+def _request(**headers) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_is_not_modified():
+    mtime = 1_700_000_000.5
+    assert _is_not_modified(_request(if_none_match='"abc"'), '"abc"', mtime)
+    assert _is_not_modified(_request(if_none_match='"x", W/"abc"'), '"abc"', mtime)
+    assert _is_not_modified(_request(if_none_match="*"), '"abc"', mtime)
+    assert not _is_not_modified(_request(if_none_match='"other"'), '"abc"', mtime)
+    assert _is_not_modified(_request(if_modified_since=formatdate(mtime, usegmt=True)), '"abc"', mtime)
+    assert not _is_not_modified(_request(if_modified_since=formatdate(mtime - 60, usegmt=True)), '"abc"', mtime)
+    assert not _is_not_modified(_request(if_modified_since="not a date"), '"abc"', mtime)
+    # If-None-Match takes precedence over If-Modified-Since
+    assert not _is_not_modified(
+        _request(if_none_match='"other"', if_modified_since=formatdate(mtime, usegmt=True)), '"abc"', mtime
+    )
+
+
+class FakeDocumentCollection:
+    def __init__(self, document):
+        self.document = document
+
+    async def find_one(self, query, projection=None):
+        return dict(self.document)
+
+
+class FakeDocumentService:
+    def __init__(self, document):
+        self.collection = FakeDocumentCollection(document)
+
+    def get_collection(self):
+        return self.collection
+
+
+@pytest.fixture
+def stored_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "FILE_DELIVERY_MODE", "direct")
+    (tmp_path / "IT" / "2025").mkdir(parents=True)
+    document = {"file_path": "IT/2025/IT-001-25.pdf", "file_size": len(DATA), "file_checksum": "abc123"}
+    (tmp_path / document["file_path"]).write_bytes(DATA)
+    return document
+
+
+def _client(document) -> TestClient:
+    app = FastAPI()
+    app.include_router(document_router.router)
+    app.dependency_overrides[get_current_user_from_header] = lambda: object()
+    app.dependency_overrides[get_document_service] = lambda: FakeDocumentService(document)
+    return TestClient(app)
+
+
+def _compressed(stored_file, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    (tmp_path / stored_file["file_path"]).write_bytes(zstandard.ZstdCompressor().compress(DATA))
+    return {**stored_file, "file_encoding": "zstd"}
+
+
+def _url() -> str:
+    return f"{settings.API_V1_PREFIX}/document/{DOC_ID}/file"
+
+
+@pytest.mark.parametrize("encoded", [False, True], ids=["direct", "streamed"])
+def test_file_range_and_conditional_responses(stored_file, tmp_path, encoded):
+    # Encoded files requested without Accept-Encoding: zstd are streamed through decompression
+    document = _compressed(stored_file, tmp_path) if encoded else stored_file
+    client = _client(document)
+    plain = {"Accept-Encoding": "identity"}
+
+    full = client.get(_url(), headers=plain)
+    assert full.status_code == 200 and full.content == DATA
+    etag = full.headers["etag"]
+
+    partial = client.get(_url(), headers={**plain, "Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.content == DATA[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+
+    not_modified = client.get(_url(), headers={**plain, "If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+
+    unsatisfiable = client.get(_url(), headers={**plain, "Range": f"bytes={len(DATA)}-"})
+    assert unsatisfiable.status_code == 416
+
+    malformed = client.get(_url(), headers={**plain, "Range": "bytes=5-3"})
+    assert malformed.status_code == 200 and malformed.content == DATA
+
+    stale = client.get(_url(), headers={**plain, "Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.content == DATA
+
+
+@pytest.mark.parametrize("mode, header, value", [
+    ("x-accel-redirect", "x-accel-redirect", "/protected-files/IT/2025/IT-001-25.pdf"),
+    ("x-sendfile", "x-sendfile", None),
+])
+def test_proxy_delivery_offloads_unencoded_files(stored_file, tmp_path, monkeypatch, mode, header, value):
+    monkeypatch.setattr(settings, "FILE_DELIVERY_MODE", mode)
+    response = _client(stored_file).get(_url())
+
+    assert response.status_code == 200 and response.content == b""
+    assert response.headers[header] == (value or str(tmp_path.resolve() / stored_file["file_path"]))
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("mode", ["x-accel-redirect", "x-sendfile"])
+def test_proxy_delivery_streams_encoded_files(stored_file, tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(settings, "FILE_DELIVERY_MODE", mode)
+    client = _client(_compressed(stored_file, tmp_path))
+
+    encoded = client.get(_url(), headers={"Accept-Encoding": "zstd"})
+    assert "x-accel-redirect" not in encoded.headers and "x-sendfile" not in encoded.headers
+    assert encoded.headers["content-encoding"] == "zstd"
+    assert encoded.content == DATA  # decoded by the client
+
+    decoded = client.get(_url(), headers={"Accept-Encoding": "identity"})
+    assert "x-accel-redirect" not in decoded.headers and "x-sendfile" not in decoded.headers
+    assert "content-encoding" not in decoded.headers
+    assert decoded.content == DATA
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    monkeypatch.setattr(settings, "FILE_URL_SIGNING_KEY", "test-signing-key")
+
+
+def test_signed_file_url_round_trip(stored_file, signing_key):
+    client = _client(stored_file)
+    url = client.get(f"{_url()}/url").json()["url"]
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == DATA
+
+
+def test_signed_file_url_rejects_expired_and_tampered_links(stored_file, signing_key):
+    client = _client(stored_file)
+    expired = 1_000_000_000
+    response = client.get(f"{_url()}/signed", params={"expires": expired, "signature": sign_file_url(DOC_ID, expired)})
+    assert response.status_code == 403 and response.json()["detail"] == "File URL has expired"
+
+    expires = 4_000_000_000
+    signature = sign_file_url(DOC_ID, expires)
+    assert verify_file_signature(DOC_ID, expires, signature)
+    for params in (
+        {"expires": expires + 1, "signature": signature},  # extended expiry
+        {"expires": expires, "signature": signature[:-1] + ("0" if signature[-1] != "0" else "1")},
+    ):
+        response = client.get(f"{_url()}/signed", params=params)
+        assert response.status_code == 403 and response.json()["detail"] == "Invalid file signature"
+    other_doc = str(ObjectId())
+    response = client.get(f"{settings.API_V1_PREFIX}/document/{other_doc}/file/signed",
+                          params={"expires": expires, "signature": signature})
+    assert response.status_code == 403
@@ -0,0 +1,92 @@
+import io
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.core.config import settings
+from app.services import attachment_import
+from app.services.attachment_import import AttachmentImportService
+
+DEPARTMENT_ID = ObjectId()
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeDocumentCollection:
+    def __init__(self, documents):
+        self.documents = {document["ref_no"]: document for document in documents}
+        self.updates = []
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(self.documents[ref]) for ref in query["ref_no"]["$in"] if ref in self.documents])
+
+    async def bulk_write(self, operations, ordered):
+        self.updates.extend(operation._filter["_id"] for operation in operations)
+
+
+class FakeDepartmentCollection:
+    def find(self, query, projection=None):
+        return FakeCursor([{"_id": DEPARTMENT_ID, "name": "IT"}])
+
+
+class FakeFileStorage:
+    saved = []
+
+    async def save_file(self, upload, department_name, ref_no, created_date):
+        FakeFileStorage.saved.append((ref_no, upload.filename))
+        return {"file_path": f"{department_name}/2025/{upload.filename}"}
+
+    async def release_replaced_file(self, old_path, new_path):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    FakeFileStorage.saved = []
+    monkeypatch.setattr(attachment_import, "FileStorageService", FakeFileStorage)
+    monkeypatch.setattr(settings, "ATTACHMENT_IMPORT_BATCH_SIZE", 3)
+    documents = FakeDocumentCollection([
+        {"_id": ObjectId(), "ref_no": ref_no, "department_id": DEPARTMENT_ID, "created_date": datetime(2025, 1, 2)}
+        for ref_no in ("TPG-TC/01/25", "TPG-TC/02/25", "TPG-TC/03/25")
+    ])
+    service = AttachmentImportService()
+    monkeypatch.setattr(service, "get_document_collection", lambda: documents)
+    monkeypatch.setattr(service, "get_department_collection", lambda: FakeDepartmentCollection())
+    return service, documents
+
+
+async def test_only_the_first_file_per_ref_no_is_stored(service):
+    service, documents = service
+    names = [
+        "TPG-TC/01/25.pdf",
+        "TPG-TC_01_25.pdf",       # same ref_no in the same batch
+        "TPG-TC_02_25.pdf",
+        "scans/TPG-TC_02_25.png",  # same ref_no in a later batch
+        "TPG-TC_03_25.pdf",
+        "unknown.pdf",
+    ]
+
+    report = await service._import_entries(names, lambda name: io.BytesIO(b"%PDF-"), overwrite=True)
+
+    assert FakeFileStorage.saved == [
+        ("TPG-TC/01/25", "25.pdf"), ("TPG-TC/02/25", "TPG-TC_02_25.pdf"), ("TPG-TC/03/25", "TPG-TC_03_25.pdf")
+    ]
+    assert report["stored_count"] == 3
+    assert len(documents.updates) == len(set(documents.updates)) == 3
+    assert report["conflicting_files"] == [
+        {"file": "TPG-TC_01_25.pdf", "ref_no": "TPG-TC/01/25", "imported_file": "TPG-TC/01/25.pdf"},
+        {"file": "scans/TPG-TC_02_25.png", "ref_no": "TPG-TC/02/25", "imported_file": "TPG-TC_02_25.pdf"},
+    ]
+    assert report["unmatched_files"] == ["unknown.pdf"]
+    assert report["matched_count"] == 5
@@ -0,0 +1,50 @@
+import io
+
+import pandas as pd
+from bson import ObjectId
+
+from app.services.csvservice import CSVImportService
+
+DEPT_MAP = {10: ObjectId()}
+DOC_TYPE_MAP = {20: ObjectId()}
+HEADER = "id,RefNo,Title,StatusID,CreatedBy,CreatedDate,FiledBy,FiledDate,DocumentTypeID,DepartmentID\n"
+
+
+def test_rejection_report_numbers_data_rows_not_lines(tmp_path):
+    source = io.BytesIO((
+        HEADER
+        + "1,IT/001/25,Memo,1,alice,2025-01-02,,,20,10\n"
+        + '2,IT/002/25,"Memo\nspanning two lines",1,alice,2025-01-02,,,20,10\n'
+        + "3,IT/003/25,Memo,1,alice,2025-01-02,,,20,99\n"
+    ).encode())
+    report_file = tmp_path / "report.csv"
+
+    summary = CSVImportService()._write_document_rejection_report(source, DEPT_MAP, DOC_TYPE_MAP, report_file)
+
+    assert summary["rows_read"] == 3
+    assert summary["rejections"]["unknown_department"] == 1
+    report = pd.read_csv(report_file)
+    assert report[["row", "reason", "id"]].values.tolist() == [[3, "unknown_department", 3]]
+
+
+def test_validate_document_chunk_reports_the_first_failing_check():
+    chunk = pd.read_csv(io.StringIO(
+        HEADER
+        + "1,IT/001/25,Memo,1,alice,2025-01-02,,,20,10\n"
+        + "2,IT/002/25,Memo,1,,2025-01-02,,,20,10\n"          # no CreatedBy
+        + "x,IT/003/25,Memo,1,alice,2025-01-02,,,20,10\n"     # legacy id is checked by upserts only
+        + "4,IT/004/25,Memo,1,alice,not a date,,,20,10\n"
+        + "5,IT/005/25,Memo,1,alice,2025-01-02,,,20,99\n"
+        + "6,IT/006/25,Memo,1,alice,2025-01-02,,,99,10\n"
+        + "7,IT/007/25,   ,1,alice,2025-01-02,,,20,10\n"
+        + "8,IT/008/25,Memo,1,alice,not a date,,,99,99\n"     # several checks fail
+    ))
+
+    _, insert_reasons = CSVImportService._validate_document_chunk(chunk, DEPT_MAP, DOC_TYPE_MAP)
+    _, upsert_reasons = CSVImportService._validate_document_chunk(chunk, DEPT_MAP, DOC_TYPE_MAP, mode="upsert")
+
+    expected = [None, "missing_required_field", None, "invalid_created_date", "unknown_department",
+                "unknown_document_type", "empty_title", "invalid_created_date"]
+    assert insert_reasons.where(insert_reasons.notna(), None).tolist() == expected
+    expected[2] = "invalid_id"
+    assert upsert_reasons.where(upsert_reasons.notna(), None).tolist() == expected
@@ -0,0 +1,58 @@
+import io
+
+import pandas as pd
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.services.csvservice import CSVImportService
+
+DEPT_MAP = {10: ObjectId()}
+DOC_TYPE_MAP = {20: ObjectId()}
+CSV = (
+    "id,RefNo,Title,StatusID,CreatedBy,CreatedDate,FiledBy,FiledDate,DocumentTypeID,DepartmentID\n"
+    "1,IT/001/25,Memo,1,alice,2025-01-02,,,20,10\n"
+    "12.7,IT/002/25,Memo,1,alice,2025-01-02,,,20,10\n"
+    "abc,IT/003/25,Memo,1,alice,2025-01-02,,,20,10\n"
+)
+
+
+def _chunk() -> pd.DataFrame:
+    return pd.read_csv(io.StringIO(CSV))
+
+
+def test_upsert_mode_rejects_ids_that_are_not_integers():
+    _, reasons = CSVImportService._validate_document_chunk(_chunk(), DEPT_MAP, DOC_TYPE_MAP, mode="upsert")
+    assert reasons.where(reasons.notna(), None).tolist() == [None, "invalid_id", "invalid_id"]
+
+
+def test_insert_mode_keeps_rows_without_an_integer_id():
+    chunk = CSVImportService._prepare_document_chunk(_chunk(), DEPT_MAP, DOC_TYPE_MAP, mode="insert")
+    documents = CSVImportService._build_document_records(chunk)
+
+    assert [document["ref_no"] for document in documents] == ["IT/001/25", "IT/002/25", "IT/003/25"]
+    assert documents[0]["inserted_id"] == 1 and type(documents[0]["inserted_id"]) is int
+    # Never truncated to 12, and absent rather than null so the sparse unique index ignores it
+    assert "inserted_id" not in documents[1] and "inserted_id" not in documents[2]
+
+
+class DuplicateRejectingCollection:
+    async def insert_many(self, documents, ordered):
+        raise BulkWriteError({
+            "nInserted": 1,
+            "writeErrors": [
+                {"index": 1, "code": 11000, "errmsg": "E11000 duplicate key error"},
+                {"index": 2, "code": 121, "errmsg": "Document failed validation"},
+            ],
+        })
+
+
+async def test_insert_mode_reports_already_imported_rows_as_duplicates(monkeypatch):
+    service = CSVImportService()
+    monkeypatch.setattr(service, "get_document_collection", lambda: DuplicateRejectingCollection())
+
+    chunk_index, counts = await service._write_document_batch(3, [{}, {}, {}], "insert")
+
+    assert chunk_index == 3
+    assert counts["inserted_count"] == 1
+    assert counts["duplicate_count"] == 1
+    assert counts["failed_count"] == 1
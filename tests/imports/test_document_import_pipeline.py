@@ -0,0 +1,75 @@
+import asyncio
+import io
+
+import pytest
+from bson import ObjectId
+
+from app.core.config import settings
+from app.services.csvservice import CSVImportService
+
+DEPT_MAP = {1: ObjectId()}
+DOC_TYPE_MAP = {1: ObjectId()}
+
+
+def _csv(rows: int, invalid_every: int = 7) -> io.BytesIO:
+    lines = ["id,RefNo,Title,StatusID,CreatedBy,CreatedDate,FiledBy,FiledDate,DocumentTypeID,DepartmentID"]
+    for i in range(1, rows + 1):
+        department = 99 if i % invalid_every == 0 else 1  # unknown department, skipped
+        lines.append(f"{i},IT/{i:04d}/25,Paper {i},1,alice,2025-01-02,,,1,{department}")
+    return io.BytesIO(("\n".join(lines) + "\n").encode())
+
+
+class SlowCollection:
+    """Finishes later sub-batches first, so commits must wait for earlier chunks."""
+
+    def __init__(self):
+        self.inserted = []
+        self.active = 0
+        self.max_active = 0
+
+    async def insert_many(self, documents, ordered):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01 / documents[0]["inserted_id"] ** 0.5)
+        self.inserted.extend(document["inserted_id"] for document in documents)
+        self.active -= 1
+
+        class Result:
+            inserted_ids = [document["_id"] for document in documents]
+        return Result()
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    monkeypatch.setattr(settings, "CSV_IMPORT_INSERT_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "CSV_IMPORT_MAX_CONCURRENT_INSERTS", 3)
+    monkeypatch.setattr(settings, "CSV_IMPORT_QUEUE_SIZE", 2)
+    collection = SlowCollection()
+    monkeypatch.setattr(CSVImportService, "get_document_collection", lambda self: collection)
+    return collection
+
+
+async def test_pipeline_commits_chunks_in_order_with_bounded_writes(collection):
+    committed = []
+
+    async def on_chunk_committed(chunk_index, stats):
+        committed.append((chunk_index, stats["rows_read"], stats["inserted_count"], stats["skipped_count"]))
+
+    totals = await CSVImportService().run_document_import(
+        _csv(100), DEPT_MAP, DOC_TYPE_MAP, chunk_size=10, on_chunk_committed=on_chunk_committed
+    )
+
+    assert [chunk_index for chunk_index, *_ in committed] == list(range(10))
+    assert all(rows_read == inserted + skipped for _, rows_read, inserted, skipped in committed)
+    assert totals["rows_read"] == 100
+    assert totals["skipped_count"] == 14
+    assert totals["inserted_count"] == 86
+    assert sorted(collection.inserted) == [i for i in range(1, 101) if i % 7]
+    assert 1 < collection.max_active <= 3
+
+
+async def test_pipeline_resumes_after_the_committed_chunks(collection):
+    totals = await CSVImportService().run_document_import(_csv(100), DEPT_MAP, DOC_TYPE_MAP, start_chunk=6, chunk_size=10)
+
+    assert totals["rows_read"] == 40
+    assert sorted(collection.inserted) == [i for i in range(61, 101) if i % 7]
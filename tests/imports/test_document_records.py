@@ -0,0 +1,49 @@
+import io
+
+import pandas as pd
+from bson import ObjectId
+
+from app.services.csvservice import DOCUMENT_CSV_COLUMNS, CSVImportService
+from benchmarks.csv_document_import import build_records_iterrows, generate_csv
+
+DEPT_MAP = {i: ObjectId() for i in range(1, 21)}
+DOC_TYPE_MAP = {i: ObjectId() for i in range(1, 201)}
+EDGE_CASES = (
+    "id,RefNo,Title,StatusID,CreatedBy,CreatedDate,FiledBy,FiledDate,DocumentTypeID,DepartmentID\n"
+    "1,  IT/001/25 , Padded title ,2, alice ,2025-01-02, bob ,2025-01-05,1,1\n"
+    "2,IT/002/25,Not filed,1,alice,2025-01-02,,,2,2\n"
+    "3,IT/003/25,Unknown status,9,alice,2025-01-02,carol,not a date,3,3\n"
+    "4,IT/004/25,Numeric filer,2,alice,2025-01-02,42,2025-02-01,4,4\n"
+)
+
+
+def _comparable(documents):
+    return [{key: value for key, value in document.items() if key not in ("_id", "inserted_id")}
+            for document in documents]
+
+
+def _assert_matches_per_row_builder(csv_data: bytes) -> int:
+    checked = 0
+    for chunk in pd.read_csv(io.BytesIO(csv_data), usecols=DOCUMENT_CSV_COLUMNS, chunksize=1000):
+        chunk = CSVImportService._prepare_document_chunk(chunk, DEPT_MAP, DOC_TYPE_MAP)
+        documents = CSVImportService._build_document_records(chunk)
+        assert _comparable(documents) == _comparable(build_records_iterrows(chunk))
+        assert len({document["_id"] for document in documents}) == len(documents)
+        checked += len(documents)
+    return checked
+
+
+def test_build_document_records_matches_the_per_row_builder():
+    assert _assert_matches_per_row_builder(generate_csv(3000, seed=3)) == 3000
+
+
+def test_build_document_records_matches_the_per_row_builder_on_edge_cases():
+    assert _assert_matches_per_row_builder(EDGE_CASES.encode()) == 4
+
+    chunk = CSVImportService._prepare_document_chunk(pd.read_csv(io.StringIO(EDGE_CASES)), DEPT_MAP, DOC_TYPE_MAP)
+    first, not_filed, unknown_status, numeric_filer = CSVImportService._build_document_records(chunk)
+    assert (first["ref_no"], first["title"], first["created_by"], first["filed_by"]) == \
+           ("IT/001/25", "Padded title", "alice", "bob")
+    assert not_filed["filed_by"] is None and not_filed["filed_date"] is None
+    assert unknown_status["status"] == "Suspended" and unknown_status["filed_date"] is None
+    assert numeric_filer["filed_by"] == "42"
@@ -0,0 +1,21 @@
+from bson import ObjectId
+
+from app.services.seed import ScaleDocumentGenerator
+from app.services.utils import format_ref_no
+
+DEPARTMENTS = [{
+    "_id": ObjectId(),
+    "document_types": [{"_id": ObjectId(), "name": "Memo", "prefix": "IT", "padding": 3}],
+}]
+USERS = [{"username": "alice"}, {"username": "bob"}]
+
+
+def test_generated_ref_nos_match_the_api_format():
+    # 2000-2009 is where a zero-padded year would differ from format_ref_no
+    generator = ScaleDocumentGenerator(DEPARTMENTS, USERS, seed=7, end_year=2009)
+    documents = generator.generate(500)
+
+    assert {document["created_date"].year for document in documents} >= {2000, 2009}
+    for document in documents:
+        prefix, sequence, _ = document["ref_no"].split("/")
+        assert document["ref_no"] == format_ref_no(prefix, int(sequence), 3, document["created_date"].year)
@@ -0,0 +1,148 @@
+"""
+Reference counting of content-addressed blobs, run against an in-memory stand-in for the
+blobs collection that implements the few operations FileStorageService uses.
+"""
+import asyncio
+import copy
+import hashlib
+from typing import Any, AsyncIterator, Dict
+
+import pytest
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.services import FileStorageService as storage_module
+from app.services.FileStorageService import FileStorageService
+
+CONTENT = b"approval paper scan"
+CHECKSUM = hashlib.sha256(CONTENT).hexdigest()
+
+
+def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeBlobCollection:
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+    def _find(self, query):
+        document = self.documents.get(query["_id"])
+        return document if document is not None and _matches(document, query) else None
+
+    @staticmethod
+    def _apply(document, update):
+        for key, value in update.get("$set", {}).items():
+            document[key] = value
+        for key, value in update.get("$inc", {}).items():
+            document[key] = document.get(key, 0) + value
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        document = self._find(query)
+        upserted_id = None
+        if document is None:
+            if not upsert:
+                return type("Result", (), {"matched_count": 0, "modified_count": 0, "upserted_id": None})()
+            if query["_id"] in self.documents:
+                raise DuplicateKeyError("duplicate _id")
+            document = {"_id": query["_id"], **update.get("$setOnInsert", {})}
+            self.documents[query["_id"]] = document
+            upserted_id = query["_id"]
+        self._apply(document, update)
+        matched = 0 if upserted_id else 1
+        return type("Result", (), {"matched_count": matched, "modified_count": matched, "upserted_id": upserted_id})()
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(0)
+        document = self._find(query)
+        return copy.deepcopy(document) if document else None
+
+    async def find_one_and_update(self, query, update, return_document=ReturnDocument.BEFORE):
+        await asyncio.sleep(0)
+        document = self._find(query)
+        if document is None:
+            return None
+        self._apply(document, update)
+        return copy.deepcopy(document)
+
+    async def delete_one(self, query):
+        await asyncio.sleep(0)
+        document = self._find(query)
+        if document is not None:
+            del self.documents[query["_id"]]
+        return type("Result", (), {"deleted_count": 1 if document else 0})()
+
+
+async def _chunks() -> AsyncIterator[bytes]:
+    yield CONTENT
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "STORAGE_COMPRESSION", "")
+    blobs = FakeBlobCollection()
+    monkeypatch.setattr(MongoDB, "database", {"blobs": blobs})
+    return FileStorageService(), blobs
+
+
+async def test_blob_is_deleted_with_its_last_reference(storage):
+    service, blobs = storage
+    stored, created = await service.store_blob(_chunks(), CHECKSUM, len(CONTENT), ".pdf")
+    _, created_again = await service.store_blob(_chunks(), CHECKSUM, len(CONTENT), ".pdf")
+    assert created and not created_again
+    path = stored["file_path"]
+
+    await service.delete_file(path)
+    assert blobs.documents[path]["refcount"] == 1
+    assert await service.stat_file(path) is not None
+
+    await service.delete_file(path)
+    assert path not in blobs.documents
+    assert await service.stat_file(path) is None
+
+
+async def test_store_during_release_waits_and_uploads_again(storage, monkeypatch):
+    service, blobs = storage
+    stored, _ = await service.store_blob(_chunks(), CHECKSUM, len(CONTENT), ".pdf")
+    path = stored["file_path"]
+
+    # Hold the release between marking the blob for deletion and deleting its file
+    delete_started, delete_allowed = asyncio.Event(), asyncio.Event()
+    backend_delete = service.backend.delete
+
+    async def gated_delete(key: str) -> None:
+        delete_started.set()
+        await delete_allowed.wait()
+        await backend_delete(key)
+
+    monkeypatch.setattr(service.backend, "delete", gated_delete)
+    monkeypatch.setattr(storage_module, "BLOB_DELETE_POLL_SECONDS", 0)
+
+    release = asyncio.create_task(service.delete_file(path))
+    await delete_started.wait()
+    store = asyncio.create_task(service.store_blob(_chunks(), CHECKSUM, len(CONTENT), ".pdf"))
+    for _ in range(20):
+        await asyncio.sleep(0)
+    assert not store.done()
+
+    delete_allowed.set()
+    await release
+    stored_again, created = await store
+
+    assert created
+    assert stored_again["file_path"] == path
+    assert blobs.documents[path]["refcount"] == 1
+    assert "deleting" not in blobs.documents[path]
+    assert b"".join([chunk async for chunk in service.open_file(path)]) == CONTENT
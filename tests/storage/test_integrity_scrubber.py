@@ -0,0 +1,223 @@
+"""
+Integrity scrubber passes and lease handling, run against in-memory stand-ins for the
+documents, integrity_failures and integrity_checkpoints collections.
+"""
+import asyncio
+import copy
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import MongoDB
+from app.services import integrity_scrubber
+from app.services.integrity_scrubber import CHECKPOINT_ID, WORKER_ID, IntegrityScrubber, _RateLimiter
+
+INTACT = b"signed approval"
+
+
+def _result(matched: int = 0, deleted: int = 0):
+    return type("Result", (), {"matched_count": matched, "modified_count": matched, "deleted_count": deleted})()
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def limit(self, size):
+        self.documents = self.documents[:size]
+        return self
+
+    async def to_list(self, length=None):
+        return [copy.deepcopy(document) for document in self.documents]
+
+
+class FakeDocumentCollection:
+    """Answers the file_path/_id range queries of the scrub walk."""
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        last_id = query.get("_id", {}).get("$gt")
+        return FakeCursor([
+            document for document in self.documents
+            if document.get("file_path") not in query["file_path"]["$nin"]
+            and (last_id is None or document["_id"] > last_id)
+        ])
+
+
+class FakeFailureCollection:
+    def __init__(self):
+        self.failures: Dict[int, Dict[str, Any]] = {}
+
+    async def delete_one(self, query):
+        return _result(deleted=1 if self.failures.pop(query["document_id"], None) else 0)
+
+    async def update_one(self, query, update, upsert=False):
+        failure = self.failures.get(query["document_id"])
+        if failure is None:
+            failure = {"document_id": query["document_id"], **update.get("$setOnInsert", {})}
+            self.failures[query["document_id"]] = failure
+        failure.update(update["$set"])
+        return _result(matched=1)
+
+    async def delete_many(self, query):
+        stale = [key for key, failure in self.failures.items() if failure["last_checked"] < query["last_checked"]["$lt"]]
+        for key in stale:
+            del self.failures[key]
+        return _result(deleted=len(stale))
+
+
+class FakeCheckpointCollection:
+    """A single lease-guarded checkpoint document."""
+
+    def __init__(self):
+        self.checkpoint: Dict[str, Any] = {}
+
+    def _held(self, now: datetime) -> bool:
+        lease_until = self.checkpoint.get("lease_until")
+        return self.checkpoint.get("lease_owner") == WORKER_ID or lease_until is None or lease_until < now
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        if self.checkpoint and not self._held(datetime.now()):
+            return None
+        if not self.checkpoint:
+            self.checkpoint = {"_id": CHECKPOINT_ID, **update["$setOnInsert"]}
+        self.checkpoint.update(update["$set"])
+        return copy.deepcopy(self.checkpoint)
+
+    async def update_one(self, query, update):
+        if self.checkpoint.get("lease_owner") != query["lease_owner"]:
+            return _result()
+        self.checkpoint.update(update.get("$set", {}))
+        for key, value in update.get("$inc", {}).items():
+            self.checkpoint[key] += value
+        return _result(matched=1)
+
+
+@pytest.fixture
+def collections(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path))
+    (tmp_path / "Finance").mkdir()
+    (tmp_path / "Finance" / "intact.pdf").write_bytes(INTACT)
+    (tmp_path / "Finance" / "corrupt.pdf").write_bytes(b"flipped bits")
+    (tmp_path / "Finance" / "unhashed.pdf").write_bytes(INTACT)
+    documents = FakeDocumentCollection([
+        {"_id": 1, "file_path": "Finance/intact.pdf", "file_checksum": hashlib.sha256(INTACT).hexdigest(),
+         "file_size": len(INTACT)},
+        {"_id": 2, "file_path": "Finance/corrupt.pdf", "file_checksum": hashlib.sha256(INTACT).hexdigest(),
+         "file_size": len(INTACT)},
+        {"_id": 3, "file_path": "Finance/gone.pdf", "file_checksum": "0" * 64, "file_size": 10},
+        {"_id": 4, "file_path": "Finance/unhashed.pdf", "file_size": len(INTACT) + 1},
+        {"_id": 5, "file_path": None},
+    ])
+    failures, checkpoints = FakeFailureCollection(), FakeCheckpointCollection()
+    monkeypatch.setattr(MongoDB, "database", {
+        "documents": documents, "integrity_failures": failures, "integrity_checkpoints": checkpoints,
+    })
+    return documents, failures, checkpoints
+
+
+async def test_scrub_pass_records_failures_and_clears_recovered_files(collections):
+    _, failures, checkpoints = collections
+    earlier = datetime(2020, 1, 1)
+    # A failure recorded before the file was restored, and one whose document has since been deleted
+    failures.failures[1] = {"document_id": 1, "kind": "missing", "last_checked": earlier}
+    failures.failures[99] = {"document_id": 99, "kind": "missing", "last_checked": earlier}
+
+    summary = await IntegrityScrubber(batch_size=2, threads=2, bytes_per_second=0).scrub(once=True)
+
+    assert {key: failure["kind"] for key, failure in failures.failures.items()} == {
+        2: "checksum_mismatch", 3: "missing", 4: "size_mismatch",
+    }
+    assert failures.failures[2]["actual_checksum"] == hashlib.sha256(b"flipped bits").hexdigest()
+    assert summary["checked"] == 4 and summary["failed"] == 3
+    # Bytes are counted from the recorded sizes, skipping the missing file
+    assert summary["bytes_read"] == 3 * len(INTACT) + 1
+    assert checkpoints.checkpoint["last_id"] is None
+    assert checkpoints.checkpoint["last_pass"] == summary
+
+
+async def test_scrub_resumes_after_the_checkpoint(collections):
+    _, failures, checkpoints = collections
+    checkpoints.checkpoint = {
+        "_id": CHECKPOINT_ID, "last_id": 2, "pass_started": datetime.now(),
+        "checked": 2, "failed": 1, "bytes_read": 0, "lease_owner": None, "lease_until": None,
+    }
+
+    summary = await IntegrityScrubber(batch_size=10, bytes_per_second=0).scrub(once=True)
+
+    assert sorted(failures.failures) == [3, 4]
+    assert summary["checked"] == 4 and summary["failed"] == 3
+
+
+async def test_lease_is_renewed_while_a_long_batch_runs(collections, monkeypatch):
+    monkeypatch.setattr(settings, "SCRUB_LEASE_SECONDS", 0.03)
+    scrubber = IntegrityScrubber(bytes_per_second=0)
+    renewals = []
+
+    async def renew() -> bool:
+        renewals.append(datetime.now())
+        return True
+
+    async def slow_batch(executor, documents):
+        await asyncio.sleep(0.1)
+        return 0, 42
+
+    monkeypatch.setattr(scrubber, "_renew_lease", renew)
+    monkeypatch.setattr(scrubber, "_scrub_batch", slow_batch)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert await scrubber._scrub_batch_leased(executor, [{"_id": 1}]) == (0, 42)
+    assert len(renewals) >= 2
+    assert not scrubber.abandoned.is_set()
+
+
+async def test_lost_lease_abandons_the_batch(collections, monkeypatch):
+    _, _, checkpoints = collections
+    monkeypatch.setattr(settings, "SCRUB_LEASE_SECONDS", 0.03)
+    scrubber = IntegrityScrubber(bytes_per_second=0)
+    await scrubber._claim()
+    cancelled = asyncio.Event()
+
+    async def stuck_batch(executor, documents):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(scrubber, "_scrub_batch", stuck_batch)
+    # Another process takes the lease over
+    checkpoints.checkpoint["lease_owner"] = "other-worker"
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert await scrubber._scrub_batch_leased(executor, [{"_id": 1}]) is None
+    assert scrubber.abandoned.is_set()
+    assert cancelled.is_set()
+
+
+def test_abandoned_batch_stops_local_hashing(tmp_path, collections):
+    scrubber = IntegrityScrubber(bytes_per_second=0)
+    scrubber.abandoned.set()
+    with pytest.raises(RuntimeError):
+        scrubber._hash_local(tmp_path / "Finance" / "intact.pdf", None)
+
+
+def test_rate_limiter_books_reads_back_to_back(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(integrity_scrubber.time, "monotonic", lambda: clock[0])
+    limiter = _RateLimiter(1000)
+    assert limiter.reserve(500) == 0
+    assert limiter.reserve(500) == pytest.approx(0.5)
+    assert limiter.reserve(1000) == pytest.approx(1.0)
+    clock[0] = 110.0
+    assert limiter.reserve(1000) == 0
+    assert _RateLimiter(0).reserve(10 ** 9) == 0
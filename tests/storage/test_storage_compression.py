@@ -0,0 +1,60 @@
+from typing import AsyncIterator, List
+
+import pytest
+
+pytest.importorskip("zstandard")
+
+from app.services.storage_compression import CompressedStream, decompress_chunks  # noqa: E402
+
+DATA = b"".join(f"line {i}: approval paper\n".encode() for i in range(20000))
+
+
+async def _chunks(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+
+async def _compressed_chunks(chunk_size: int) -> List[bytes]:
+    stream = CompressedStream(_chunks(DATA, 64 * 1024))
+    compressed = b"".join([chunk async for chunk in stream])
+    assert stream.size == len(compressed) < len(DATA)
+    # Small stored chunks make each decompressed piece end at an arbitrary offset
+    return [compressed[offset:offset + chunk_size] for offset in range(0, len(compressed), chunk_size)]
+
+
+async def _iterate(chunks: List[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.parametrize("chunk_size", [1, 97, 4096])
+@pytest.mark.parametrize("start, end", [
+    (0, None),
+    (0, 1),
+    (1, 2),
+    (12345, 67890),
+    (len(DATA) - 10, None),
+    (len(DATA) - 10, len(DATA) + 100),
+    (500, 500),
+    (len(DATA), None),
+    (len(DATA) + 5, None),
+])
+async def test_decompress_chunks_serves_ranges_across_chunk_boundaries(chunk_size, start, end):
+    chunks = await _compressed_chunks(chunk_size)
+    pieces = [piece async for piece in decompress_chunks(_iterate(chunks), start, end)]
+    assert b"".join(pieces) == DATA[start:end]
+    assert all(pieces)
+
+
+async def test_decompress_chunks_stops_reading_after_the_range():
+    chunks = await _compressed_chunks(97)
+    consumed = 0
+
+    async def counting() -> AsyncIterator[bytes]:
+        nonlocal consumed
+        for chunk in chunks:
+            consumed += 1
+            yield chunk
+
+    assert b"".join([piece async for piece in decompress_chunks(counting(), 0, 100)]) == DATA[:100]
+    assert consumed < len(chunks)
@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+from app.services.FileStorageService import FileStorageService
+from app.services.storage_sharding import CONFLICT, MISSING, STAGED, _link_local
+
+
+@pytest.mark.parametrize("flat_path", [
+    "Finance/2025/FIN-0001-25.pdf",
+    "TPG/2019/TPG-CH_12_19.docx",
+    "IT/2024/a.b.c.txt",
+])
+def test_sharded_and_alternate_paths_round_trip(flat_path):
+    sharded = FileStorageService.sharded_path(flat_path)
+    department, year, filename = flat_path.split("/")
+    assert sharded == f"{department}/{year}/{FileStorageService.shard_dirs(filename)}/{filename}"
+    assert FileStorageService.alternate_path(flat_path) == sharded
+    assert FileStorageService.alternate_path(sharded) == flat_path
+
+
+@pytest.mark.parametrize("path", [
+    "blobs/ab/cd/abcdef.pdf",
+    "blobs/ab/abcdef.pdf",
+    "Finance/FIN-0001-25.pdf",
+    "Finance/2025/00/00/FIN-0001-25.pdf",  # hash directories that do not match the filename
+])
+def test_paths_outside_both_layouts_have_no_alternate(path):
+    if len(path.split("/")) != 3:
+        assert FileStorageService.sharded_path(path) is None
+    assert FileStorageService.alternate_path(path) is None
+
+
+def test_link_local_stages_with_fresh_mtime(tmp_path):
+    old_file = tmp_path / "Finance" / "2025" / "FIN-0001-25.pdf"
+    old_file.parent.mkdir(parents=True)
+    old_file.write_bytes(b"scan")
+    week_ago = time.time() - 7 * 24 * 3600
+    os.utime(old_file, (week_ago, week_ago))
+    new_file = tmp_path / FileStorageService.sharded_path("Finance/2025/FIN-0001-25.pdf")
+
+    assert _link_local(old_file, new_file) == STAGED
+    assert new_file.read_bytes() == b"scan"
+    assert new_file.stat().st_mtime > time.time() - 60
+    # Re-running after an interruption finds its own link
+    assert _link_local(old_file, new_file) == STAGED
+
+
+def test_link_local_never_replaces_another_file(tmp_path):
+    old_file = tmp_path / "old.pdf"
+    old_file.write_bytes(b"old")
+    new_file = tmp_path / "aa" / "bb" / "old.pdf"
+    new_file.parent.mkdir(parents=True)
+    new_file.write_bytes(b"uploaded after the layout switch")
+
+    assert _link_local(old_file, new_file) == CONFLICT
+    assert new_file.read_bytes() == b"uploaded after the layout switch"
+    assert _link_local(tmp_path / "missing.pdf", tmp_path / "x" / "missing.pdf") == MISSING
@@ -0,0 +1,94 @@
+import os
+import re
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.storage_reconciliation import StorageReconciliationService
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, size):
+        self.documents = self.documents[:size]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeDocumentCollection:
+    """Answers the anchored file_path regex queries reconciliation issues."""
+
+    def __init__(self, file_paths):
+        self.file_paths = file_paths
+
+    def find(self, query, projection=None):
+        pattern = re.compile(query["file_path"]["$regex"])
+        return FakeCursor([{"file_path": path} for path in self.file_paths if pattern.search(path)])
+
+    def aggregate(self, pipeline):
+        groups = {}
+        for path in self.file_paths:
+            if "/" in path:
+                groups[path.split("/")[0]] = groups.get(path.split("/")[0], 0) + 1
+        return FakeCursor([{"_id": key, "count": count} for key, count in groups.items()])
+
+
+@pytest.fixture
+def storage_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_TYPE", "local")
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "storage"))
+    monkeypatch.setattr(settings, "STORAGE_GC_SCAN_BATCH", 2)
+    root = tmp_path / "storage"
+    old = time.time() - 7 * 24 * 3600
+    for path in ["Finance/2025/a.pdf", "Finance/2025/a/b.pdf", "Finance/2025/a.txt", "Finance/2025/z.pdf",
+                 "Finance/2024/orphan.pdf", "IT/2025/x.pdf", "loose.pdf"]:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(b"data")
+        os.utime(root / path, (old, old))
+    (root / "IT/2025/recent.pdf").write_bytes(b"new")
+    return root
+
+
+def test_walk_yields_paths_in_sorted_order(storage_root):
+    service = StorageReconciliationService()
+    paths = [path for path, _, _ in service._walk("Finance")]
+    # "a.txt" sorts before "a/b.pdf" because "." comes before "/"
+    assert paths == sorted(paths)
+    assert paths == ["Finance/2024/orphan.pdf", "Finance/2025/a.pdf", "Finance/2025/a.txt",
+                     "Finance/2025/a/b.pdf", "Finance/2025/z.pdf"]
+
+
+async def test_reconcile_merge_diffs_disk_against_references(storage_root, monkeypatch):
+    references = ["Finance/2025/a.pdf", "Finance/2025/a/b.pdf", "Finance/2025/a.pdf", "Finance/2025/gone.pdf",
+                  "IT/2025/x.pdf", "loose.pdf", "HR/2025/missing.pdf"]
+    service = StorageReconciliationService(action="delete")
+    monkeypatch.setattr(service, "get_document_collection", lambda: FakeDocumentCollection(references))
+
+    report = await service.reconcile()
+
+    assert report["files_scanned"] == 8
+    assert report["referenced_count"] == 5
+    assert report["skipped_recent"] == 1
+    assert sorted(report["orphans"]) == ["Finance/2024/orphan.pdf", "Finance/2025/a.txt", "Finance/2025/z.pdf"]
+    assert report["disposed_count"] == 3
+    assert sorted(report["dangling_references"]) == ["Finance/2025/gone.pdf", "HR/2025/missing.pdf"]
+    assert report["dangling_count"] == 2
+    assert not (storage_root / "Finance/2025/z.pdf").exists()
+    assert (storage_root / "Finance/2025/a/b.pdf").exists()
+    assert (storage_root / "IT/2025/recent.pdf").exists()